@@ -1,14 +1,20 @@
-from datetime import datetime, timedelta
+from datetime import datetime
 
-from django.db.models import Count
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
 from django.utils import timezone
 from rest_framework import status
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 
 from apps.attendance.models import AttendanceRecord
+from apps.attendance.versions import clock_version, conditional, data_version
+from apps.entry_gate.broadcast import publish_gate_events
 from apps.entry_gate.models import GateEvent
-from apps.students.models import Student
+from apps.students.identity import student_for_student_id
+
+from .anomalies import get_anomaly_engine
 
 
 def _parse_date(date_str):
@@ -21,39 +27,70 @@ def _parse_date(date_str):
 
 
 def detect_anomalies(date=None):
+    """
+    Today's anomalies come from the incremental engine (see :mod:`.anomalies`);
+    other days, or with ``ANOMALY_ENGINE`` off, are scanned.
+    """
+    if settings.ANOMALY_ENGINE and date in (None, timezone.localdate()):
+        return get_anomaly_engine().anomalies()
+    return scan_anomalies(date)
+
+
+def scan_anomalies(date=None):
+    """
+    Flag the day's attendance records that disagree with the gate log.
+
+    One aggregate over the day's events gives per-student entry, exit and
+    failure counts; the records are joined to it in memory, so the query
+    count does not grow with the number of students.
+    """
     date = date or timezone.localdate()
     anomalies = {"critical_anomalies": [], "warning_anomalies": []}
 
-    records = AttendanceRecord.objects.select_related("student").filter(date=date)
-    gate_events = GateEvent.objects.filter(timestamp__date=date)
+    activity = {
+        row["student_id"]: row
+        for row in GateEvent.objects.filter(timestamp__date=date)
+        .order_by("student_id")
+        .values("student_id", "student__student_id")
+        .annotate(
+            entries=Count("id", filter=Q(action=GateEvent.ENTRY)),
+            exits=Count("id", filter=Q(action=GateEvent.EXIT)),
+            failures=Count("id", filter=Q(success=False)),
+        )
+    }
+    records = (
+        AttendanceRecord.objects.filter(date=date)
+        .order_by("pk")
+        .values_list("student_id", "student__student_id", "present")
+    )
+    after_hours = timezone.now().hour >= 18
 
-    for record in records:
-        has_entry_event = gate_events.filter(student=record.student, action=GateEvent.ENTRY).exists()
-        has_exit_event = gate_events.filter(student=record.student, action=GateEvent.EXIT).exists()
+    for student_pk, student_id, present in records:
+        events = activity.get(student_pk)
+        has_entry_event = bool(events and events["entries"])
+        has_exit_event = bool(events and events["exits"])
 
-        if has_entry_event and not record.present:
+        if has_entry_event and not present:
             anomalies["critical_anomalies"].append(
                 {
-                    "student": record.student.student_id,
+                    "student": student_id,
                     "issue": "Entry recorded but marked absent",
                 }
             )
 
-        if record.present and not has_exit_event and timezone.now().hour >= 18:
+        if present and not has_exit_event and after_hours:
             anomalies["warning_anomalies"].append(
                 {
-                    "student": record.student.student_id,
+                    "student": student_id,
                     "issue": "Present without exit after hours",
                 }
             )
 
-    failed_events = gate_events.filter(success=False)
-    failure_counts = failed_events.values("student__student_id").annotate(total=Count("id"))
-    for failure in failure_counts:
-        if failure["total"] >= 3:
+    for events in activity.values():
+        if events["failures"] >= 3:
             anomalies["warning_anomalies"].append(
                 {
-                    "student": failure["student__student_id"],
+                    "student": events["student__student_id"],
                     "issue": "Multiple failed access attempts",
                 }
             )
@@ -111,9 +148,8 @@ def manual_override(request):
     date = _parse_date(request.data.get("date"))
     reason = request.data.get("reason", "Manual override")
 
-    try:
-        student = Student.objects.get(student_id=student_id)
-    except Student.DoesNotExist:
+    student = student_for_student_id(student_id)
+    if student is None:
         return Response(
             {"detail": "Student not found."}, status=status.HTTP_404_NOT_FOUND
         )
@@ -130,12 +166,13 @@ def manual_override(request):
         record.present = False
         action_taken = "marked_absent"
     elif override_type == "grant_access":
-        GateEvent.objects.create(
+        event = GateEvent.objects.create(
             student=student,
             action=GateEvent.ENTRY,
             success=True,
             reason="Manual override access",
         )
+        transaction.on_commit(lambda: publish_gate_events([event]))
         record.present = True
         action_taken = "access_granted"
 
@@ -162,7 +199,13 @@ def clear_flag(_request):
     return Response({"detail": "Flag cleared."})
 
 
+def _monitoring_version(_request):
+    # Pending reviews span every date, not just today.
+    return f"{data_version()}-{clock_version()}"
+
+
 @api_view(["GET"])
+@conditional(_monitoring_version)
 def admin_monitoring_dashboard(_request):
     anomalies = detect_anomalies()
     pending_reviews = AttendanceRecord.objects.filter(verified=False)
@@ -181,52 +224,3 @@ def admin_monitoring_dashboard(_request):
     }
 
     return Response(payload)
-
-
-@api_view(["GET"])
-def live_stats(_request):
-    now = timezone.now()
-    today = timezone.localdate()
-    since = now - timedelta(hours=24)
-
-    recent_events = GateEvent.objects.select_related("student").filter(
-        timestamp__gte=since
-    )
-    today_events = recent_events.filter(timestamp__date=today)
-
-    success_count = today_events.filter(success=True).count()
-    total_events = today_events.count()
-    success_rate = round(success_count / total_events * 100, 1) if total_events else 0.0
-
-    latest_feed = [
-        {
-            "student": event.student.student_id,
-            "action": event.action,
-            "time": event.timestamp.isoformat(),
-            "success": event.success,
-        }
-        for event in today_events.order_by("-timestamp")[:6]
-    ]
-
-    anomalies = detect_anomalies(date=today)
-
-    payload = {
-        "students": Student.objects.count(),
-        "active_gates": 4,
-        "events_24h": recent_events.count(),
-        "events_today": total_events,
-        "success_rate": success_rate,
-        "present_today": AttendanceRecord.objects.filter(date=today, present=True).count(),
-        "average_scan_time": 1.2,
-        "live_feed": latest_feed,
-        "last_updated": now.isoformat(),
-        "has_events_today": bool(total_events),
-        "per_gate": list(
-            today_events.values("action").annotate(total=Count("id")).order_by("action")
-        ),
-        "anomaly_count": anomalies["total_count"],
-        "alert_count": len(anomalies["critical_anomalies"] + anomalies["warning_anomalies"]),
-        "system_healthy": anomalies["total_count"] == 0,
-    }
-
-    return Response(payload)
@@ -0,0 +1,205 @@
+"""Incremental anomaly detection for today's gate activity.
+
+:func:`.admin_monitoring.scan_anomalies` answers "what is wrong today" with
+two aggregate queries over the whole day. Dashboards poll that every few
+seconds, so :class:`AnomalyEngine` keeps the answer instead: per-student
+state for today (entry seen, exit seen, failed attempts, attendance
+``present``) and the set of students each rule currently flags.
+
+* Gate events are applied once each, in id order: every read first fetches
+  the events after the last one applied (usually none or a handful). All
+  workers read the same event log, so they agree without sharing state.
+* Gate passes only ever set ``present`` the way the events imply (see
+  :mod:`apps.entry_gate.pipeline`). Every other attendance write (manual
+  overrides, admin edits and bulk actions) is logged as an
+  :class:`~apps.attendance.models.AttendanceChange`. Each read compares the
+  latest change id for today with the one it loaded. Because that version
+  lives in the database, every worker sees every other worker's edits and
+  reloads today's attendance flags in one query.
+* A fresh process, a new day, or ``ANOMALY_ENGINE_REBUILD_SECONDS`` since the
+  last rebuild replays the day from scratch, which also catches an event
+  committed out of id order by a concurrent transaction.
+
+The rules are those of ``scan_anomalies``: an entry while marked absent
+(critical), present without an exit after 18:00 (warning), three or more
+failed attempts (warning).
+"""
+
+from dataclasses import dataclass
+import threading
+import time
+from typing import Optional
+
+from django.conf import settings
+from django.db.models import Max
+from django.utils import timezone
+
+from apps.attendance.models import AttendanceChange, AttendanceRecord
+from apps.entry_gate.models import GateEvent
+
+AFTER_HOURS = 18
+FAILED_ATTEMPTS = 3
+
+
+@dataclass
+class StudentDay:
+    student_id: str
+    entered: bool = False
+    exited: bool = False
+    failures: int = 0
+    # None until today's attendance row is known to exist.
+    present: Optional[bool] = None
+
+
+class AnomalyEngine:
+    def __init__(self, rebuild_seconds: float = 300):
+        self.rebuild_seconds = rebuild_seconds
+        self._lock = threading.Lock()
+        self._day = None
+        self._built_at = 0.0
+        self._reset(None)
+
+    def _reset(self, day) -> None:
+        self._day = day
+        self._students: dict[int, StudentDay] = {}
+        self._absent_entries: set[int] = set()
+        self._unexited: set[int] = set()
+        self._failing: set[int] = set()
+        self._watermark = 0
+        self._generation = None
+
+    def _state(self, student_pk: int, student_id: str) -> StudentDay:
+        state = self._students.get(student_pk)
+        if state is None:
+            state = self._students[student_pk] = StudentDay(student_id)
+        return state
+
+    def _evaluate(self, student_pk: int, state: StudentDay) -> None:
+        for flagged, rule in (
+            (self._absent_entries, state.entered and state.present is False),
+            (self._unexited, bool(state.present) and not state.exited),
+            (self._failing, state.failures >= FAILED_ATTEMPTS),
+        ):
+            if rule:
+                flagged.add(student_pk)
+            else:
+                flagged.discard(student_pk)
+
+    # -- feeding ---------------------------------------------------------
+
+    def _apply_events(self, infer_presence: bool = True) -> None:
+        events = (
+            GateEvent.objects.filter(pk__gt=self._watermark, timestamp__date=self._day)
+            .order_by("pk")
+            .values_list("pk", "student_id", "student__student_id", "action", "success")
+        )
+        for pk, student_pk, student_id, action, success in events:
+            state = self._state(student_pk, student_id)
+            if not success:
+                state.failures += 1
+            if action == GateEvent.ENTRY:
+                state.entered = True
+            else:
+                state.exited = True
+            if infer_presence:
+                # Recording the pass upserted today's row: created present,
+                # and marked present again by an entry.
+                if action == GateEvent.ENTRY or state.present is None:
+                    state.present = True
+            self._evaluate(student_pk, state)
+            self._watermark = pk
+
+    def _attendance_version(self) -> int:
+        changes = AttendanceChange.objects.filter(date=self._day)
+        return changes.aggregate(latest=Max("id"))["latest"] or 0
+
+    def _load_attendance(self, version: int) -> None:
+        # Read the version first: an edit racing the reload is seen next time.
+        self._generation = version
+        rows = AttendanceRecord.objects.filter(date=self._day).values_list(
+            "student_id", "student__student_id", "present"
+        )
+        for student_pk, student_id, present in rows:
+            self.set_present(student_pk, student_id, present)
+
+    def set_present(self, student_pk: int, student_id: str, present: Optional[bool]) -> None:
+        state = self._state(student_pk, student_id)
+        state.present = present
+        self._evaluate(student_pk, state)
+
+    def refresh(self) -> None:
+        """Bring the state up to date; a no-op read when nothing changed."""
+        today = timezone.localdate()
+        with self._lock:
+            if today != self._day or time.monotonic() - self._built_at > self.rebuild_seconds:
+                # Replay the day; the attendance rows then say who is present.
+                self._reset(today)
+                self._built_at = time.monotonic()
+                self._apply_events(infer_presence=False)
+                self._load_attendance(self._attendance_version())
+                return
+            # Events first: a newer override must win over an older pass.
+            self._apply_events()
+            version = self._attendance_version()
+            if version != self._generation:
+                self._load_attendance(version)
+
+    # -- reading ---------------------------------------------------------
+
+    def anomalies(self) -> dict:
+        """Today's anomalies in the ``scan_anomalies`` shape."""
+        self.refresh()
+        after_hours = timezone.localtime().hour >= AFTER_HOURS
+        with self._lock:
+            students = self._students
+            critical = [
+                {"student": students[pk].student_id, "issue": "Entry recorded but marked absent"}
+                for pk in sorted(self._absent_entries)
+            ]
+            warnings = []
+            if after_hours:
+                warnings += [
+                    {"student": students[pk].student_id, "issue": "Present without exit after hours"}
+                    for pk in sorted(self._unexited)
+                ]
+            warnings += [
+                {"student": students[pk].student_id, "issue": "Multiple failed access attempts"}
+                for pk in sorted(self._failing)
+            ]
+        return {
+            "critical_anomalies": critical,
+            "warning_anomalies": warnings,
+            "total_count": len(critical) + len(warnings),
+        }
+
+    @property
+    def day(self):
+        return self._day
+
+    def stats(self) -> dict:
+        return {
+            "day": self._day,
+            "students": len(self._students),
+            "watermark": self._watermark,
+            "open": len(self._absent_entries) + len(self._unexited) + len(self._failing),
+        }
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_anomaly_engine() -> AnomalyEngine:
+    """Return the process-wide anomaly engine."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = AnomalyEngine(settings.ANOMALY_ENGINE_REBUILD_SECONDS)
+    return _engine
+
+
+def reset_anomaly_engine() -> None:
+    global _engine
+    with _engine_lock:
+        _engine = None
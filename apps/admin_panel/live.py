@@ -0,0 +1,146 @@
+"""Server-sent events stream for the live dashboards.
+
+``GET /api/live-stream/`` keeps one connection per open dashboard and pushes:
+
+* ``stats``: the ``/api/live-stats/`` payload, once on connect and again
+  after gate activity or an attendance change (at most every
+  ``LIVE_STREAM_COALESCE_SECONDS``);
+* ``gate``: each recorded gate event as soon as it commits (see
+  :mod:`apps.entry_gate.broadcast`);
+* ``anomalies``: today's anomalies whenever they change.
+
+Each server process runs one :class:`LiveHub` per event loop. The hub holds
+the broker subscription and refreshes the stats through the shared cache in
+:mod:`.stats`. Every connection is fed from the hub, so the database work
+follows the gate event rate and does not grow with the number of open
+dashboards. Idle streams send a
+comment every ``LIVE_STREAM_HEARTBEAT_SECONDS`` to keep proxies from closing
+them.
+
+The stream needs the ASGI server (``seas_project.asgi``). Under WSGI the
+view answers 503, and the dashboards fall back to polling.
+"""
+
+import asyncio
+import json
+import time
+import weakref
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+
+from apps.entry_gate.broadcast import REFRESH_MESSAGE, get_broker, offer
+
+from .admin_monitoring import detect_anomalies
+from .stats import get_live_stats, run_in_worker_thread
+
+
+def sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n"
+
+
+class LiveHub:
+    def __init__(self, coalesce: float = 1.0, queue_size: int = 256):
+        self.coalesce = coalesce
+        self.queue_size = queue_size
+        self.clients: set[asyncio.Queue] = set()
+        self.stats = None
+        self.stats_at = 0.0
+        self.anomalies = None
+        self.recomputes = 0
+        self._listener = None
+        self._pending = None
+
+    def connect(self) -> asyncio.Queue:
+        queue = asyncio.Queue(self.queue_size)
+        self.clients.add(queue)
+        if self._listener is None:
+            self._listener = asyncio.ensure_future(self._listen())
+        return queue
+
+    def disconnect(self, queue: asyncio.Queue) -> None:
+        self.clients.discard(queue)
+        if not self.clients and self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+
+    def broadcast(self, message: dict) -> None:
+        for queue in list(self.clients):
+            offer(queue, message)
+
+    async def snapshot(self) -> dict:
+        """The latest stats payload, recomputed only if it is stale."""
+        if self.stats is None or time.monotonic() - self.stats_at > self.coalesce:
+            await self._recompute()
+        return self.stats
+
+    async def _recompute(self) -> bool:
+        """Refresh stats and anomalies; returns whether the anomalies changed."""
+        self.stats = await run_in_worker_thread(get_live_stats)
+        self.stats_at = time.monotonic()
+        self.recomputes += 1
+        anomalies = await run_in_worker_thread(detect_anomalies)
+        changed = self.anomalies is not None and anomalies != self.anomalies
+        self.anomalies = anomalies
+        return changed
+
+    async def _listen(self) -> None:
+        async for message in get_broker().subscribe():
+            if message["type"] != REFRESH_MESSAGE["type"]:
+                self.broadcast(message)
+            if self._pending is None or self._pending.done():
+                self._pending = asyncio.ensure_future(self._refresh_after_activity())
+
+    async def _refresh_after_activity(self) -> None:
+        # Let a burst of taps settle into one recomputation.
+        await asyncio.sleep(self.coalesce)
+        if self.clients:
+            anomalies_changed = await self._recompute()
+            self.broadcast({"type": "stats", "data": self.stats})
+            if anomalies_changed:
+                self.broadcast({"type": "anomalies", "data": self.anomalies})
+
+
+_hubs: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, LiveHub]" = weakref.WeakKeyDictionary()
+
+
+def get_live_hub() -> LiveHub:
+    """Return the hub for the running event loop."""
+    loop = asyncio.get_running_loop()
+    hub = _hubs.get(loop)
+    if hub is None:
+        hub = _hubs[loop] = LiveHub(settings.LIVE_STREAM_COALESCE_SECONDS)
+    return hub
+
+
+async def _events(hub: LiveHub):
+    # Connect only once the response is streamed: a request dropped before
+    # that never runs the generator, and so never reaches ``disconnect``.
+    queue = hub.connect()
+    try:
+        yield sse("stats", await hub.snapshot())
+        while True:
+            try:
+                message = await asyncio.wait_for(
+                    queue.get(), settings.LIVE_STREAM_HEARTBEAT_SECONDS
+                )
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            yield sse(message["type"], message["data"])
+    finally:
+        hub.disconnect(queue)
+
+
+async def live_stream(request):
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse(
+            {"detail": "The live stream needs the ASGI server; poll /api/live-stats/."},
+            status=503,
+        )
+    response = StreamingHttpResponse(_events(get_live_hub()), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
@@ -0,0 +1,96 @@
+import random
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.admin_panel.admin_monitoring import scan_anomalies
+from apps.admin_panel.anomalies import AnomalyEngine
+from apps.attendance.models import AttendanceRecord
+from apps.entry_gate.models import GateEvent
+from apps.students.models import Student
+from apps.users.models import User
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Time anomaly detection against synthetic rosters: the full scan, the "
+        "incremental engine's first build, and its reads once built. The data "
+        "is created inside a transaction and rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=[5000, 50000])
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{'students':>9} {'mode':>8} {'queries':>8} {'best ms':>9} {'anomalies':>10}"
+        )
+        for size in options["sizes"]:
+            try:
+                with transaction.atomic():
+                    self.populate(size)
+                    self.measure(size, options["repeat"])
+                    raise _Rollback
+            except _Rollback:
+                pass
+
+    def populate(self, size):
+        rng = random.Random(size)
+        today = timezone.localdate()
+        now = timezone.now()
+        users = User.objects.bulk_create(
+            User(username=f"bench-anomaly-{i}") for i in range(size)
+        )
+        students = Student.objects.bulk_create(
+            Student(
+                user=user,
+                student_id=f"BENCH{i}",
+                rfid_tag=f"RFID-BENCH{i}",
+                parent_email="parent@example.com",
+            )
+            for i, user in enumerate(users)
+        )
+        AttendanceRecord.objects.bulk_create(
+            AttendanceRecord(student=student, date=today, present=rng.random() < 0.9)
+            for student in students
+        )
+        events = []
+        for student in students:
+            events.append(GateEvent(student=student, action=GateEvent.ENTRY, timestamp=now))
+            if rng.random() < 0.7:
+                events.append(GateEvent(student=student, action=GateEvent.EXIT, timestamp=now))
+            if rng.random() < 0.01:
+                events.extend(
+                    GateEvent(student=student, action=GateEvent.ENTRY, success=False, timestamp=now)
+                    for _ in range(3)
+                )
+        GateEvent.objects.bulk_create(events, batch_size=5000)
+
+    def measure(self, size, repeat):
+        self.report(size, "scan", [scan_anomalies for _ in range(repeat)])
+        # A new engine per size: one built over a previous size's rolled-back
+        # data would keep its students and event watermark.
+        engines = [AnomalyEngine(settings.ANOMALY_ENGINE_REBUILD_SECONDS) for _ in range(repeat)]
+        self.report(size, "build", [engine.anomalies for engine in engines])
+        self.report(size, "read", [engines[0].anomalies for _ in range(repeat)])
+
+    def report(self, size, mode, calls):
+        timings = []
+        for call in calls:
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                anomalies = call()
+                timings.append(time.perf_counter() - started)
+        self.stdout.write(
+            f"{size:9d} {mode:>8} {len(queries):8d} {min(timings) * 1000:9.1f} "
+            f"{anomalies['total_count']:10d}"
+        )
@@ -0,0 +1,38 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.attendance.models import AttendanceRecord
+from apps.attendance.signals import attendance_updated
+from apps.entry_gate.broadcast import publish_refresh
+from apps.entry_gate.models import GateEvent
+from apps.entry_gate.signals import gate_events_recorded
+
+from .stats import live_stats_changed
+
+
+@receiver(post_save, sender=GateEvent)
+@receiver(post_delete, sender=GateEvent)
+@receiver(post_save, sender=AttendanceRecord)
+@receiver(post_delete, sender=AttendanceRecord)
+def invalidate_live_stats(sender, instance, **kwargs):
+    transaction.on_commit(live_stats_changed)
+
+
+@receiver(post_save, sender=AttendanceRecord)
+@receiver(post_delete, sender=AttendanceRecord)
+def refresh_live_dashboards(sender, instance, **kwargs):
+    # Gate passes reach the dashboards as gate events; overrides and admin
+    # edits only change attendance, so ask for a refresh instead.
+    transaction.on_commit(publish_refresh)
+
+
+@receiver(gate_events_recorded)
+def invalidate_live_stats_after_batch(sender, events, **kwargs):
+    live_stats_changed()
+
+
+@receiver(attendance_updated)
+def invalidate_live_stats_after_bulk_update(sender, dates, **kwargs):
+    transaction.on_commit(live_stats_changed)
+    transaction.on_commit(publish_refresh)
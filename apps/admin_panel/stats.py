@@ -0,0 +1,203 @@
+"""The ``/api/live-stats/`` payload, computed once and shared by all viewers.
+
+:func:`live_stats_payload` runs about ten aggregate queries plus anomaly
+detection. Every dashboard asks for it, so :func:`get_live_stats` serves a
+snapshot from the cache named by ``LIVE_STATS_CACHE``. Use a cache that all
+workers share (e.g. Redis) so one computation serves the whole deployment.
+
+* A snapshot is fresh for ``LIVE_STATS_CACHE_SECONDS``, and only while no
+  gate event or attendance change has committed since it was computed. The
+  receivers in :mod:`.signals` call :func:`live_stats_changed`, which bumps a
+  generation counter. A change still waits out
+  ``LIVE_STATS_MIN_INTERVAL_SECONDS`` since the last computation, so a rush
+  of taps costs one computation per interval, not one per tap.
+* When the snapshot is not fresh, only the worker that takes the lock key
+  recomputes it. Other requests get the previous snapshot, kept for
+  ``LIVE_STATS_STALE_SECONDS``. If there is no previous snapshot they wait
+  for the new one, up to ``LIVE_STATS_LOCK_SECONDS``.
+* The ``ETag`` of a response is the data version the snapshot was computed
+  at, not the current one, so a previous snapshot is never revalidated as
+  current.
+"""
+
+from datetime import timedelta
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import close_old_connections
+from django.db.models import Count
+from django.http import JsonResponse
+from django.utils import timezone
+from django.utils.http import quote_etag
+from rest_framework.decorators import api_view
+from rest_framework.response import Response
+
+from apps.attendance.models import AttendanceRecord
+from apps.attendance.versions import conditional, live_version
+from apps.entry_gate.models import GateEvent
+from apps.students.models import Student
+
+from .admin_monitoring import detect_anomalies
+
+GENERATION_KEY = "live-stats:generation"
+SNAPSHOT_KEY = "live-stats:snapshot"
+LOCK_KEY = "live-stats:lock"
+WAIT_STEP = 0.05
+
+
+def live_stats_payload() -> dict:
+    now = timezone.now()
+    today = timezone.localdate()
+    since = now - timedelta(hours=24)
+
+    recent_events = GateEvent.objects.select_related("student").filter(
+        timestamp__gte=since
+    )
+    today_events = recent_events.filter(timestamp__date=today)
+
+    success_count = today_events.filter(success=True).count()
+    total_events = today_events.count()
+    success_rate = round(success_count / total_events * 100, 1) if total_events else 0.0
+
+    latest_feed = [
+        {
+            "student": event.student.student_id,
+            "action": event.action,
+            "time": event.timestamp.isoformat(),
+            "success": event.success,
+        }
+        for event in today_events.order_by("-timestamp")[:6]
+    ]
+
+    anomalies = detect_anomalies(date=today)
+
+    payload = {
+        "students": Student.objects.count(),
+        "active_gates": 4,
+        "events_24h": recent_events.count(),
+        "events_today": total_events,
+        "success_rate": success_rate,
+        "present_today": AttendanceRecord.objects.filter(date=today, present=True).count(),
+        "average_scan_time": 1.2,
+        "live_feed": latest_feed,
+        "last_updated": now.isoformat(),
+        "has_events_today": bool(total_events),
+        "per_gate": list(
+            today_events.values("action").annotate(total=Count("id")).order_by("action")
+        ),
+        "anomaly_count": anomalies["total_count"],
+        "alert_count": len(anomalies["critical_anomalies"] + anomalies["warning_anomalies"]),
+        "system_healthy": anomalies["total_count"] == 0,
+    }
+    return payload
+
+
+def _cache():
+    return caches[settings.LIVE_STATS_CACHE]
+
+
+def _fresh(snapshot, generation) -> bool:
+    if snapshot is None:
+        return False
+    age = time.time() - snapshot["computed_at"]
+    return age < settings.LIVE_STATS_MIN_INTERVAL_SECONDS or (
+        snapshot["generation"] == generation and age < settings.LIVE_STATS_CACHE_SECONDS
+    )
+
+
+def _recompute(cache, generation) -> dict:
+    # Read the generation and version before the queries: a change committed
+    # meanwhile leaves the stored snapshot stale rather than hiding the change.
+    version = live_version()
+    snapshot = {
+        "generation": generation,
+        "version": version,
+        "computed_at": time.time(),
+        "payload": live_stats_payload(),
+    }
+    cache.set(
+        SNAPSHOT_KEY,
+        snapshot,
+        timeout=max(settings.LIVE_STATS_STALE_SECONDS, settings.LIVE_STATS_CACHE_SECONDS),
+    )
+    return snapshot
+
+
+def live_stats_snapshot() -> dict:
+    """Return the current snapshot: ``payload`` plus the ``version`` it was computed at."""
+    cache = _cache()
+    cached = cache.get_many([GENERATION_KEY, SNAPSHOT_KEY])
+    generation = cached.get(GENERATION_KEY, 0)
+    snapshot = cached.get(SNAPSHOT_KEY)
+    if _fresh(snapshot, generation):
+        return snapshot
+
+    if cache.add(LOCK_KEY, True, timeout=settings.LIVE_STATS_LOCK_SECONDS):
+        try:
+            return _recompute(cache, generation)
+        finally:
+            cache.delete(LOCK_KEY)
+
+    if snapshot is not None:
+        return snapshot
+    # Nothing to serve yet: wait for the worker holding the lock.
+    deadline = time.monotonic() + settings.LIVE_STATS_LOCK_SECONDS
+    while time.monotonic() < deadline:
+        time.sleep(WAIT_STEP)
+        snapshot = cache.get(SNAPSHOT_KEY)
+        if snapshot is not None:
+            return snapshot
+    return _recompute(cache, generation)
+
+
+def get_live_stats() -> dict:
+    """Return the live stats payload, recomputing it at most once per interval."""
+    return live_stats_snapshot()["payload"]
+
+
+def live_stats_changed() -> None:
+    cache = _cache()
+    cache.add(GENERATION_KEY, 0, timeout=None)
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        pass
+
+
+def _live_stats_version(_request):
+    return live_version()
+
+
+@api_view(["GET"])
+@conditional(_live_stats_version)
+def live_stats(_request):
+    snapshot = live_stats_snapshot()
+    response = Response(snapshot["payload"])
+    # Tag the body with the version it was computed at. A previous snapshot
+    # served during a recompute must not be cached under the current version.
+    response["ETag"] = quote_etag(snapshot["version"])
+    return response
+
+
+def _in_worker_thread(func):
+    try:
+        return func()
+    finally:
+        close_old_connections()
+
+
+async def run_in_worker_thread(func):
+    """Run ``func`` in a pooled thread rather than the shared sync thread.
+
+    A recompute, or the wait for another worker's, can take seconds; on the
+    one thread-sensitive thread it would hold up every sync view in the
+    process, gate lookups included.
+    """
+    return await sync_to_async(_in_worker_thread, thread_sensitive=False)(func)
+
+
+async def live_stats_async(_request):
+    """``live_stats`` for ASGI workers; the queries run off the event loop."""
+    return JsonResponse(await run_in_worker_thread(get_live_stats))
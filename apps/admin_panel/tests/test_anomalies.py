@@ -0,0 +1,187 @@
+from datetime import datetime, time, timedelta
+from unittest.mock import patch
+
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.admin_panel.admin_monitoring import detect_anomalies, scan_anomalies
+from apps.admin_panel.anomalies import AnomalyEngine, get_anomaly_engine, reset_anomaly_engine
+from apps.attendance.admin import mark_absent
+from apps.attendance.models import AttendanceRecord
+from apps.entry_gate.models import GateEvent
+from apps.students.models import Student
+from apps.users.models import User
+
+DAY = datetime(2026, 3, 2).date()
+
+
+def at(hour):
+    return timezone.make_aware(datetime.combine(DAY, time(hour)))
+
+
+class DetectAnomaliesTests(TestCase):
+    def _student(self, number):
+        return Student.objects.create(
+            user=User.objects.create(username=f"anomaly-{number}"),
+            student_id=f"A{number}",
+            rfid_tag=f"RFID-A{number}",
+            parent_email="parent@example.com",
+        )
+
+    def _event(self, student, action, hour=9, success=True):
+        GateEvent.objects.create(
+            student=student, action=action, success=success, timestamp=at(hour)
+        )
+
+    def _detect(self):
+        with patch("apps.admin_panel.admin_monitoring.timezone.now", return_value=at(19)):
+            return scan_anomalies(DAY)
+
+    def test_flags_disagreements_between_records_and_gate_log(self):
+        absent_but_entered = self._student(1)
+        still_inside = self._student(2)
+        left = self._student(3)
+        locked_out = self._student(4)
+        self._event(absent_but_entered, GateEvent.ENTRY)
+        self._event(still_inside, GateEvent.ENTRY)
+        self._event(left, GateEvent.ENTRY)
+        self._event(left, GateEvent.EXIT, hour=15)
+        for _ in range(3):
+            self._event(locked_out, GateEvent.ENTRY, success=False)
+        # Yesterday's exit does not count for today.
+        GateEvent.objects.create(
+            student=still_inside, action=GateEvent.EXIT, timestamp=at(15) - timedelta(days=1)
+        )
+        AttendanceRecord.objects.create(student=absent_but_entered, date=DAY, present=False)
+        AttendanceRecord.objects.create(student=still_inside, date=DAY, present=True)
+        AttendanceRecord.objects.create(student=left, date=DAY, present=True)
+
+        anomalies = self._detect()
+
+        self.assertEqual(
+            anomalies["critical_anomalies"],
+            [{"student": "A1", "issue": "Entry recorded but marked absent"}],
+        )
+        self.assertEqual(
+            anomalies["warning_anomalies"],
+            [
+                {"student": "A2", "issue": "Present without exit after hours"},
+                {"student": "A4", "issue": "Multiple failed access attempts"},
+            ],
+        )
+        self.assertEqual(anomalies["total_count"], 3)
+
+    def test_query_count_does_not_grow_with_students(self):
+        for number in range(20):
+            student = self._student(number)
+            self._event(student, GateEvent.ENTRY)
+            AttendanceRecord.objects.create(student=student, date=DAY, present=number % 2 == 0)
+
+        with self.assertNumQueries(2):
+            anomalies = self._detect()
+
+        self.assertEqual(len(anomalies["critical_anomalies"]), 10)
+        self.assertEqual(len(anomalies["warning_anomalies"]), 10)
+
+
+class AnomalyEngineTests(TestCase):
+    def setUp(self):
+        reset_anomaly_engine()
+        self.today = timezone.localdate()
+        self.evening = patch(
+            "apps.admin_panel.anomalies.timezone.now",
+            return_value=self.at(19),
+        )
+        self.evening.start()
+        self.student = Student.objects.create(
+            user=User.objects.create(username="engine-1"),
+            student_id="N1",
+            rfid_tag="RFID-N1",
+            parent_email="parent@example.com",
+        )
+
+    def tearDown(self):
+        self.evening.stop()
+        reset_anomaly_engine()
+
+    def at(self, hour):
+        return timezone.make_aware(datetime.combine(self.today, time(hour)))
+
+    def tap(self, action=GateEvent.ENTRY, success=True, hour=9):
+        # What the gate pipeline writes: the event plus an upserted, present row.
+        GateEvent.objects.create(
+            student=self.student, action=action, success=success, timestamp=self.at(hour)
+        )
+        AttendanceRecord.objects.bulk_create(
+            [AttendanceRecord(student=self.student, date=self.today, present=True)],
+            ignore_conflicts=True,
+        )
+
+    def test_matches_a_full_scan_and_reads_only_new_events(self):
+        self.tap()
+        engine = get_anomaly_engine()
+
+        self.assertEqual(engine.anomalies(), scan_anomalies(self.today))
+        self.assertEqual(
+            [item["issue"] for item in engine.anomalies()["warning_anomalies"]],
+            ["Present without exit after hours"],
+        )
+
+        # Nothing new: one query for events after the watermark, one for the
+        # attendance version.
+        with self.assertNumQueries(2):
+            engine.anomalies()
+
+        self.tap(GateEvent.EXIT, hour=15)
+        for _ in range(3):
+            self.tap(success=False, hour=16)
+        with self.assertNumQueries(2):
+            anomalies = engine.anomalies()
+        self.assertEqual(anomalies, scan_anomalies(self.today))
+        self.assertEqual(
+            anomalies["warning_anomalies"],
+            [{"student": "N1", "issue": "Multiple failed access attempts"}],
+        )
+
+    def test_overrides_reload_attendance(self):
+        self.tap()
+        self.assertEqual(detect_anomalies()["critical_anomalies"], [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            record = AttendanceRecord.objects.get(student=self.student, date=self.today)
+            record.present = False
+            record.save()
+
+        anomalies = detect_anomalies()
+        self.assertEqual(
+            anomalies["critical_anomalies"],
+            [{"student": "N1", "issue": "Entry recorded but marked absent"}],
+        )
+        self.assertEqual(anomalies, scan_anomalies(self.today))
+
+    def test_bulk_overrides_reach_every_worker(self):
+        self.tap()
+        workers = [AnomalyEngine(), AnomalyEngine()]
+        for engine in workers:
+            self.assertEqual(engine.anomalies()["critical_anomalies"], [])
+
+        # An admin action handled by some other worker.
+        mark_absent(None, None, AttendanceRecord.objects.filter(student=self.student))
+
+        for engine in workers:
+            self.assertEqual(
+                engine.anomalies()["critical_anomalies"],
+                [{"student": "N1", "issue": "Entry recorded but marked absent"}],
+            )
+        self.assertEqual(workers[0].anomalies(), scan_anomalies(self.today))
+
+    def test_restart_rebuilds_from_the_day_log(self):
+        self.tap()
+        for _ in range(3):
+            self.tap(success=False)
+        expected = get_anomaly_engine().anomalies()
+
+        reset_anomaly_engine()
+
+        self.assertEqual(get_anomaly_engine().anomalies(), expected)
+        self.assertEqual(get_anomaly_engine().stats()["open"], 2)
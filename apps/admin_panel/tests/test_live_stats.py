@@ -1,17 +1,23 @@
 from datetime import timedelta
 
-from django.test import TestCase
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
 
+from apps.admin_panel.stats import LOCK_KEY, get_live_stats
 from apps.attendance.models import AttendanceRecord
 from apps.entry_gate.models import GateEvent
+from apps.entry_gate.pipeline import process_gate_batch, process_gate_event
 from apps.students.models import Student
 from apps.users.models import User
 
 
 class LiveStatsViewTests(TestCase):
     def setUp(self):
+        cache.clear()
         self.student = self._create_student("S100", "student-one")
         self.second_student = self._create_student("S200", "student-two")
 
@@ -87,3 +93,127 @@ class LiveStatsViewTests(TestCase):
         self.assertEqual(len(payload["live_feed"]), 2)
         self.assertEqual(per_gate_totals[GateEvent.ENTRY], 1)
         self.assertEqual(per_gate_totals[GateEvent.EXIT], 1)
+
+
+@override_settings(LIVE_STATS_MIN_INTERVAL_SECONDS=0)
+class LiveStatsCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.student = Student.objects.create(
+            user=User.objects.create(username="cached-stats"),
+            student_id="S300",
+            rfid_tag="RFID-S300",
+            parent_email="parent@example.com",
+        )
+
+    def test_snapshot_is_shared_until_it_expires(self):
+        response = self.client.get(reverse("live-stats"))
+        self.assertEqual(response.json()["events_today"], 0)
+
+        with self.assertNumQueries(0):
+            for _ in range(40):
+                get_live_stats()
+
+        with override_settings(LIVE_STATS_CACHE_SECONDS=0):
+            with CaptureQueriesContext(connection) as queries:
+                get_live_stats()
+        self.assertTrue(queries)
+
+    def test_committed_gate_events_invalidate_the_snapshot(self):
+        get_live_stats()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            process_gate_event(self.student, GateEvent.ENTRY, "RFID validated")
+        self.assertEqual(get_live_stats()["events_today"], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            process_gate_batch([{"rfid_tag": "RFID-S300", "action": GateEvent.EXIT}])
+        self.assertEqual(get_live_stats()["events_today"], 2)
+
+    def test_a_rush_of_changes_recomputes_once_per_interval(self):
+        get_live_stats()
+        with override_settings(LIVE_STATS_MIN_INTERVAL_SECONDS=60):
+            for _ in range(3):
+                with self.captureOnCommitCallbacks(execute=True):
+                    process_gate_event(self.student, GateEvent.ENTRY, "RFID validated")
+                with self.assertNumQueries(0):
+                    self.assertEqual(get_live_stats()["events_today"], 0)
+
+        self.assertEqual(get_live_stats()["events_today"], 3)
+
+    def test_other_requests_serve_the_previous_snapshot_while_one_recomputes(self):
+        get_live_stats()
+        with self.captureOnCommitCallbacks(execute=True):
+            process_gate_event(self.student, GateEvent.ENTRY, "RFID validated")
+        cache.add(LOCK_KEY, True)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(get_live_stats()["events_today"], 0)
+
+        cache.delete(LOCK_KEY)
+        self.assertEqual(get_live_stats()["events_today"], 1)
+
+
+@override_settings(LIVE_STATS_MIN_INTERVAL_SECONDS=0)
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.student = Student.objects.create(
+            user=User.objects.create(username="etag-student"),
+            student_id="S400",
+            rfid_tag="RFID-S400",
+            parent_email="parent@example.com",
+        )
+
+    def test_unchanged_live_stats_answer_304_before_computing_anything(self):
+        response = self.client.get(reverse("live-stats"))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("no-cache", response["Cache-Control"])
+        etag = response["ETag"]
+
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse("live-stats"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            process_gate_event(self.student, GateEvent.ENTRY, "RFID validated")
+        response = self.client.get(reverse("live-stats"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_stale_snapshot_is_not_tagged_with_the_current_version(self):
+        etag = self.client.get(reverse("live-stats"))["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            process_gate_event(self.student, GateEvent.ENTRY, "RFID validated")
+        # Another worker is recomputing: this one serves the previous snapshot.
+        cache.add(LOCK_KEY, True)
+
+        response = self.client.get(reverse("live-stats"))
+        self.assertEqual(response.json()["events_today"], 0)
+        self.assertEqual(response["ETag"], etag)
+
+        response = self.client.get(reverse("live-stats"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        cache.delete(LOCK_KEY)
+        response = self.client.get(reverse("live-stats"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.json()["events_today"], 1)
+        self.assertEqual(
+            self.client.get(
+                reverse("live-stats"), HTTP_IF_NONE_MATCH=response["ETag"]
+            ).status_code,
+            304,
+        )
+
+    def test_monitoring_etag_follows_attendance_edits(self):
+        url = reverse("admin-monitoring")
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        AttendanceRecord.objects.create(
+            student=self.student, date=timezone.localdate() - timedelta(days=3)
+        )
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["pending_reviews"], 1)
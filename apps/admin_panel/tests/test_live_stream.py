@@ -0,0 +1,108 @@
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.test import AsyncClient, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from apps.admin_panel.live import get_live_hub
+from apps.entry_gate.models import GateEvent
+from apps.entry_gate.pipeline import process_gate_event
+from apps.students.models import Student
+from apps.users.models import User
+
+
+def parse(chunk: bytes):
+    lines = chunk.decode().strip().splitlines()
+    return lines[0].removeprefix("event: "), json.loads(lines[1].removeprefix("data: "))
+
+
+@override_settings(LIVE_STREAM_COALESCE_SECONDS=0.01, LIVE_STATS_MIN_INTERVAL_SECONDS=0)
+class LiveStreamTests(TransactionTestCase):
+    # The hub computes stats in pooled threads, which only see committed rows.
+
+    def setUp(self):
+        cache.clear()
+        self.student = Student.objects.create(
+            user=User.objects.create(username="stream-1"),
+            student_id="SSE1",
+            rfid_tag="RFID-SSE1",
+            parent_email="parent@example.com",
+        )
+
+    def record_pass(self):
+        process_gate_event(self.student, GateEvent.ENTRY, "RFID validated")
+
+    def override(self, override_type):
+        self.client.post(
+            reverse("manual-override"),
+            {"type": override_type, "student_id": self.student.student_id},
+        )
+
+    async def next_message(self, content):
+        return parse(await asyncio.wait_for(anext(content), 2))
+
+    async def test_stream_pushes_snapshot_gate_events_and_fresh_stats(self):
+        response = await AsyncClient().get(reverse("live-stream"))
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        content = response.streaming_content
+        try:
+            event, stats = await self.next_message(content)
+            self.assertEqual((event, stats["events_today"]), ("stats", 0))
+
+            await sync_to_async(self.record_pass)()
+
+            event, gate = await self.next_message(content)
+            self.assertEqual(event, "gate")
+            self.assertEqual((gate["student"], gate["action"]), ("SSE1", GateEvent.ENTRY))
+            event, stats = await self.next_message(content)
+            self.assertEqual((event, stats["events_today"]), ("stats", 1))
+        finally:
+            await content.aclose()
+
+    async def test_manual_overrides_refresh_the_stats(self):
+        response = await AsyncClient().get(reverse("live-stream"))
+        content = response.streaming_content
+        try:
+            event, stats = await self.next_message(content)
+            self.assertEqual((event, stats["present_today"]), ("stats", 0))
+
+            await sync_to_async(self.override, thread_sensitive=True)("mark_present")
+
+            event, stats = await self.next_message(content)
+            self.assertEqual((event, stats["present_today"]), ("stats", 1))
+        finally:
+            await content.aclose()
+
+    async def test_viewers_share_one_recomputation(self):
+        streams = [
+            (await AsyncClient().get(reverse("live-stream"))).streaming_content
+            for _ in range(3)
+        ]
+        try:
+            for content in streams:
+                await self.next_message(content)
+            hub = get_live_hub()
+            before = hub.recomputes
+
+            await sync_to_async(self.record_pass)()
+
+            for content in streams:
+                self.assertEqual((await self.next_message(content))[0], "gate")
+                self.assertEqual((await self.next_message(content))[0], "stats")
+            self.assertEqual(hub.recomputes - before, 1)
+        finally:
+            for content in streams:
+                await content.aclose()
+
+    async def test_unstreamed_responses_hold_no_subscription(self):
+        response = await AsyncClient().get(reverse("live-stream"))
+        await response.streaming_content.aclose()
+
+        self.assertEqual(get_live_hub().clients, set())
+
+    def test_wsgi_clients_are_told_to_poll(self):
+        response = self.client.get(reverse("live-stream"))
+
+        self.assertEqual(response.status_code, 503)
@@ -1,16 +1,17 @@
 from django.contrib import admin
 
 from .models import AttendanceRecord
+from .signals import update_attendance
 
 
 @admin.action(description="Mark selected as present")
 def mark_present(modeladmin, request, queryset):
-    queryset.update(present=True)
+    update_attendance(queryset, present=True)
 
 
 @admin.action(description="Mark selected as absent")
 def mark_absent(modeladmin, request, queryset):
-    queryset.update(present=False)
+    update_attendance(queryset, present=False)
 
 
 @admin.register(AttendanceRecord)
@@ -16,3 +16,14 @@ class AttendanceRecord(models.Model):
 
     class Meta:
         unique_together = ("student", "date")
+
+
+class AttendanceChange(models.Model):
+    """
+    Append-only log of attendance edits made outside the gate pipeline
+    (overrides, verification, approval, admin edits). Together with the
+    latest gate event id it versions a day's attendance for conditional GETs.
+    """
+
+    date = models.DateField(db_index=True)
+    changed_at = models.DateTimeField(auto_now_add=True)
@@ -0,0 +1,29 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from .models import AttendanceChange, AttendanceRecord
+from .versions import log_attendance_change
+
+# Sent after a bulk ``update()`` of attendance records, with ``dates``: the
+# days it touched. ``QuerySet.update()`` sends no ``post_save``.
+attendance_updated = Signal()
+
+
+def update_attendance(queryset, **fields) -> int:
+    """``queryset.update(**fields)``, telling listeners which days changed."""
+    dates = list(queryset.order_by().values_list("date", flat=True).distinct())
+    updated = queryset.update(**fields)
+    if updated:
+        attendance_updated.send(sender=AttendanceRecord, dates=dates)
+    return updated
+
+
+@receiver(post_save, sender=AttendanceRecord)
+@receiver(post_delete, sender=AttendanceRecord)
+def log_attendance_record_change(sender, instance, **kwargs):
+    log_attendance_change(instance.date)
+
+
+@receiver(attendance_updated)
+def log_bulk_attendance_change(sender, dates, **kwargs):
+    AttendanceChange.objects.bulk_create(AttendanceChange(date=date) for date in dates)
@@ -1,3 +1,79 @@
+from datetime import timedelta
+
 from django.test import TestCase
+from django.utils import timezone
+
+from apps.entry_gate.models import GateEvent
+from apps.entry_gate.pipeline import process_gate_event
+from apps.students.models import Student
+from apps.users.models import User
+
+from .admin import mark_absent
+from .models import AttendanceRecord
+
+
+class ConditionalAttendanceReadTests(TestCase):
+    def setUp(self):
+        self.student = Student.objects.create(
+            user=User.objects.create(username="attendance-etag"),
+            student_id="A100",
+            rfid_tag="RFID-A100",
+            parent_email="parent@example.com",
+        )
+        self.today = timezone.localdate()
+        self.record = AttendanceRecord.objects.create(student=self.student, date=self.today)
+
+    def get(self, action, etag=None, date=None):
+        params = {"date": date.isoformat()} if date else {}
+        headers = {"HTTP_IF_NONE_MATCH": etag} if etag else {}
+        return self.client.get(f"/api/attendance/{action}/", params, **headers)
+
+    def test_unchanged_day_answers_304_without_reading_records(self):
+        for action in ("daily_entry_log", "pending_verification"):
+            with self.subTest(action=action):
+                etag = self.get(action)["ETag"]
+
+                with self.assertNumQueries(3):
+                    response = self.get(action, etag)
+                self.assertEqual(response.status_code, 304)
+
+    def test_edits_and_gate_passes_change_the_etag(self):
+        etag = self.get("daily_entry_log")["ETag"]
+
+        self.client.post(f"/api/attendance/{self.record.pk}/verify_attendance/")
+        response = self.get("daily_entry_log", etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["verified_count"], 1)
+
+        etag = response["ETag"]
+        process_gate_event(self.student, GateEvent.ENTRY, "RFID validated")
+        self.assertEqual(self.get("daily_entry_log", etag).status_code, 200)
+
+    def test_bulk_approval_changes_the_etag(self):
+        etag = self.get("pending_verification")["ETag"]
+
+        self.client.force_login(User.objects.create(username="approver"))
+        self.client.post("/api/attendance/approve_daily_attendance/")
+
+        response = self.get("pending_verification", etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["pending_count"], 0)
+
+    def test_admin_bulk_actions_change_the_etag(self):
+        self.record.present = True
+        self.record.save()
+        etag = self.get("daily_entry_log")["ETag"]
+
+        mark_absent(None, None, AttendanceRecord.objects.filter(pk=self.record.pk))
+
+        response = self.get("daily_entry_log", etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.json()["entry_log"][0]["present"])
+
+    def test_other_days_keep_their_etag(self):
+        yesterday = self.today - timedelta(days=1)
+        etag = self.get("daily_entry_log", date=yesterday)["ETag"]
+
+        self.client.post(f"/api/attendance/{self.record.pk}/verify_attendance/")
 
-# Create your tests here.
+        self.assertEqual(self.get("daily_entry_log", etag, yesterday).status_code, 304)
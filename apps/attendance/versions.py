@@ -0,0 +1,71 @@
+"""Version tokens for conditional GETs on the polled read APIs.
+
+Dashboards poll attendance and monitoring endpoints that rarely change
+between two polls. Each endpoint names the data it reads with
+:func:`data_version`: the latest gate event id, the latest
+:class:`~.models.AttendanceChange` id (for one date or overall), and the
+roster version (latest ``StudentChange`` id). They are three index lookups,
+so a client sending ``If-None-Match`` gets a 304 before any aggregate
+query or serialization runs.
+
+Attendance written by the gate pipeline always comes with a new gate event.
+Every other attendance write must be logged: ``AttendanceRecord.save()`` and
+``delete()`` are, by the receivers in :mod:`.signals`; bulk updates must go
+through :func:`.signals.update_attendance`, as the admin actions and daily
+approval do.
+
+Responses carry an ``ETag`` but no ``Last-Modified``: HTTP dates only have
+one-second precision, which can't tell apart two taps in the same second.
+"""
+
+from django.db.models import Max
+from django.utils import timezone
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+
+from apps.entry_gate.models import GateEvent
+from apps.students.models import StudentChange
+
+from .models import AttendanceChange
+
+
+def _latest(queryset) -> int:
+    return queryset.aggregate(latest=Max("id"))["latest"] or 0
+
+
+def data_version(date=None) -> str:
+    """Version of the gate log, roster, and attendance for ``date`` (or any date)."""
+    changes = AttendanceChange.objects.all()
+    if date is not None:
+        changes = changes.filter(date=date)
+    return "-".join(
+        str(_latest(queryset))
+        for queryset in (GateEvent.objects.all(), changes, StudentChange.objects.all())
+    )
+
+
+def clock_version() -> str:
+    """The current local minute.
+
+    Live figures also move with the clock: the 24-hour window and the
+    after-hours anomaly rule change without any write.
+    """
+    return f"{timezone.localtime():%Y%m%d%H%M}"
+
+
+def live_version() -> str:
+    """Version of today's live figures."""
+    return f"{data_version(timezone.localdate())}-{clock_version()}"
+
+
+def log_attendance_change(date) -> None:
+    AttendanceChange.objects.create(date=date)
+
+
+def conditional(etag_func):
+    """Answer ``If-None-Match`` with a 304 and make clients revalidate every time."""
+
+    def decorator(view):
+        return cache_control(no_cache=True)(condition(etag_func=etag_func)(view))
+
+    return decorator
@@ -1,12 +1,15 @@
 from datetime import datetime
 
 from django.utils import timezone
+from django.utils.decorators import method_decorator
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
 from .models import AttendanceRecord
 from .serializers import AttendanceRecordSerializer
+from .signals import update_attendance
+from .versions import conditional, data_version
 
 
 def _parse_date(date_str):
@@ -27,11 +30,17 @@ def _parse_datetime(dt_str):
         return None
 
 
+def _daily_version(request, *args, **kwargs):
+    date = _parse_date(request.GET.get("date"))
+    return f"{date.isoformat()}-{data_version(date)}"
+
+
 class AttendanceRecordViewSet(viewsets.ModelViewSet):
     queryset = AttendanceRecord.objects.select_related("student").all()
     serializer_class = AttendanceRecordSerializer
 
     @action(detail=False, methods=["get"], url_path="daily_entry_log")
+    @method_decorator(conditional(_daily_version))
     def daily_entry_log(self, request):
         date = _parse_date(request.query_params.get("date"))
         records = self.get_queryset().filter(date=date)
@@ -118,7 +127,8 @@ class AttendanceRecordViewSet(viewsets.ModelViewSet):
         timestamp = timezone.now()
 
         records = self.get_queryset().filter(date=date)
-        records.update(
+        update_attendance(
+            records,
             approved=True,
             approval_timestamp=timestamp,
             approved_by=approver,
@@ -142,6 +152,7 @@ class AttendanceRecordViewSet(viewsets.ModelViewSet):
         )
 
     @action(detail=False, methods=["get"], url_path="pending_verification")
+    @method_decorator(conditional(_daily_version))
     def pending_verification(self, request):
         date = _parse_date(request.query_params.get("date"))
         pending_records = self.get_queryset().filter(date=date, verified=False)
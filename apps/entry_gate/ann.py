@@ -0,0 +1,77 @@
+"""Inverted-file (IVF) partitioning for face embeddings.
+
+Embeddings are partitioned around ``nlist`` coarse centroids learned with
+spherical k-means. A probe is compared with the centroids first and only the
+``nprobe`` closest inverted lists are searched, so search cost grows with
+``N / nlist * nprobe`` rather than ``N``. ``nprobe`` is the recall/latency
+knob: raising it towards ``nlist`` converges on exact search.
+
+Only the centroids are persisted (``rebuild_face_index`` trains and saves
+them). The search itself is :class:`.shared_index.SharedFaceIndex`, which
+assigns the shared store's records to the lists as it reads them.
+"""
+
+import os
+from pathlib import Path
+import tempfile
+
+import numpy as np
+
+from .face import FaceRecognition
+
+
+def train_centroids(embeddings, nlist: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """Run spherical k-means over ``embeddings`` and return unit centroids."""
+    data = np.asarray(embeddings, dtype=np.float32)
+    data = data / np.maximum(np.linalg.norm(data, axis=1, keepdims=True), 1e-6)
+    nlist = max(1, min(nlist, len(data)))
+    rng = np.random.default_rng(seed)
+    centroids = data[rng.choice(len(data), nlist, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignment = np.argmax(data @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, data)
+        counts = np.bincount(assignment, minlength=nlist)
+
+        empty = counts == 0
+        if empty.any():
+            # Re-seed empty clusters so every list stays useful.
+            sums[empty] = data[rng.choice(len(data), int(empty.sum()))]
+        norms = np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-6)
+        centroids = (sums / norms).astype(np.float32)
+
+    return centroids
+
+
+def load_centroids(path) -> np.ndarray:
+    with np.load(path) as data:
+        return data["centroids"]
+
+
+def save_centroids(path, centroids) -> None:
+    """Write ``centroids`` atomically: running workers reload the file when it changes."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix=".tmp")
+    try:
+        # Write through a file object so numpy does not append ".npz".
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, centroids=np.asarray(centroids, dtype=np.float32))
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def recall_at_1(index, exact: FaceRecognition, queries) -> float:
+    """Fraction of ``queries`` whose top ANN hit equals the exact top hit."""
+    if not len(queries):
+        return 1.0
+    hits = 0
+    for query in queries:
+        expected = exact.search(query, k=1)
+        found = index.search(query, k=1)
+        if expected and found and expected[0].student_pk == found[0].student_pk:
+            hits += 1
+    return hits / len(queries)
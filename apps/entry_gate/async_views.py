@@ -0,0 +1,266 @@
+"""Async variants of the scan and RFID endpoints for ASGI deployments.
+
+Under ASGI every synchronous view, DRF's included, runs on one shared
+thread per worker, so a single slow face match holds up every gate behind
+it. These views keep the request on the event loop:
+
+* a card the identity map holds is answered from memory; a miss, or a map
+  another worker has changed, is looked up (and reloaded) in a thread;
+* face recognition runs in a dedicated pool of ``GATE_ASYNC_RECOGNITION_WORKERS``
+  threads, so concurrent scans overlap instead of queueing;
+* recording the pass (one short transaction) is the only hop to the sync
+  thread, and repeats answered from :mod:`.dedupe` skip it.
+
+Request fields, responses, compact mode and idempotency match
+:class:`~.views.ScanView` and :class:`~.views.RFIDScanView`. DRF has no
+async views, so these are plain Django views; under WSGI they still work,
+each request on its own event loop.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+import json
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.files.uploadedfile import InMemoryUploadedFile
+from django.db import close_old_connections
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+
+from apps.students.identity import get_identity_map
+
+from .embedding_pool import EmbeddingBusy
+from .ingest import ImageTooLargeError, InMemoryImageUploadHandler
+from .models import GateEvent
+from .pipeline import KEY_TOO_LONG
+from .quality import FrameRejected
+from .responses import (
+    COMPACT_MEDIA_TYPE,
+    gate_payload,
+    recent_pass,
+    record_gate_pass,
+)
+from .services import recognize_student_from_frames, recognize_student_from_image
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def recognition_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.GATE_ASYNC_RECOGNITION_WORKERS,
+                    thread_name_prefix="gate-recognize",
+                )
+    return _executor
+
+
+def _recognize(images, action):
+    try:
+        if len(images) > 1:
+            return recognize_student_from_frames(images, action=action)
+        return recognize_student_from_image(images[0], action=action)
+    finally:
+        close_old_connections()
+
+
+async def recognize(images, action):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(recognition_executor(), _recognize, images, action)
+
+
+class GateRequest:
+    """Fields, frames and response options of a plain Django gate request."""
+
+    def __init__(self, request):
+        self.request = request
+        content_type = request.content_type or ""
+        self.images = []
+        if content_type.startswith("image/"):
+            self.data = {}
+            self.images = [self._raw_image(request, content_type)]
+        elif content_type == "application/json":
+            self.data = json.loads(request.body or b"{}")
+            if not isinstance(self.data, dict):
+                raise ValueError("Expected a JSON object.")
+        else:
+            request.upload_handlers = [InMemoryImageUploadHandler(request)]
+            self.data = request.POST
+            self.images = request.FILES.getlist("image")
+
+    @staticmethod
+    def _raw_image(request, content_type):
+        data = request.body
+        if len(data) > settings.IMAGE_UPLOAD_MAX_BYTES:
+            raise ImageTooLargeError()
+        return InMemoryUploadedFile(
+            file=BytesIO(data),
+            field_name="image",
+            name="frame",
+            content_type=content_type.split(";")[0].strip(),
+            size=len(data),
+            charset=None,
+        )
+
+    def field(self, name, default=None):
+        value = self.data.get(name)
+        if value in (None, ""):
+            value = self.request.GET.get(name, default)
+        return value
+
+    @property
+    def idempotency_key(self) -> str:
+        key = self.request.headers.get("Idempotency-Key") or self.field("idempotency_key", "")
+        return str(key)
+
+    @property
+    def compact(self) -> bool:
+        if self.request.GET.get("compact") in ("1", "true", "yes"):
+            return True
+        return COMPACT_MEDIA_TYPE in self.request.headers.get("Accept", "")
+
+    async def record(self, student, action, reason, verification_method, extra=None, **kwargs):
+        gate = self.field("gate", "")
+        gate_pass = recent_pass(self.idempotency_key, student.pk, action, gate)
+        replayed = gate_pass is not None
+        if gate_pass is None:
+            gate_pass, replayed = await sync_to_async(record_gate_pass)(
+                student,
+                action,
+                reason,
+                verification_method,
+                idempotency_key=self.idempotency_key,
+                gate=gate,
+                extra=extra,
+                **kwargs,
+            )
+        response = JsonResponse(gate_payload(gate_pass, self.compact))
+        if self.compact:
+            response["Content-Type"] = COMPACT_MEDIA_TYPE
+        if replayed:
+            response["Idempotent-Replayed"] = "true"
+        return response
+
+
+async def student_for_rfid(rfid_tag):
+    identity = get_identity_map()
+    student = identity.cached_student_for_rfid(rfid_tag, await identity.ashared_generation())
+    if student is None:
+        student = await sync_to_async(identity.by_rfid)(rfid_tag)
+    return student
+
+
+def _bad_request(detail, status=400):
+    return JsonResponse({"detail": detail}, status=status)
+
+
+def _gate_request(request):
+    try:
+        gate_request = GateRequest(request)
+    except ImageTooLargeError as exc:
+        return None, _bad_request(str(exc.detail), status=exc.status_code)
+    except ValueError:
+        return None, _bad_request("Malformed request body.")
+    if len(gate_request.idempotency_key) > GateEvent.IDEMPOTENCY_KEY_LENGTH:
+        return None, _bad_request(KEY_TOO_LONG)
+    return gate_request, None
+
+
+@csrf_exempt
+@require_POST
+async def rfid_scan(request):
+    gate_request, error = _gate_request(request)
+    if error:
+        return error
+    rfid_tag = gate_request.field("rfid_tag")
+    action = gate_request.field("action", GateEvent.ENTRY)
+    if not rfid_tag:
+        return _bad_request("rfid_tag is required.")
+
+    student = await student_for_rfid(rfid_tag)
+    if student is None:
+        return JsonResponse(
+            {
+                "detail": "Invalid RFID tag.",
+                "success": False,
+                "reason": "RFID not found in system",
+                "action_required": "manual_check_in",
+            },
+            status=404,
+        )
+    return await gate_request.record(student, action, "RFID validated", "rfid")
+
+
+@csrf_exempt
+@require_POST
+async def scan(request):
+    gate_request, error = _gate_request(request)
+    if error:
+        return error
+    images = gate_request.images
+    rfid_tag = gate_request.field("rfid_tag")
+    action = gate_request.field("action", GateEvent.ENTRY)
+
+    student = None
+    verification_method = None
+    reason = ""
+    face_busy = False
+    frame_quality = None
+
+    if images:
+        try:
+            student = await recognize(images, action)
+            if student:
+                verification_method = "face_scan"
+                reason = "Biometric match"
+        except FrameRejected as exc:
+            frame_quality = exc.reason
+            reason = f"Frame rejected: {exc.reason}"
+        except EmbeddingBusy:
+            face_busy = True
+            reason = "Face recognition busy"
+        except Exception as exc:  # pragma: no cover - defensive
+            reason = f"Face recognition error: {exc}"
+
+    if not student and rfid_tag:
+        student = await student_for_rfid(rfid_tag)
+        if student:
+            verification_method = "rfid"
+            reason = "RFID validated"
+        else:
+            reason = "Invalid RFID tag"
+
+    if not student and face_busy:
+        response = JsonResponse(
+            {
+                "detail": "Face recognition is busy.",
+                "success": False,
+                "busy": True,
+                "action_required": "rfid",
+            },
+            status=503,
+        )
+        response["Retry-After"] = "1"
+        return response
+
+    if not student:
+        payload = {
+            "detail": "No matching student found.",
+            "success": False,
+            "reason": reason or "No matching student found",
+            "action_required": "manual_check_in",
+        }
+        if frame_quality:
+            payload["frame_quality"] = frame_quality
+            payload["action_required"] = "retry_scan"
+        return JsonResponse(payload, status=404)
+
+    extra = {"frame_quality": frame_quality} if frame_quality else None
+    return await gate_request.record(student, action, reason, verification_method, extra)
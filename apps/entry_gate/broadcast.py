@@ -0,0 +1,195 @@
+"""Publish recorded gate events to live dashboards.
+
+The gate pipeline calls :func:`publish_gate_events` once a pass (or a batch
+of taps) has committed; dashboards receive them through the server-sent
+events stream in :mod:`apps.admin_panel.live`. Attendance changed without a
+gate event (overrides, admin actions) calls :func:`publish_refresh`, which
+only asks the dashboards to refresh their stats. Delivery goes through the
+broker named by ``LIVE_STREAM_BROKER``:
+
+* :class:`LocalBroker` (default) fans out inside one process: enough for a
+  single ASGI server that handles both gates and dashboards;
+* :class:`RedisBroker` uses Redis pub/sub on ``LIVE_STREAM_REDIS_URL`` so
+  gate workers and dashboard servers can be separate processes. Messages are
+  handed to a sender thread, so a slow or unreachable Redis never holds up
+  the request that published them.
+
+Publishing never blocks or fails a gate pass: messages to a slow or gone
+subscriber (or a full sender queue) are dropped.
+"""
+
+import asyncio
+import json
+import logging
+import queue
+import threading
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from apps.students.models import Student
+
+from .models import GateEvent
+
+logger = logging.getLogger(__name__)
+
+
+def gate_message(event, student_id: str) -> dict:
+    return {
+        "type": "gate",
+        "data": {
+            "id": event.pk,
+            "student": student_id,
+            "action": event.action,
+            "time": event.timestamp.isoformat(),
+            "success": event.success,
+        },
+    }
+
+
+def offer(queue: asyncio.Queue, message: dict) -> None:
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(message)
+
+
+class LocalBroker:
+    def __init__(self, queue_size: int = 256):
+        self.queue_size = queue_size
+        self._subscribers: set[tuple] = set()
+        self._lock = threading.Lock()
+
+    @property
+    def active(self) -> bool:
+        return bool(self._subscribers)
+
+    def publish(self, message: dict) -> None:
+        """Deliver ``message`` to every subscriber; safe from any thread."""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(offer, queue, message)
+            except RuntimeError:  # the subscriber's loop has closed
+                self._discard((loop, queue))
+
+    def _discard(self, subscriber) -> None:
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    async def subscribe(self):
+        """Yield published messages until the consumer stops iterating."""
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue(self.queue_size))
+        with self._lock:
+            self._subscribers.add(subscriber)
+        try:
+            while True:
+                yield await subscriber[1].get()
+        finally:
+            self._discard(subscriber)
+
+
+class RedisBroker:
+    def __init__(self, url=None, channel="seas:gate-events", timeout=None, queue_size=1024):
+        self.url = url or settings.LIVE_STREAM_REDIS_URL
+        self.channel = channel
+        self.timeout = settings.LIVE_STREAM_REDIS_TIMEOUT if timeout is None else timeout
+        self._client = None
+        self._outbox = queue.Queue(queue_size)
+        self._sender = None
+        self._sender_lock = threading.Lock()
+
+    def publish(self, message: dict) -> None:
+        """Queue ``message`` for the sender thread; never waits for Redis."""
+        if self._sender is None or not self._sender.is_alive():
+            with self._sender_lock:
+                if self._sender is None or not self._sender.is_alive():
+                    self._sender = threading.Thread(
+                        target=self._send_forever, name="live-stream-publisher", daemon=True
+                    )
+                    self._sender.start()
+        try:
+            self._outbox.put_nowait(message)
+        except queue.Full:
+            logger.warning("Redis publisher is behind; dropping a live stream message")
+
+    def _send_forever(self) -> None:
+        while True:
+            message = self._outbox.get()
+            try:
+                self._send(message)
+            except Exception:
+                logger.warning("Could not publish a gate event to %s", self.url, exc_info=True)
+
+    def _send(self, message: dict) -> None:
+        import redis
+
+        if self._client is None:
+            self._client = redis.Redis.from_url(
+                self.url, socket_connect_timeout=self.timeout, socket_timeout=self.timeout
+            )
+        self._client.publish(self.channel, json.dumps(message))
+
+    async def subscribe(self):
+        import redis.asyncio as aioredis
+
+        client = aioredis.Redis.from_url(self.url)
+        pubsub = client.pubsub()
+        await pubsub.subscribe(self.channel)
+        try:
+            async for item in pubsub.listen():
+                if item["type"] == "message":
+                    yield json.loads(item["data"])
+        finally:
+            await pubsub.aclose()
+            await client.aclose()
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """Return the process-wide broker named by ``LIVE_STREAM_BROKER``."""
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = import_string(settings.LIVE_STREAM_BROKER)()
+    return _broker
+
+
+REFRESH_MESSAGE = {"type": "refresh", "data": None}
+
+
+def publish_refresh() -> None:
+    """Ask live dashboards to refresh their stats and anomalies."""
+    broker = get_broker()
+    if not getattr(broker, "active", True):
+        return
+    try:
+        broker.publish(REFRESH_MESSAGE)
+    except Exception:  # pragma: no cover - a dashboard must not fail a write
+        logger.exception("Publishing a stats refresh failed")
+
+
+def publish_gate_events(events) -> None:
+    """Publish committed events; skipped when nobody in this process listens."""
+    broker = get_broker()
+    if not getattr(broker, "active", True) or not events:
+        return
+    # Batched events only carry the student pk: one query names them all.
+    unnamed = {event.student_id for event in events if not GateEvent.student.is_cached(event)}
+    numbers = {}
+    if unnamed:
+        numbers = dict(Student.objects.filter(pk__in=unnamed).values_list("pk", "student_id"))
+    for event in events:
+        student_id = (
+            event.student.student_id
+            if GateEvent.student.is_cached(event)
+            else numbers.get(event.student_id, "")
+        )
+        try:
+            broker.publish(gate_message(event, student_id))
+        except Exception:  # pragma: no cover - a dashboard must not fail a pass
+            logger.exception("Publishing gate event %s failed", event.pk)
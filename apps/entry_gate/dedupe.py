@@ -0,0 +1,112 @@
+"""Short-lived memory of recent gate passes.
+
+RFID readers report one card several times within a second, and gate
+clients retry a scan when the response is slow. :class:`RecentPasses`
+remembers each recorded pass under two keys:
+
+* ``(student, action, gate)`` for ``GATE_DEBOUNCE_SECONDS``, so a bounced
+  tap gets the original response instead of a second event;
+* the client's ``Idempotency-Key`` for ``GATE_IDEMPOTENCY_TTL`` seconds,
+  so a retried request is answered without redoing recognition.
+
+Both are answered from memory without a database query. Keys that this
+worker has not seen are still caught by the unique
+``GateEvent.idempotency_key`` column (see :func:`.pipeline.event_for_key`).
+"""
+
+from collections import OrderedDict
+from dataclasses import dataclass, field
+import threading
+import time
+from typing import Optional
+
+from django.conf import settings
+
+from .models import GateEvent
+
+
+@dataclass(frozen=True)
+class GatePass:
+    event: GateEvent
+    verification_method: str
+    extra: dict = field(default_factory=dict)
+
+
+class RecentPasses:
+    def __init__(self, debounce: float, key_ttl: float, max_entries: int = 10000):
+        self.debounce = debounce
+        self.key_ttl = key_ttl
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple, tuple[float, GatePass]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.debounced = 0
+        self.replayed = 0
+
+    def _get(self, key: tuple) -> Optional[GatePass]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= now:
+                del self._entries[key]
+                return None
+            return entry[1]
+
+    def _set(self, key: tuple, gate_pass: GatePass, ttl: float) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, gate_pass)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def by_key(self, idempotency_key: Optional[str]) -> Optional[GatePass]:
+        if not idempotency_key:
+            return None
+        gate_pass = self._get(("key", idempotency_key))
+        if gate_pass is not None:
+            self.replayed += 1
+        return gate_pass
+
+    def by_tap(self, student_pk: int, action: str, gate: str = "") -> Optional[GatePass]:
+        gate_pass = self._get(("tap", student_pk, action, gate))
+        if gate_pass is not None:
+            self.debounced += 1
+        return gate_pass
+
+    def remember(
+        self, gate_pass: GatePass, idempotency_key: Optional[str] = None, gate: str = ""
+    ) -> None:
+        event = gate_pass.event
+        if self.debounce > 0:
+            self._set(("tap", event.student_id, event.action, gate), gate_pass, self.debounce)
+        if idempotency_key and self.key_ttl > 0:
+            self._set(("key", idempotency_key), gate_pass, self.key_ttl)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "debounced": self.debounced,
+            "replayed": self.replayed,
+        }
+
+
+_recent_passes = None
+_lock = threading.Lock()
+
+
+def get_recent_passes() -> RecentPasses:
+    """Return the process-wide memory of recent passes."""
+    global _recent_passes
+    if _recent_passes is None:
+        with _lock:
+            if _recent_passes is None:
+                _recent_passes = RecentPasses(
+                    debounce=settings.GATE_DEBOUNCE_SECONDS,
+                    key_ttl=settings.GATE_IDEMPOTENCY_TTL,
+                )
+    return _recent_passes
@@ -0,0 +1,340 @@
+"""Offline edge mode for gate controllers.
+
+A gate that loses its link to the server should keep opening for enrolled
+cards. :class:`EdgeStore` keeps a local SQLite copy of the roster
+(``pk``, ``student_id``, ``rfid_tag``, name) and a queue of taps recorded
+while offline; :class:`EdgeSync` keeps both in step with the server:
+
+* **pull** asks ``/api/students/roster/?since=<version>`` for the students
+  changed since the last sync (``StudentChange`` ids are the roster
+  version), so a sync after a short outage transfers a handful of rows;
+* **push** sends queued taps to ``/api/entry-gate/batch-scan/`` in batches.
+  Every tap carries an idempotency key, so a batch that was recorded but
+  whose response was lost is answered with duplicates when it is resent.
+  The highest pushed tap is kept as a watermark in the store.
+
+The edge store uses the standard library ``sqlite3`` and ``urllib`` only and
+never touches the Django database, so it can run on the gate controller
+itself via ``manage.py gate_edge``. Face recognition still needs the server;
+the face index is not mirrored.
+
+``manage.py gate_edge serve`` keeps a gate running: :class:`EdgeListener`
+answers readers over the line protocol of :mod:`.rfid_listener` from the
+local roster, queues granted taps in the store, and syncs every
+``GATE_EDGE_SYNC_INTERVAL`` seconds in the background. Taps stay queued for
+as long as the server is unreachable.
+"""
+
+import asyncio
+import json
+import logging
+from pathlib import Path
+import sqlite3
+import threading
+import time
+from typing import Callable, Optional
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+import uuid
+
+from django.utils import timezone
+
+from .models import GateEvent
+from .rfid_listener import DENY, GRANT, LineListener, parse_line
+
+logger = logging.getLogger(__name__)
+
+ROSTER_PATH = "/api/students/roster/"
+BATCH_PATH = "/api/entry-gate/batch-scan/"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS students (
+    pk INTEGER PRIMARY KEY,
+    student_id TEXT NOT NULL UNIQUE,
+    rfid_tag TEXT,
+    name TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS students_rfid_tag ON students (rfid_tag);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    idempotency_key TEXT NOT NULL UNIQUE,
+    student_id TEXT NOT NULL,
+    action TEXT NOT NULL,
+    client_timestamp TEXT NOT NULL
+);
+"""
+
+
+class EdgeOffline(Exception):
+    """The server could not be reached; try again later."""
+
+
+class EdgeStore:
+    def __init__(self, path):
+        self.path = Path(path)
+        if str(path) != ":memory:":
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=FULL")
+        self._db.executescript(SCHEMA)
+        # One connection is shared by the listener and the sync thread.
+        self._lock = threading.RLock()
+
+    def close(self) -> None:
+        self._db.close()
+
+    def _meta(self, key: str) -> int:
+        with self._lock:
+            row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return int(row["value"]) if row else 0
+
+    def _set_meta(self, key: str, value: int) -> None:
+        self._db.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+            (key, str(value)),
+        )
+
+    @property
+    def roster_version(self) -> int:
+        return self._meta("roster_version")
+
+    @property
+    def push_watermark(self) -> int:
+        return self._meta("push_watermark")
+
+    # -- roster ----------------------------------------------------------
+
+    def apply_roster(self, delta: dict) -> int:
+        """Apply one page from the roster endpoint; returns rows changed."""
+        students = delta.get("students", [])
+        with self._lock, self._db:
+            if delta.get("full"):
+                self._db.execute("DELETE FROM students")
+            pks = [(entry["pk"],) for entry in students]
+            pks += [(pk,) for pk in delta.get("deleted", [])]
+            # Drop the old rows first so a student number or card that moved
+            # between students cannot trip the UNIQUE constraint.
+            self._db.executemany("DELETE FROM students WHERE pk = ?", pks)
+            self._db.executemany(
+                "INSERT INTO students (pk, student_id, rfid_tag, name) VALUES (?, ?, ?, ?)",
+                [
+                    (entry["pk"], entry["student_id"], entry.get("rfid_tag"), entry.get("name", ""))
+                    for entry in students
+                ],
+            )
+            self._set_meta("roster_version", delta["version"])
+        return len(pks)
+
+    def student_for_rfid(self, rfid_tag: str) -> Optional[dict]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT pk, student_id, rfid_tag, name FROM students WHERE rfid_tag = ?",
+                (rfid_tag,),
+            ).fetchone()
+        return dict(row) if row else None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM students").fetchone()[0]
+
+    # -- taps ------------------------------------------------------------
+
+    def record_tap(
+        self,
+        rfid_tag: str,
+        action: str = GateEvent.ENTRY,
+        idempotency_key: Optional[str] = None,
+    ) -> Optional[dict]:
+        """Queue a tap for a known card; returns the student, or ``None``.
+
+        A tap whose ``idempotency_key`` is already queued is not queued again.
+        """
+        student = self.student_for_rfid(rfid_tag)
+        if student is None:
+            return None
+        # Queue the student number, not the card: the server resolves it even
+        # if the card is reassigned before the tap is pushed.
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR IGNORE INTO events "
+                "(idempotency_key, student_id, action, client_timestamp) VALUES (?, ?, ?, ?)",
+                (
+                    idempotency_key or uuid.uuid4().hex,
+                    student["student_id"],
+                    action,
+                    timezone.now().isoformat(),
+                ),
+            )
+        return student
+
+    def pending(self, limit: int) -> list[dict]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT seq, idempotency_key, student_id, action, client_timestamp "
+                "FROM events WHERE seq > ? ORDER BY seq LIMIT ?",
+                (self.push_watermark, limit),
+            )
+            return [dict(row) for row in rows]
+
+    def mark_pushed(self, seq: int) -> None:
+        """Advance the watermark and drop taps the server has acknowledged."""
+        with self._lock, self._db:
+            self._set_meta("push_watermark", max(seq, self.push_watermark))
+            self._db.execute("DELETE FROM events WHERE seq <= ?", (seq,))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "students": len(self),
+                "roster_version": self.roster_version,
+                "push_watermark": self.push_watermark,
+                "pending": self._db.execute(
+                    "SELECT COUNT(*) FROM events WHERE seq > ?", (self.push_watermark,)
+                ).fetchone()[0],
+            }
+
+
+def http_transport(server_url: str, timeout: float = 5.0) -> Callable:
+    """Return a ``transport(method, path, params=None, payload=None)`` using urllib."""
+    base = server_url.rstrip("/")
+
+    def transport(method, path, params=None, payload=None):
+        url = base + path + ("?" + urlencode(params) if params else "")
+        body = json.dumps(payload).encode() if payload is not None else None
+        request = Request(url, data=body, method=method)
+        request.add_header("Accept", "application/json")
+        if body is not None:
+            request.add_header("Content-Type", "application/json")
+        try:
+            with urlopen(request, timeout=timeout) as response:
+                return response.status, json.loads(response.read() or b"null")
+        except HTTPError as exc:
+            return exc.code, None
+        except (URLError, OSError) as exc:
+            raise EdgeOffline(str(exc)) from exc
+
+    return transport
+
+
+class EdgeSync:
+    """Pulls roster deltas into an :class:`EdgeStore` and pushes its taps."""
+
+    def __init__(self, store: EdgeStore, transport: Callable, batch_size: int = 500):
+        self.store = store
+        self.transport = transport
+        self.batch_size = batch_size
+
+    def _call(self, method, path, **kwargs) -> dict:
+        status, body = self.transport(method, path, **kwargs)
+        if status != 200 or not isinstance(body, dict):
+            raise EdgeOffline(f"{method} {path} returned {status}")
+        return body
+
+    def pull(self) -> int:
+        """Bring the local roster up to the server's version."""
+        changed = 0
+        while True:
+            delta = self._call(
+                "GET", ROSTER_PATH, params={"since": self.store.roster_version}
+            )
+            changed += self.store.apply_roster(delta)
+            if not delta.get("more"):
+                return changed
+
+    def push(self) -> dict:
+        """Send queued taps; returns counts by server status."""
+        counts = {"recorded": 0, "duplicates": 0, "rejected": 0}
+        while True:
+            events = self.store.pending(self.batch_size)
+            if not events:
+                return counts
+            body = self._call(
+                "POST",
+                BATCH_PATH,
+                payload={
+                    "items": [
+                        {key: event[key] for key in event if key != "seq"}
+                        for event in events
+                    ]
+                },
+            )
+            for key in counts:
+                counts[key] += body.get(key, 0)
+            if body.get("rejected"):
+                # Resending would be rejected again (e.g. a deleted student).
+                logger.warning("Server rejected %d edge taps", body["rejected"])
+            self.store.mark_pushed(events[-1]["seq"])
+
+    def sync(self) -> dict:
+        """Push first so offline taps land before the roster moves on."""
+        pushed = self.push()
+        return {**pushed, "roster_changes": self.pull()}
+
+
+class EdgeListener(LineListener):
+    """Answers reader lines from an :class:`EdgeStore` and syncs it in the background."""
+
+    def __init__(self, edge: EdgeSync, interval: float, debounce: float):
+        self.edge = edge
+        self.store = edge.store
+        self.interval = interval
+        self.debounce = debounce
+        self._last_tap = {}
+        self.granted = 0
+        self.denied = 0
+
+    def _bounced(self, student_pk: int, action: str, gate: str) -> bool:
+        now = time.monotonic()
+        key = (student_pk, action, gate)
+        last = self._last_tap.get(key)
+        if last is not None and now - last < self.debounce:
+            return True
+        self._last_tap[key] = now
+        if len(self._last_tap) > 10_000:
+            self._last_tap = {
+                k: t for k, t in self._last_tap.items() if now - t < self.debounce
+            }
+        return False
+
+    async def decide(self, line: bytes, gate: str = "") -> Optional[bytes]:
+        try:
+            parsed = parse_line(line)
+        except ValueError:
+            self.denied += 1
+            return DENY
+        if parsed is None:
+            return None
+        rfid_tag, action, key = parsed
+        if action not in (GateEvent.ENTRY, GateEvent.EXIT):
+            self.denied += 1
+            return DENY
+
+        student = await asyncio.to_thread(self.store.student_for_rfid, rfid_tag)
+        if student is None:
+            self.denied += 1
+            return DENY
+        self.granted += 1
+        if not self._bounced(student["pk"], action, gate):
+            await asyncio.to_thread(self.store.record_tap, rfid_tag, action, key or None)
+        return GRANT
+
+    async def background(self) -> None:
+        while True:
+            try:
+                await asyncio.to_thread(self.edge.sync)
+            except EdgeOffline as exc:
+                logger.warning("Edge sync failed (%s); taps stay queued", exc)
+            except Exception:
+                logger.exception("Edge sync failed")
+            await asyncio.sleep(self.interval)
+
+    def stats(self) -> dict:
+        return {"granted": self.granted, "denied": self.denied, **self.store.stats()}
@@ -0,0 +1,83 @@
+"""LRU + TTL cache of face embeddings keyed by frame content.
+
+Gate cameras resubmit the same frame when a student lingers or the client
+retries. Keying embeddings by a hash of the uploaded bytes lets those repeats
+skip decoding, the quality filter and the embedding pool entirely. An optional
+perceptual key (the average hash of the quality thumbnail, see
+:func:`.quality.average_hash`) also catches re-encoded near-duplicates, at the
+cost of the thumbnail decode the quality filter does anyway.
+
+The cache is process-local; hit/miss counters are exposed through
+``/api/entry-gate/metrics/`` to help size it.
+"""
+
+from collections import OrderedDict
+import hashlib
+import threading
+import time
+from typing import Optional
+
+import numpy as np
+
+
+def content_key(data: bytes) -> str:
+    return "c:" + hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def perceptual_key(fingerprint: str) -> str:
+    return "p:" + fingerprint
+
+
+class EmbeddingCache:
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, np.ndarray]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key: str, embedding: np.ndarray) -> None:
+        if self.max_entries <= 0:
+            return
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            embedding.setflags(write=False)
+            self._entries[key] = (expires, embedding)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
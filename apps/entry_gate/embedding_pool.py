@@ -0,0 +1,120 @@
+"""Off-request face embedding with a bounded queue.
+
+Decoding and embedding a frame is CPU-bound. Running it inside ``ScanView``
+pins a WSGI worker for the whole computation, so during the morning rush a
+queue of face scans starves RFID taps. :class:`EmbeddingService` moves the work
+onto a process pool with a fixed number of slots (running + queued). When
+every slot is taken the caller gets :class:`EmbeddingBusy` immediately instead
+of waiting, and a slow job raises :class:`EmbeddingTimeout` after the
+per-request deadline, so the gate can fall back to RFID.
+
+This module deliberately avoids importing Django at import time: spawned
+pool workers only need numpy, Pillow, :mod:`.face` and :mod:`.imaging`.
+"""
+
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+import multiprocessing
+import threading
+from typing import Optional
+
+import numpy as np
+
+from .face import compute_embedding
+from .imaging import decode_image
+
+
+class EmbeddingBusy(Exception):
+    """Raised when the embedding queue is full."""
+
+
+class EmbeddingTimeout(EmbeddingBusy):
+    """Raised when an embedding did not finish within the request deadline."""
+
+
+def embed_image_bytes(data: bytes) -> Optional[np.ndarray]:
+    """Decode ``data`` and return its embedding; runs inside pool workers."""
+    try:
+        return compute_embedding(decode_image(data))
+    except OSError:
+        return None
+
+
+class EmbeddingService:
+    """Client for the embedding pool.
+
+    ``max_workers=0`` runs embeddings inline, which keeps tests and the
+    development server free of child processes.
+    """
+
+    def __init__(
+        self,
+        max_workers: int,
+        max_pending: int,
+        timeout: float,
+        executor: Optional[Executor] = None,
+    ):
+        self.timeout = timeout
+        self.capacity = max_workers + max_pending
+        self._slots = threading.BoundedSemaphore(max(self.capacity, 1))
+        self._executor = executor
+        if executor is None and max_workers:
+            self._executor = ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        self._lock = threading.Lock()
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    @property
+    def inline(self) -> bool:
+        return self._executor is None
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def embed(self, data: bytes, timeout: Optional[float] = None) -> Optional[np.ndarray]:
+        """Embed encoded image bytes, raising :class:`EmbeddingBusy` under load."""
+        if self.inline:
+            embedding = embed_image_bytes(data)
+            self._count("completed")
+            return embedding
+
+        if not self._slots.acquire(blocking=False):
+            self._count("rejected")
+            raise EmbeddingBusy("Face recognition is at capacity.")
+
+        try:
+            future = self._executor.submit(embed_image_bytes, data)
+        except BaseException:
+            self._slots.release()
+            raise
+        # The slot is held until the job really finishes, even if we stop
+        # waiting for it, so abandoned work still counts against the queue.
+        future.add_done_callback(lambda _future: self._slots.release())
+
+        try:
+            embedding = future.result(timeout=timeout or self.timeout)
+        except FutureTimeout as exc:
+            future.cancel()
+            self._count("timed_out")
+            raise EmbeddingTimeout("Face recognition timed out.") from exc
+
+        self._count("completed")
+        return embedding
+
+    def stats(self) -> dict:
+        return {
+            "inline": self.inline,
+            "capacity": self.capacity,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
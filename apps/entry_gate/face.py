@@ -1,20 +1,164 @@
-"""Lightweight placeholder face recognition utility.
+"""Face embedding and matching utilities.
 
-This stub keeps an in-memory mapping of enrolled student IDs and returns the
-first available ID when identifying. It allows the API to operate in
-development environments without external dependencies.
+Every enrolled student's embedding lives in one contiguous float32 matrix, so a
+probe is scored against the whole roster with a single matrix-vector product
+instead of a per-student Python loop. Rows are L2-normalised on enrollment,
+which makes that product the cosine similarity.
+
+``compute_embedding`` is a dependency-free development embedder (a normalised
+grayscale thumbnail). In production it would be swapped for the
+face_recognition encoder; the matcher does not care where vectors come from.
 """
 
+from dataclasses import dataclass
 from typing import Optional
 
+import numpy as np
+from PIL import Image, ImageOps
+
+EMBEDDING_SIZE = (16, 16)
+EMBEDDING_DIM = EMBEDDING_SIZE[0] * EMBEDDING_SIZE[1]
+
+# ScanView promises a >= 80% match before granting access by face.
+MATCH_THRESHOLD = 0.80
+
+# Rows dequantised per block; small enough that the float32 scratch buffer
+# stays in L2 while BLAS scores it.
+QUANTIZED_BLOCK = 1024
+
+
+@dataclass(frozen=True)
+class FaceMatch:
+    student_pk: int
+    score: float
+
+
+def normalize(vector) -> Optional[np.ndarray]:
+    vector = np.asarray(vector, dtype=np.float32).ravel()
+    norm = float(np.linalg.norm(vector))
+    if norm < 1e-6:
+        return None
+    return vector / norm
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the ``k`` highest scores, best first."""
+    k = min(k, len(scores))
+    if k < len(scores):
+        top = np.argpartition(scores, -k)[-k:]
+    else:
+        top = np.arange(len(scores))
+    return top[np.argsort(scores[top])[::-1]]
+
+
+def average_embeddings(embeddings) -> Optional[np.ndarray]:
+    """Combine several captures of one face into a single unit template."""
+    vectors = [normalize(vector) for vector in embeddings if vector is not None]
+    vectors = [vector for vector in vectors if vector is not None]
+    if not vectors:
+        return None
+    return normalize(np.mean(vectors, axis=0))
+
+
+def quantize(vector) -> tuple[np.ndarray, float]:
+    """Symmetric int8 quantisation with a per-vector scale."""
+    vector = np.asarray(vector, dtype=np.float32)
+    peak = float(np.abs(vector).max()) if vector.size else 0.0
+    scale = peak / 127 if peak else 1.0
+    return np.round(vector / scale).astype(np.int8), scale
+
+
+def quantized_scores(templates, scales, probe) -> np.ndarray:
+    """Approximate ``dequantize(templates) @ probe`` without a float32 copy.
+
+    numpy has no fast int8 GEMV, so templates are widened one cache-sized
+    block at a time into a reused scratch buffer and scored with BLAS.
+    """
+    count = len(templates)
+    scores = np.empty(count, dtype=np.float32)
+    scratch = np.empty((min(count, QUANTIZED_BLOCK), probe.shape[0]), dtype=np.float32)
+    for start in range(0, count, QUANTIZED_BLOCK):
+        block = templates[start : start + QUANTIZED_BLOCK]
+        rows = scratch[: len(block)]
+        np.copyto(rows, block, casting="unsafe")
+        np.matmul(rows, probe, out=scores[start : start + len(block)])
+    scores *= scales
+    return scores
+
+
+def compute_embedding(image: Image.Image) -> Optional[np.ndarray]:
+    """Return a unit-length embedding for ``image`` or ``None`` if it is blank."""
+    thumbnail = ImageOps.grayscale(image).resize(EMBEDDING_SIZE, Image.BILINEAR)
+    vector = np.asarray(thumbnail, dtype=np.float32).ravel()
+    return normalize(vector - vector.mean())
+
 
 class FaceRecognition:
-    def __init__(self):
-        self.registry: list[str] = []
+    """In-memory matcher over a contiguous embedding matrix."""
+
+    def __init__(self, dim: int = EMBEDDING_DIM, threshold: float = MATCH_THRESHOLD):
+        self.dim = dim
+        self.threshold = threshold
+        self._matrix = np.zeros((16, dim), dtype=np.float32)
+        self._ids = np.zeros(16, dtype=np.int64)
+        self._rows: dict[int, int] = {}
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, student_pk: int) -> bool:
+        return student_pk in self._rows
+
+    def _grow(self) -> None:
+        capacity = len(self._matrix) * 2
+        matrix = np.zeros((capacity, self.dim), dtype=np.float32)
+        matrix[: self._size] = self._matrix[: self._size]
+        ids = np.zeros(capacity, dtype=np.int64)
+        ids[: self._size] = self._ids[: self._size]
+        self._matrix, self._ids = matrix, ids
+
+    def enroll(self, student_pk: int, embedding) -> None:
+        vector = normalize(embedding)
+        if vector is None or vector.shape != (self.dim,):
+            raise ValueError("Embedding must be a non-zero vector of the index dimension.")
+
+        row = self._rows.get(student_pk)
+        if row is None:
+            if self._size == len(self._matrix):
+                self._grow()
+            row = self._size
+            self._size += 1
+            self._rows[student_pk] = row
+            self._ids[row] = student_pk
+        self._matrix[row] = vector
+
+    def remove(self, student_pk: int) -> bool:
+        row = self._rows.pop(student_pk, None)
+        if row is None:
+            return False
+
+        # Keep the matrix dense by moving the last row into the freed slot.
+        last = self._size - 1
+        if row != last:
+            self._matrix[row] = self._matrix[last]
+            self._ids[row] = self._ids[last]
+            self._rows[int(self._ids[row])] = row
+        self._size = last
+        return True
+
+    def search(self, embedding, k: int = 1) -> list[FaceMatch]:
+        """Return the ``k`` best matches for ``embedding``, best first."""
+        probe = normalize(embedding)
+        if probe is None or not self._size:
+            return []
 
-    def enroll(self, student_id: str, image) -> None:
-        if student_id not in self.registry:
-            self.registry.append(student_id)
+        scores = self._matrix[: self._size] @ probe
+        return [FaceMatch(int(self._ids[i]), float(scores[i])) for i in top_k(scores, k)]
 
-    def identify(self, image) -> Optional[str]:
-        return self.registry[0] if self.registry else None
+    def identify(self, embedding) -> Optional[FaceMatch]:
+        """Return the best match if it clears the similarity threshold."""
+        matches = self.search(embedding, k=1)
+        if matches and matches[0].score >= self.threshold:
+            return matches[0]
+        return None
@@ -0,0 +1,44 @@
+"""Bounded, downscale-on-decode image decoding.
+
+Gate uploads are full-resolution camera frames, but recognition only needs a
+few hundred pixels per side. :func:`decode_image` checks the pixel count from
+the header before touching pixel data, then asks the JPEG decoder to produce a
+reduced image directly (``Image.draft`` scales by 1/2, 1/4 or 1/8 during the
+IDCT) so a 12 MP frame never exists in memory at full size.
+
+No Django imports: embedding pool workers decode with this module.
+"""
+
+from io import BytesIO
+
+from PIL import Image
+
+MAX_PIXELS = 24_000_000
+DECODE_MAX_SIDE = 640
+
+
+class ImageTooLarge(OSError):
+    pass
+
+
+def open_image(data) -> Image.Image:
+    """Open encoded bytes lazily, refusing frames above ``MAX_PIXELS``."""
+    image = Image.open(BytesIO(data))
+    width, height = image.size
+    if width * height > MAX_PIXELS:
+        image.close()
+        raise ImageTooLarge(f"{width}x{height} exceeds the {MAX_PIXELS} pixel limit.")
+    return image
+
+
+def reduce(image: Image.Image, max_side: int, mode: str) -> Image.Image:
+    image.draft(mode, (max_side, max_side))
+    image = image.convert(mode)
+    image.thumbnail((max_side, max_side), Image.BILINEAR)
+    return image
+
+
+def decode_image(data, max_side: int = DECODE_MAX_SIDE, mode: str = "RGB") -> Image.Image:
+    """Decode ``data`` to at most ``max_side`` pixels per side."""
+    with open_image(data) as image:
+        return reduce(image, max_side, mode)
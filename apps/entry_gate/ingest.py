@@ -0,0 +1,101 @@
+"""Request-side image ingestion for scan, enroll and registration uploads.
+
+* :class:`InMemoryImageUploadHandler` keeps multipart files in memory up to
+  ``IMAGE_UPLOAD_MAX_BYTES`` instead of letting Django spool larger ones to
+  temporary files.
+* :class:`RawImageParser` accepts a bare ``image/jpeg`` (or any ``image/*``)
+  request body and exposes it as ``request.FILES["image"]``, so gate clients
+  can skip multipart encoding entirely.
+* :class:`ImageIngestMixin` wires both into an ``APIView``.
+
+Decoding itself happens later, downscaled, in :mod:`.imaging`.
+"""
+
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import InMemoryUploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopFutureHandlers
+from django.utils.datastructures import MultiValueDict
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.parsers import (
+    BaseParser,
+    DataAndFiles,
+    FormParser,
+    JSONParser,
+    MultiPartParser,
+)
+
+
+class ImageTooLargeError(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = "Image upload is too large."
+    default_code = "image_too_large"
+
+
+class InMemoryImageUploadHandler(FileUploadHandler):
+    """Buffer uploaded files in memory, refusing any above the size cap."""
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.max_bytes = settings.IMAGE_UPLOAD_MAX_BYTES
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.file = BytesIO()
+        raise StopFutureHandlers()
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > self.max_bytes:
+            raise ImageTooLargeError()
+        self.file.write(raw_data)
+
+    def file_complete(self, file_size):
+        self.file.seek(0)
+        return InMemoryUploadedFile(
+            file=self.file,
+            field_name=self.field_name,
+            name=self.file_name,
+            content_type=self.content_type,
+            size=file_size,
+            charset=self.charset,
+            content_type_extra=self.content_type_extra,
+        )
+
+
+class RawImageParser(BaseParser):
+    media_type = "image/*"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        max_bytes = settings.IMAGE_UPLOAD_MAX_BYTES
+        data = stream.read(max_bytes + 1) if stream is not None else b""
+        if len(data) > max_bytes:
+            raise ImageTooLargeError()
+
+        content_type = (media_type or "image/jpeg").split(";")[0].strip()
+        image = InMemoryUploadedFile(
+            file=BytesIO(data),
+            field_name="image",
+            name="frame",
+            content_type=content_type,
+            size=len(data),
+            charset=None,
+        )
+        return DataAndFiles({}, MultiValueDict({"image": [image]}))
+
+
+class ImageIngestMixin:
+    parser_classes = [MultiPartParser, FormParser, JSONParser, RawImageParser]
+
+    def initialize_request(self, request, *args, **kwargs):
+        request.upload_handlers = [InMemoryImageUploadHandler(request)]
+        return super().initialize_request(request, *args, **kwargs)
+
+    @staticmethod
+    def field(request, name, default=None):
+        """Read a form field, falling back to the query string for raw bodies."""
+        value = request.data.get(name)
+        if value in (None, ""):
+            value = request.query_params.get(name, default)
+        return value
@@ -0,0 +1,316 @@
+"""Write-behind journal for gate events.
+
+With ``GATE_WRITE_BEHIND`` enabled, RFID and face scans do not insert their
+``GateEvent`` while the gate waits. The pass is appended as one JSON line to
+a local journal file and fsync'd, the gate gets its answer, and a background
+thread flushes the journal to the database in batches through
+:func:`.pipeline.record_taps` (one ``bulk_create`` plus the bulk attendance
+merge per batch). SQLite then sees a few large transactions a second instead
+of one small write transaction per tap.
+
+Every entry carries an idempotency key, so replaying entries that were
+already written (a crash between the database commit and saving the flush
+offset) records nothing twice. The flushed offset lives in ``<journal>.offset``;
+entries after it are replayed when the server starts (``seas_project.wsgi`` and
+``seas_project.asgi`` call :func:`start_gate_journal`), and
+``manage.py flush_gate_journal`` flushes it by hand. Once
+everything is flushed the journal is truncated.
+
+Appends and flushes take ``flock`` locks, so all workers on a host can share
+one journal.
+"""
+
+from contextlib import contextmanager
+from datetime import datetime
+import json
+import logging
+import os
+from pathlib import Path
+import threading
+import time
+from typing import Optional
+import uuid
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from apps.students.models import Student
+
+from .models import GateEvent
+from .pipeline import record_taps
+
+try:  # pragma: no cover - platform dependent
+    import fcntl
+except ImportError:  # pragma: no cover - Windows development machines
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def _flock(fd: int, blocking: bool = True):
+    """Exclusive ``flock``; yields ``False`` if non-blocking and busy."""
+    if fcntl is None:
+        yield True
+        return
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+    except BlockingIOError:
+        yield False
+        return
+    try:
+        yield True
+    finally:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+class GateJournal:
+    def __init__(self, path, batch_size: int = 500, interval: float = 0.5):
+        self.path = Path(path)
+        self.offset_path = self.path.with_suffix(self.path.suffix + ".offset")
+        self.batch_size = batch_size
+        self.interval = interval
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+        self._offset_fd = os.open(self.offset_path, os.O_RDWR | os.O_CREAT, 0o644)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.appended = 0
+        self.flushed = 0
+        self.flushes = 0
+        self.last_flush_at = None
+        self.last_flush_seconds = 0.0
+
+    # -- appending -----------------------------------------------------
+
+    def enqueue(
+        self, student, action, reason, success=True, idempotency_key=None
+    ) -> GateEvent:
+        """Journal a pass and return the (unsaved) event describing it."""
+        event = GateEvent(
+            student=student,
+            action=action,
+            reason=reason,
+            success=success,
+            timestamp=timezone.now(),
+            idempotency_key=idempotency_key or uuid.uuid4().hex,
+        )
+        self.append(
+            {
+                "student_pk": student.pk,
+                "action": action,
+                "reason": reason,
+                "success": success,
+                "timestamp": event.timestamp.isoformat(),
+                "idempotency_key": event.idempotency_key,
+            }
+        )
+        return event
+
+    def append(self, entry: dict) -> None:
+        line = (json.dumps(entry, separators=(",", ":")) + "\n").encode()
+        with self._lock, _flock(self._fd):
+            size = os.fstat(self._fd).st_size
+            # A writer that died mid-line must not swallow the next entry.
+            if size and os.pread(self._fd, 1, size - 1) != b"\n":
+                line = b"\n" + line
+            os.write(self._fd, line)
+            os.fsync(self._fd)
+            self.appended += 1
+
+    # -- flushing ------------------------------------------------------
+
+    def _read_offset(self) -> int:
+        raw = os.pread(self._offset_fd, 32, 0).strip()
+        offset = int(raw) if raw else 0
+        # Past the end: the journal was truncated after this offset was saved.
+        return offset if offset <= os.fstat(self._fd).st_size else 0
+
+    def _write_offset(self, offset: int) -> None:
+        os.pwrite(self._offset_fd, str(offset).encode().ljust(20), 0)
+        os.fsync(self._offset_fd)
+
+    def _pending(self, offset: int, limit: int) -> tuple[list[dict], int]:
+        """Read up to ``limit`` complete entries after ``offset``."""
+        entries = []
+        with open(self.path, "rb") as journal:
+            journal.seek(offset)
+            for line in journal:
+                if not line.endswith(b"\n"):
+                    break
+                offset += len(line)
+                if not line.strip():
+                    continue
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    logger.warning("Skipping corrupt gate journal entry at %d", offset)
+                    continue
+                if len(entries) >= limit:
+                    break
+        return entries, offset
+
+    def flush(self) -> int:
+        """Write pending entries to the database; returns how many were flushed.
+
+        Returns 0 without waiting if another process is flushing.
+        """
+        if not self._flush_lock.acquire(blocking=False):
+            return 0
+        try:
+            return self._flush()
+        finally:
+            self._flush_lock.release()
+
+    def _flush(self) -> int:
+        flushed = 0
+        with _flock(self._offset_fd, blocking=False) as locked:
+            if not locked:
+                return 0
+            started = time.monotonic()
+            offset = self._read_offset()
+            while True:
+                entries, next_offset = self._pending(offset, self.batch_size)
+                if entries:
+                    flushed += self._record(entries)
+                if next_offset == offset:
+                    break
+                self._write_offset(next_offset)
+                offset = next_offset
+            self._compact(offset)
+
+        with self._lock:
+            self.flushed += flushed
+            self.flushes += 1
+            self.last_flush_at = timezone.now()
+            self.last_flush_seconds = time.monotonic() - started
+        return flushed
+
+    def _record(self, entries: list[dict]) -> int:
+        taps = [self._tap(entry) for entry in entries]
+        # A student deleted before the flush would fail the whole batch.
+        known = set(
+            Student.objects.filter(
+                pk__in={tap["student_pk"] for tap in taps}
+            ).values_list("pk", flat=True)
+        )
+        dropped = [tap for tap in taps if tap["student_pk"] not in known]
+        if dropped:
+            logger.warning("Dropping %d journaled taps for deleted students", len(dropped))
+        record_taps([tap for tap in taps if tap["student_pk"] in known])
+        return len(taps) - len(dropped)
+
+    @staticmethod
+    def _tap(entry: dict) -> dict:
+        return {
+            "student_pk": entry["student_pk"],
+            "action": entry["action"],
+            "reason": entry.get("reason", ""),
+            "success": entry.get("success", True),
+            "timestamp": datetime.fromisoformat(entry["timestamp"]),
+            "idempotency_key": entry["idempotency_key"],
+        }
+
+    def _compact(self, offset: int) -> None:
+        """Truncate the journal once every entry in it has been flushed."""
+        with self._lock, _flock(self._fd):
+            if offset and os.fstat(self._fd).st_size == offset:
+                # Offset first: a crash in between replays the (idempotent)
+                # entries instead of skipping the next appends.
+                self._write_offset(0)
+                os.ftruncate(self._fd, 0)
+                os.fsync(self._fd)
+
+    # -- background flushing -------------------------------------------
+
+    def start(self) -> None:
+        """Replay anything left from a previous run, then flush periodically."""
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Replaying the gate journal failed; will retry.")
+        finally:
+            close_old_connections()
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(
+            target=self._run, name="gate-journal-flush", daemon=True
+        )
+        self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Flushing the gate journal failed; will retry.")
+            finally:
+                close_old_connections()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def close(self) -> None:
+        os.close(self._fd)
+        os.close(self._offset_fd)
+
+    def stats(self) -> dict:
+        offset = self._read_offset()
+        size = os.fstat(self._fd).st_size
+        entries, _ = self._pending(offset, 1)
+        lag = 0.0
+        if entries:
+            oldest = datetime.fromisoformat(entries[0]["timestamp"])
+            lag = max((timezone.now() - oldest).total_seconds(), 0.0)
+        return {
+            "enabled": settings.GATE_WRITE_BEHIND,
+            "appended": self.appended,
+            "flushed": self.flushed,
+            "flushes": self.flushes,
+            "pending_bytes": max(size - offset, 0),
+            "lag_seconds": round(lag, 3),
+            "last_flush_at": self.last_flush_at,
+            "last_flush_seconds": round(self.last_flush_seconds, 4),
+        }
+
+
+_journal: Optional[GateJournal] = None
+_journal_lock = threading.Lock()
+
+
+def get_gate_journal() -> GateJournal:
+    """Return the process-wide journal, replaying leftovers on first use."""
+    global _journal
+    if _journal is None:
+        with _journal_lock:
+            if _journal is None:
+                journal = GateJournal(
+                    settings.GATE_JOURNAL_PATH,
+                    batch_size=settings.GATE_JOURNAL_BATCH_SIZE,
+                    interval=settings.GATE_JOURNAL_FLUSH_INTERVAL,
+                )
+                journal.start()
+                _journal = journal
+    return _journal
+
+
+def start_gate_journal() -> None:
+    """Replay and start flushing the journal at server startup, if enabled."""
+    if settings.GATE_WRITE_BEHIND:
+        get_gate_journal()
+
+
+def reset_gate_journal() -> None:
+    global _journal
+    with _journal_lock:
+        if _journal is not None:
+            _journal.stop()
+            _journal.close()
+        _journal = None
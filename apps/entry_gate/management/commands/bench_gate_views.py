@@ -0,0 +1,101 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.test import AsyncClient, Client
+
+from apps.students.models import Student
+
+ENDPOINTS = {
+    "rfid": ("post", "/api/entry-gate/rfid-scan/", "/api/entry-gate/async/rfid-scan/"),
+    "live-stats": ("get", "/api/live-stats/", "/api/async/live-stats/"),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the sync (WSGI and ASGI) and async (ASGI) gate endpoints in-process. "
+        "RFID runs record gate events: point it at a scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--endpoint", choices=sorted(ENDPOINTS), default="rfid")
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument("--concurrency", type=int, default=32)
+
+    def handle(self, *args, **options):
+        method, sync_path, async_path = ENDPOINTS[options["endpoint"]]
+        tags = list(
+            Student.objects.exclude(rfid_tag__isnull=True)
+            .exclude(rfid_tag="")
+            .values_list("rfid_tag", flat=True)
+        )
+        if method == "post" and not tags:
+            raise CommandError("No students with RFID tags; run seed_demo first.")
+        self.method = method
+        self.tags = tags
+        total = options["requests"]
+        concurrency = options["concurrency"]
+
+        runs = [
+            ("WSGI, sync view", self.run_wsgi(sync_path, total, concurrency)),
+            ("ASGI, sync view", self.run_asgi(sync_path, total, concurrency)),
+            ("ASGI, async view", self.run_asgi(async_path, total, concurrency)),
+        ]
+        self.stdout.write(
+            f"{options['endpoint']}: {total} requests, {concurrency} concurrent\n"
+            f"{'':18} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}"
+        )
+        for label, (elapsed, latencies, errors) in runs:
+            latencies.sort()
+            p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+            self.stdout.write(
+                f"{label:18} {total / elapsed:8.0f} {statistics.median(latencies) * 1000:8.2f} "
+                f"{p99 * 1000:8.2f} {errors:7d}"
+            )
+
+    def _body(self, index):
+        if self.method == "get":
+            return {}
+        # A distinct gate per request keeps debouncing out of the numbers.
+        return {
+            "rfid_tag": self.tags[index % len(self.tags)],
+            "gate": f"bench-{index}",
+        }
+
+    def run_wsgi(self, path, total, concurrency):
+        def one(index):
+            client = Client(raise_request_exception=False)
+            started = time.perf_counter()
+            try:
+                response = getattr(client, self.method)(path, self._body(index))
+            finally:
+                close_old_connections()
+            return time.perf_counter() - started, response.status_code >= 500
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            results = list(pool.map(one, range(total)))
+        elapsed = time.perf_counter() - started
+        return elapsed, [latency for latency, _ in results], sum(e for _, e in results)
+
+    def run_asgi(self, path, total, concurrency):
+        async def run():
+            client = AsyncClient(raise_request_exception=False)
+            gate = asyncio.Semaphore(concurrency)
+
+            async def one(index):
+                async with gate:
+                    started = time.perf_counter()
+                    response = await getattr(client, self.method)(path, self._body(index))
+                    return time.perf_counter() - started, response.status_code >= 500
+
+            started = time.perf_counter()
+            results = await asyncio.gather(*(one(index) for index in range(total)))
+            return time.perf_counter() - started, results
+
+        elapsed, results = asyncio.run(run())
+        return elapsed, [latency for latency, _ in results], sum(e for _, e in results)
@@ -0,0 +1,41 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from apps.entry_gate.journal import GateJournal
+
+
+class Command(BaseCommand):
+    help = "Write journaled gate events to the database (write-behind mode)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--follow",
+            action="store_true",
+            help="Keep flushing every GATE_JOURNAL_FLUSH_INTERVAL seconds until interrupted.",
+        )
+
+    def handle(self, *args, **options):
+        journal = GateJournal(
+            settings.GATE_JOURNAL_PATH, batch_size=settings.GATE_JOURNAL_BATCH_SIZE
+        )
+        flushed = 0
+        try:
+            flushed += journal.flush()
+            while options["follow"]:
+                time.sleep(max(settings.GATE_JOURNAL_FLUSH_INTERVAL, 0.1))
+                flushed += journal.flush()
+                close_old_connections()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            stats = journal.stats()
+            journal.close()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Flushed {flushed} events; {stats['pending_bytes']} bytes still pending."
+            )
+        )
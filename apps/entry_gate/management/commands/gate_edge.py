@@ -0,0 +1,113 @@
+import asyncio
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.entry_gate.edge import (
+    EdgeListener,
+    EdgeOffline,
+    EdgeStore,
+    EdgeSync,
+    http_transport,
+)
+from apps.entry_gate.models import GateEvent
+
+
+class Command(BaseCommand):
+    help = "Run a gate in offline edge mode against a local copy of the roster."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--db", default=str(settings.GATE_EDGE_DB))
+        parser.add_argument("--server", default=settings.GATE_EDGE_SERVER)
+        subcommands = parser.add_subparsers(dest="subcommand", required=True)
+
+        sync = subcommands.add_parser("sync", help="Push queued taps and pull roster changes.")
+        sync.add_argument(
+            "--follow",
+            type=float,
+            metavar="SECONDS",
+            help="Keep syncing at this interval until interrupted.",
+        )
+
+        tap = subcommands.add_parser("tap", help="Check a card against the local roster.")
+        tap.add_argument("rfid_tag")
+        tap.add_argument(
+            "--action", choices=[GateEvent.ENTRY, GateEvent.EXIT], default=GateEvent.ENTRY
+        )
+
+        serve = subcommands.add_parser(
+            "serve", help="Answer RFID readers from the local roster and sync in the background."
+        )
+        serve.add_argument("--host", default=settings.GATE_RFID_LISTEN_HOST)
+        serve.add_argument("--port", type=int, default=settings.GATE_RFID_LISTEN_PORT)
+        serve.add_argument("--no-tcp", dest="tcp", action="store_false")
+        serve.add_argument("--no-udp", dest="udp", action="store_false")
+        serve.add_argument(
+            "--interval",
+            type=float,
+            default=settings.GATE_EDGE_SYNC_INTERVAL,
+            metavar="SECONDS",
+            help="Sync with the server at this interval.",
+        )
+
+    def handle(self, *args, **options):
+        store = EdgeStore(options["db"])
+        try:
+            if options["subcommand"] == "tap":
+                self.tap(store, options["rfid_tag"], options["action"])
+                return
+            edge = EdgeSync(store, http_transport(options["server"], settings.GATE_EDGE_TIMEOUT))
+            if options["subcommand"] == "serve":
+                self.serve(edge, options)
+            else:
+                self.sync(edge, options["follow"])
+        finally:
+            store.close()
+
+    def tap(self, store, rfid_tag, action):
+        student = store.record_tap(rfid_tag, action)
+        if student is None:
+            raise CommandError(f"Unknown card {rfid_tag}; direct the student to manual check-in.")
+        self.stdout.write(self.style.SUCCESS(f"{action}: {student['name'] or student['student_id']}"))
+
+    def sync(self, edge, follow):
+        while True:
+            try:
+                result = edge.sync()
+            except EdgeOffline as exc:
+                self.stderr.write(f"Server unreachable ({exc}); taps stay queued.")
+            else:
+                self.stdout.write(
+                    f"Pushed {result['recorded']} taps ({result['duplicates']} duplicates, "
+                    f"{result['rejected']} rejected); {result['roster_changes']} roster changes; "
+                    f"roster version {edge.store.roster_version}."
+                )
+            if not follow:
+                return
+            try:
+                time.sleep(follow)
+            except KeyboardInterrupt:
+                return
+
+    def serve(self, edge, options):
+        listener = EdgeListener(
+            edge, interval=options["interval"], debounce=settings.GATE_DEBOUNCE_SECONDS
+        )
+        self.stdout.write(
+            f"Edge listener on {options['host']}:{options['port']} "
+            f"with {len(edge.store)} students; syncing every {options['interval']} s."
+        )
+        try:
+            asyncio.run(
+                listener.serve(
+                    options["host"], options["port"], tcp=options["tcp"], udp=options["udp"]
+                )
+            )
+        except KeyboardInterrupt:
+            pass
+        stats = listener.stats()
+        self.stdout.write(
+            f"Granted {stats['granted']}, denied {stats['denied']}; "
+            f"{stats['pending']} taps still queued."
+        )
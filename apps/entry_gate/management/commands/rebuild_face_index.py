@@ -0,0 +1,98 @@
+from pathlib import Path
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.entry_gate.ann import recall_at_1, save_centroids, train_centroids
+from apps.entry_gate.face import FaceRecognition
+from apps.entry_gate.services import get_store
+from apps.entry_gate.shared_index import SharedFaceIndex
+
+
+class Command(BaseCommand):
+    help = (
+        "Retrain the IVF face index from the embedding store and report recall@1 "
+        "against exact search. Running workers reload the new centroids on their next scan."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--nlist", type=int, help="Number of coarse centroids (default: sqrt(N)).")
+        parser.add_argument(
+            "--nprobe",
+            type=int,
+            default=settings.FACE_ANN_NPROBE,
+            help="Lists searched per probe when measuring recall.",
+        )
+        parser.add_argument("--train-size", type=int, default=50000, help="Embeddings sampled for k-means.")
+        parser.add_argument("--queries", type=int, default=500, help="Probes used to measure recall@1.")
+        parser.add_argument("--noise", type=float, default=0.05, help="Gaussian noise added to each probe.")
+
+    def handle(self, *args, **options):
+        store = get_store()
+        items = list(store.items())
+        if not items:
+            raise CommandError("No face enrollments to index.")
+
+        pks = np.array([pk for pk, _ in items], dtype=np.int64)
+        embeddings = np.stack([embedding for _, embedding in items]).astype(np.float32)
+        rng = np.random.default_rng(0)
+
+        sample = embeddings
+        if len(sample) > options["train_size"]:
+            sample = sample[rng.choice(len(sample), options["train_size"], replace=False)]
+
+        started = time.perf_counter()
+        nlist = options["nlist"] or max(1, int(np.sqrt(len(embeddings))))
+        centroids = train_centroids(sample, nlist)
+        # Measure the matcher the gates will run: int8 scan of the probed
+        # lists in the shared store, re-ranked in float32.
+        index = SharedFaceIndex(
+            store,
+            centroids,
+            nprobe=options["nprobe"],
+            rerank=settings.FACE_RERANK_CANDIDATES,
+        )
+        build_seconds = time.perf_counter() - started
+
+        exact = FaceRecognition()
+        for pk, embedding in zip(pks.tolist(), embeddings):
+            exact.enroll(pk, embedding)
+        served_exact = SharedFaceIndex(store, rerank=settings.FACE_RERANK_CANDIDATES)
+
+        query_rows = rng.choice(len(embeddings), min(options["queries"], len(embeddings)), replace=False)
+        queries = embeddings[query_rows] + options["noise"] * rng.standard_normal(
+            (len(query_rows), embeddings.shape[1])
+        ).astype(np.float32) / np.sqrt(embeddings.shape[1])
+
+        recall = recall_at_1(index, exact, queries)
+        ann_ms = self._mean_latency_ms(index, queries)
+        exact_ms = self._mean_latency_ms(served_exact, queries)
+
+        index_path = Path(settings.FACE_ANN_INDEX_PATH)
+        save_centroids(index_path, centroids)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Indexed {len(index)} faces into {index.nlist} lists in {build_seconds:.2f}s -> {index_path}"
+            )
+        )
+        self.stdout.write(
+            f"recall@1={recall:.3f} (nprobe={index.nprobe}), "
+            f"ivf={ann_ms:.3f}ms exact={exact_ms:.3f}ms per probe"
+        )
+        if len(store) < settings.FACE_ANN_MIN_ENROLLMENTS:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"Only {len(store)} enrollments; exact search stays active below "
+                    f"FACE_ANN_MIN_ENROLLMENTS={settings.FACE_ANN_MIN_ENROLLMENTS}."
+                )
+            )
+
+    @staticmethod
+    def _mean_latency_ms(matcher, queries) -> float:
+        started = time.perf_counter()
+        for query in queries:
+            matcher.search(query, k=1)
+        return (time.perf_counter() - started) * 1000 / max(len(queries), 1)
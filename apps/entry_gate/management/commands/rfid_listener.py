@@ -0,0 +1,40 @@
+import asyncio
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.entry_gate.rfid_listener import listener_from_settings
+
+
+class Command(BaseCommand):
+    help = "Accept RFID reads over TCP/UDP and answer each with a grant or deny byte."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default=settings.GATE_RFID_LISTEN_HOST)
+        parser.add_argument("--port", type=int, default=settings.GATE_RFID_LISTEN_PORT)
+        parser.add_argument("--no-tcp", dest="tcp", action="store_false")
+        parser.add_argument("--no-udp", dest="udp", action="store_false")
+
+    def handle(self, *args, **options):
+        listener = listener_from_settings()
+        # Load the roster up front so the first taps are answered from memory.
+        listener.identity.load()
+        self.stdout.write(
+            f"Listening for RFID reads on {options['host']}:{options['port']} "
+            f"({len(listener.identity)} students)."
+        )
+        try:
+            asyncio.run(
+                listener.serve(
+                    options["host"], options["port"], tcp=options["tcp"], udp=options["udp"]
+                )
+            )
+        except KeyboardInterrupt:
+            pass
+        stats = listener.stats()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Granted {stats['granted']}, denied {stats['denied']}, "
+                f"recorded {stats['recorded']} taps."
+            )
+        )
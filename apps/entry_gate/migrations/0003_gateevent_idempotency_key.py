@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:56
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('entry_gate', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gateevent',
+            name='idempotency_key',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='gateevent',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
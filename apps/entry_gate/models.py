@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from apps.students.models import Student
 
 
@@ -9,12 +10,19 @@ class GateEvent(models.Model):
         (ENTRY, "Entry"),
         (EXIT, "Exit"),
     ]
+    IDEMPOTENCY_KEY_LENGTH = 64
 
     student = models.ForeignKey(Student, on_delete=models.CASCADE)
     action = models.CharField(max_length=10, choices=ACTION_CHOICES)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Buffered taps replayed through the batch endpoint keep the time the
+    # gate saw them; live scans use the server clock.
+    timestamp = models.DateTimeField(default=timezone.now)
     success = models.BooleanField(default=True)
     reason = models.CharField(max_length=255, blank=True)
+    # Set by gate controllers so a replayed tap is only recorded once.
+    idempotency_key = models.CharField(
+        max_length=IDEMPOTENCY_KEY_LENGTH, unique=True, null=True, blank=True
+    )
 
     def __str__(self):
         return f"{self.student.student_id} {self.action} @ {self.timestamp}"
@@ -0,0 +1,321 @@
+"""Record a gate pass: the event row plus the day's attendance upsert.
+
+Every verified pass (face, RFID or manual) goes through
+:func:`process_gate_event`. The attendance row is changed with a single
+conditional ``UPDATE`` that only touches the fields this pass affects, e.g.
+``first_entry_time`` is set only if it is still NULL. The first pass of the
+day inserts the row with ``ON CONFLICT DO NOTHING`` and re-applies the update,
+so two concurrent scans for one student never race on
+``unique_together (student, date)``.
+
+A steady-state scan costs two queries (event insert, attendance update),
+the first scan of the day four. :func:`process_gate_batch` records a whole
+buffer of taps from a gate controller in a fixed number of queries.
+"""
+
+from datetime import timedelta
+from functools import partial
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from apps.attendance.models import AttendanceRecord
+from apps.students.models import Student
+
+from .broadcast import publish_gate_events
+from .models import GateEvent
+from .signals import gate_events_recorded
+
+# Gate controller clocks may run slightly ahead of the server.
+BATCH_CLOCK_SKEW = timedelta(minutes=5)
+# Longer keys are rejected, never truncated: two keys sharing a prefix would
+# otherwise record only the first pass.
+KEY_TOO_LONG = (
+    f"idempotency_key must be at most {GateEvent.IDEMPOTENCY_KEY_LENGTH} characters."
+)
+
+
+def attendance_changes(action, timestamp, override_reason=None) -> dict:
+    """Field updates a gate pass applies to the day's attendance row."""
+    changes = {}
+    if action == GateEvent.ENTRY:
+        changes["first_entry_time"] = Coalesce(F("first_entry_time"), Value(timestamp))
+        changes["present"] = True
+    elif action == GateEvent.EXIT:
+        changes["last_exit_time"] = timestamp
+    if override_reason is not None:
+        changes["override_reason"] = override_reason
+    return changes
+
+
+def upsert_attendance(student, date, changes: dict) -> None:
+    """Apply ``changes`` to the student's attendance row, creating it if needed."""
+    records = AttendanceRecord.objects.filter(student=student, date=date)
+    if changes and records.update(**changes):
+        return
+
+    AttendanceRecord.objects.bulk_create(
+        [AttendanceRecord(student=student, date=date, present=True)],
+        ignore_conflicts=True,
+    )
+    if changes:
+        records.update(**changes)
+
+
+def process_gate_event(
+    student, action, reason, success=True, override_reason=None, idempotency_key=None
+) -> GateEvent:
+    """
+    Log a gate pass for ``student`` and update today's attendance atomically.
+
+    Raises ``IntegrityError`` if ``idempotency_key`` was already recorded;
+    nothing is written in that case.
+    """
+    with transaction.atomic():
+        event = GateEvent.objects.create(
+            student=student,
+            action=action,
+            success=success,
+            reason=reason,
+            idempotency_key=idempotency_key or None,
+        )
+        upsert_attendance(
+            student,
+            timezone.localdate(event.timestamp),
+            attendance_changes(action, event.timestamp, override_reason),
+        )
+        transaction.on_commit(partial(publish_gate_events, [event]))
+    return event
+
+
+def event_for_key(idempotency_key):
+    """Return the event recorded under ``idempotency_key``, if any."""
+    if not idempotency_key:
+        return None
+    return (
+        GateEvent.objects.select_related("student__user")
+        .filter(idempotency_key=idempotency_key)
+        .first()
+    )
+
+
+def _parse_tap(item, now):
+    """Validate one batch item; return ``(tap, error)``."""
+    if not isinstance(item, dict):
+        return None, "Item must be an object."
+    rfid_tag = item.get("rfid_tag")
+    student_id = item.get("student_id")
+    if not rfid_tag and not student_id:
+        return None, "rfid_tag or student_id is required."
+
+    action = item.get("action") or GateEvent.ENTRY
+    if action not in (GateEvent.ENTRY, GateEvent.EXIT):
+        return None, f"Unknown action {action!r}."
+
+    timestamp = now
+    if item.get("client_timestamp"):
+        timestamp = parse_datetime(str(item["client_timestamp"]))
+        if timestamp is None:
+            return None, "client_timestamp must be an ISO 8601 datetime."
+        if timezone.is_naive(timestamp):
+            timestamp = timezone.make_aware(timestamp)
+        if timestamp > now + BATCH_CLOCK_SKEW:
+            return None, "client_timestamp is in the future."
+
+    key = item.get("idempotency_key") or None
+    if key is not None and len(str(key)) > GateEvent.IDEMPOTENCY_KEY_LENGTH:
+        return None, KEY_TOO_LONG
+
+    return {
+        "rfid_tag": rfid_tag,
+        "student_id": student_id and str(student_id),
+        "action": action,
+        "timestamp": timestamp,
+        "idempotency_key": key and str(key),
+    }, None
+
+
+def _resolve_students(taps) -> tuple[dict, dict]:
+    """Map rfid tags and student numbers in ``taps`` to pks in one query."""
+    tags = {tap["rfid_tag"] for tap in taps if tap["rfid_tag"]}
+    numbers = {tap["student_id"] for tap in taps if tap["student_id"] and not tap["rfid_tag"]}
+    by_tag, by_number = {}, {}
+    if tags or numbers:
+        rows = Student.objects.filter(Q(rfid_tag__in=tags) | Q(student_id__in=numbers))
+        for pk, rfid_tag, student_id in rows.values_list("pk", "rfid_tag", "student_id"):
+            by_tag[rfid_tag] = pk
+            by_number[student_id] = pk
+    return by_tag, by_number
+
+
+def _merge_attendance(events) -> None:
+    """Fold a batch of events into attendance rows with a fixed number of queries."""
+    groups = {}
+    for event in events:
+        key = (event.student_id, timezone.localdate(event.timestamp))
+        entry, exit_ = groups.get(key, (None, None))
+        if event.action == GateEvent.ENTRY:
+            entry = event.timestamp if entry is None else min(entry, event.timestamp)
+        else:
+            exit_ = event.timestamp if exit_ is None else max(exit_, event.timestamp)
+        groups[key] = (entry, exit_)
+    if not groups:
+        return
+
+    AttendanceRecord.objects.bulk_create(
+        [
+            AttendanceRecord(student_id=student_pk, date=date, present=True)
+            for student_pk, date in groups
+        ],
+        ignore_conflicts=True,
+    )
+    records = AttendanceRecord.objects.select_for_update().filter(
+        student_id__in={student_pk for student_pk, _ in groups},
+        date__in={date for _, date in groups},
+    )
+    changed = []
+    for record in records:
+        merged = groups.get((record.student_id, record.date))
+        if merged is None:
+            continue
+        entry, exit_ = merged
+        if entry is not None:
+            if record.first_entry_time is None or entry < record.first_entry_time:
+                record.first_entry_time = entry
+            record.present = True
+        if exit_ is not None and (record.last_exit_time is None or exit_ > record.last_exit_time):
+            record.last_exit_time = exit_
+        changed.append(record)
+    AttendanceRecord.objects.bulk_update(
+        changed, ["first_entry_time", "last_exit_time", "present"]
+    )
+
+
+def process_gate_batch(items, reason="Buffered RFID tap") -> list[dict]:
+    """
+    Record a buffer of taps from a gate controller.
+
+    Each item names the student by ``rfid_tag`` or ``student_id`` and may
+    carry ``action``, ``client_timestamp`` and ``idempotency_key``. Items
+    whose key was already recorded (in this or an earlier batch) are
+    reported as duplicates rather than recorded twice. Returns one result
+    per item, in order, with ``status`` ``recorded``, ``duplicate`` or
+    ``rejected``.
+
+    Identities, known keys, the event insert and the attendance merge each
+    take a constant number of queries, however many taps are replayed.
+    """
+    now = timezone.now()
+    results = [None] * len(items)
+    taps = []
+    for index, item in enumerate(items):
+        tap, error = _parse_tap(item, now)
+        if error:
+            results[index] = {"index": index, "status": "rejected", "detail": error}
+        else:
+            tap["index"] = index
+            taps.append(tap)
+
+    by_tag, by_number = _resolve_students(taps)
+    pending = []
+    for tap in taps:
+        if tap["rfid_tag"]:
+            tap["student_pk"] = by_tag.get(tap["rfid_tag"])
+        else:
+            tap["student_pk"] = by_number.get(tap["student_id"])
+        if tap["student_pk"] is None:
+            results[tap["index"]] = {
+                "index": tap["index"],
+                "status": "rejected",
+                "detail": "Student not found.",
+            }
+        else:
+            pending.append(tap)
+
+    _record_taps(pending, results, reason)
+    return results
+
+
+def record_taps(taps, reason="") -> list[dict]:
+    """
+    Record taps whose student is already resolved (``student_pk``), e.g.
+    entries replayed from the write-behind journal. Each tap may override
+    ``reason`` and ``success``; results are returned in order.
+    """
+    results = [None] * len(taps)
+    for index, tap in enumerate(taps):
+        tap["index"] = index
+    _record_taps(taps, results, reason)
+    return results
+
+
+def _record_taps(pending, results, reason) -> None:
+    try:
+        _insert_taps(pending, results, reason)
+    except IntegrityError:
+        # A concurrent replay recorded one of our keys first; they are
+        # duplicates now.
+        _insert_taps(pending, results, reason)
+
+
+def _insert_taps(pending, results, reason) -> None:
+    with transaction.atomic():
+        keys = {tap["idempotency_key"] for tap in pending if tap["idempotency_key"]}
+        known = dict(
+            GateEvent.objects.filter(idempotency_key__in=keys).values_list(
+                "idempotency_key", "pk"
+            )
+        )
+        first_in_batch = {}
+        repeats = []
+        new_taps = []
+        for tap in pending:
+            key = tap["idempotency_key"]
+            if key in known:
+                results[tap["index"]] = {
+                    "index": tap["index"],
+                    "status": "duplicate",
+                    "event_id": known[key],
+                }
+            elif key in first_in_batch:
+                repeats.append(tap)
+            else:
+                if key is not None:
+                    first_in_batch[key] = tap
+                new_taps.append(tap)
+
+        events = GateEvent.objects.bulk_create(
+            [
+                GateEvent(
+                    student_id=tap["student_pk"],
+                    action=tap["action"],
+                    timestamp=tap["timestamp"],
+                    success=tap.get("success", True),
+                    reason=tap.get("reason", reason),
+                    idempotency_key=tap["idempotency_key"],
+                )
+                for tap in new_taps
+            ]
+        )
+        _merge_attendance(events)
+        transaction.on_commit(partial(publish_gate_events, events))
+        transaction.on_commit(
+            partial(gate_events_recorded.send, sender=GateEvent, events=events)
+        )
+
+    for tap, event in zip(new_taps, events):
+        tap["event_id"] = event.pk
+        results[tap["index"]] = {
+            "index": tap["index"],
+            "status": "recorded",
+            "event_id": event.pk,
+        }
+    for tap in repeats:
+        results[tap["index"]] = {
+            "index": tap["index"],
+            "status": "duplicate",
+            "event_id": first_in_batch[tap["idempotency_key"]]["event_id"],
+        }
@@ -0,0 +1,159 @@
+"""Compact scan responses for gate devices.
+
+A turnstile only needs to know whether to open and what to show on its
+display, not the nested student/user shape the console renders. Clients
+opt in with ``Accept: application/vnd.seas.gate+json`` or ``?compact=1``;
+the compact body is a flat dict built straight from the event and the
+identity-map student, skipping the DRF serializer stack. Everyone else
+keeps getting the full ``GateEventSerializer`` shape.
+
+:meth:`GateResponseMixin.record_pass` also debounces repeated taps and
+honours ``Idempotency-Key`` (see :mod:`.dedupe`). A repeat is answered with
+the original body and an ``Idempotent-Replayed: true`` header. With
+``GATE_WRITE_BEHIND`` the event is journaled rather than inserted, so the
+response carries no event ``id`` yet (see :mod:`.journal`).
+"""
+
+from typing import Optional
+
+from django.conf import settings
+from django.db import IntegrityError
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from .dedupe import GatePass, get_recent_passes
+from .journal import get_gate_journal
+from .models import GateEvent
+from .pipeline import KEY_TOO_LONG, event_for_key, process_gate_event
+from .serializers import GateEventSerializer
+
+COMPACT_MEDIA_TYPE = "application/vnd.seas.gate+json"
+
+
+class CompactGateRenderer(JSONRenderer):
+    media_type = COMPACT_MEDIA_TYPE
+
+
+def wants_compact(request) -> bool:
+    if request.query_params.get("compact") in ("1", "true", "yes"):
+        return True
+    renderer = getattr(request, "accepted_renderer", None)
+    return isinstance(renderer, CompactGateRenderer)
+
+
+def compact_event(event, verification_method) -> dict:
+    student = event.student
+    return {
+        "id": event.pk,
+        "success": event.success,
+        "action": event.action,
+        "timestamp": event.timestamp.isoformat(),
+        "student_id": student.student_id,
+        "name": student.user.get_full_name(),
+        "verification_method": verification_method,
+    }
+
+
+def gate_payload(gate_pass: GatePass, compact: bool = False) -> dict:
+    event = gate_pass.event
+    if compact:
+        data = compact_event(event, gate_pass.verification_method)
+    else:
+        data = GateEventSerializer(event).data
+        data["verification_method"] = gate_pass.verification_method
+        data["attendance_updated"] = True
+    data.update(gate_pass.extra)
+    return data
+
+
+def recent_pass(idempotency_key, student_pk, action, gate="") -> Optional[GatePass]:
+    """A pass this worker just recorded for the same key or tap, if any."""
+    recent = get_recent_passes()
+    gate_pass = recent.by_key(idempotency_key) or recent.by_tap(student_pk, action, gate)
+    if gate_pass is not None:
+        recent.remember(gate_pass, idempotency_key, gate)
+    return gate_pass
+
+
+def record_gate_pass(
+    student, action, reason, verification_method, idempotency_key="", gate="", extra=None, **kwargs
+) -> tuple[GatePass, bool]:
+    """
+    Record a pass unless it repeats one seen moments ago (same student,
+    action and ``gate``) or reuses an idempotency key. Returns the pass and
+    whether it was a replay.
+    """
+    gate_pass = recent_pass(idempotency_key, student.pk, action, gate)
+    if gate_pass is not None:
+        return gate_pass, True
+
+    replayed = False
+    # Manual check-ins also set override_reason, so they stay synchronous.
+    if settings.GATE_WRITE_BEHIND and "override_reason" not in kwargs:
+        event = get_gate_journal().enqueue(
+            student, action, reason, idempotency_key=idempotency_key, **kwargs
+        )
+    else:
+        try:
+            event = process_gate_event(
+                student, action, reason, idempotency_key=idempotency_key, **kwargs
+            )
+        except IntegrityError:
+            # Another worker recorded this key first.
+            event = event_for_key(idempotency_key)
+            if event is None:
+                raise
+            replayed = True
+    gate_pass = GatePass(event, verification_method, extra or {})
+    get_recent_passes().remember(gate_pass, idempotency_key, gate)
+    return gate_pass, replayed
+
+
+class GateResponseMixin:
+    """Records gate passes once and renders them in either response shape."""
+
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, CompactGateRenderer]
+
+    def _param(self, name: str) -> str:
+        data = self.request.data
+        value = data.get(name) if hasattr(data, "get") else None
+        return value or self.request.query_params.get(name) or ""
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # Reject a bad key before any recognition or lookup work.
+        self.idempotency_key()
+
+    def idempotency_key(self) -> str:
+        key = str(self.request.headers.get("Idempotency-Key") or self._param("idempotency_key"))
+        if len(key) > GateEvent.IDEMPOTENCY_KEY_LENGTH:
+            raise ParseError(KEY_TOO_LONG)
+        return key
+
+    def replayed_response(self):
+        """Return the original response if this request's key was just handled."""
+        gate_pass = get_recent_passes().by_key(self.idempotency_key())
+        if gate_pass is None:
+            return None
+        return self.pass_response(gate_pass, replayed=True)
+
+    def record_pass(self, student, action, reason, verification_method, extra=None, **kwargs):
+        gate_pass, replayed = record_gate_pass(
+            student,
+            action,
+            reason,
+            verification_method,
+            idempotency_key=self.idempotency_key(),
+            gate=self._param("gate"),
+            extra=extra,
+            **kwargs,
+        )
+        return self.pass_response(gate_pass, replayed)
+
+    def pass_response(self, gate_pass: GatePass, replayed: bool = False) -> Response:
+        response = Response(gate_payload(gate_pass, wants_compact(self.request)))
+        if replayed:
+            response["Idempotent-Replayed"] = "true"
+        return response
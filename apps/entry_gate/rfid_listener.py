@@ -0,0 +1,318 @@
+"""Line-protocol listener for RFID readers.
+
+Readers that can open a socket do not need HTTP. ``manage.py rfid_listener``
+accepts tag reads over TCP and UDP, one per line::
+
+    <rfid_tag> [entry|exit] [idempotency_key]
+
+and answers every line with a single byte: ``G`` (grant) or ``D`` (deny).
+Over TCP the replies come back in order on the same connection; a UDP
+datagram may carry several lines and gets one reply datagram with one byte
+per line.
+
+The decision is the one :class:`~.views.RFIDScanView` makes: a card the
+identity map knows is granted, repeats within ``GATE_DEBOUNCE_SECONDS`` at
+the same reader (or with a known idempotency key) are granted without a
+second event, and unknown cards are denied, as are lines whose idempotency
+key is longer than 64 characters. Known cards are answered from
+memory on the event loop; only a card missing from the map costs a database
+lookup, in a worker thread.
+
+Granted taps are answered first and written afterwards: a :class:`TapBatcher`
+hands them to :func:`.pipeline.record_taps` every
+``GATE_RFID_FLUSH_INTERVAL`` seconds or ``GATE_RFID_BATCH_SIZE`` taps, in a
+worker thread. A crash loses at most the taps of the current interval; a
+database outage longer than ``GATE_RFID_MAX_ATTEMPTS`` flushes, or more than
+``GATE_RFID_MAX_QUEUED`` waiting taps, drops taps (logged as errors).
+"""
+
+import abc
+import asyncio
+import logging
+from typing import Optional
+import uuid
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from apps.students.identity import get_identity_map, student_for_rfid
+from apps.students.models import Student
+
+from .dedupe import GatePass, get_recent_passes
+from .models import GateEvent
+from .pipeline import KEY_TOO_LONG, record_taps
+
+logger = logging.getLogger(__name__)
+
+GRANT = b"G"
+DENY = b"D"
+REASON = "RFID validated"
+MAX_BACKOFF = 5.0
+
+
+class TapBatcher:
+    """Collects granted taps and records them in batches off the event loop.
+
+    A batch that fails is retried on the next flush, up to ``max_attempts``
+    times, then dropped and logged. Taps for students deleted since the
+    grant are dropped before writing; they would fail every batch they are
+    in. At most ``max_queued`` taps wait; beyond that the oldest are dropped.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = 500,
+        interval: float = 0.05,
+        max_attempts: int = 8,
+        max_queued: int = 100_000,
+    ):
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_attempts = max_attempts
+        self.max_queued = max_queued
+        self._taps: list[dict] = []
+        self._attempts: dict[str, int] = {}
+        self._full = asyncio.Event()
+        self._failures = 0
+        self.recorded = 0
+        self.dropped = 0
+
+    def add(self, tap: dict) -> None:
+        self._taps.append(tap)
+        if len(self._taps) > self.max_queued:
+            self._drop(self._taps[: -self.max_queued], "the queue is full")
+            del self._taps[: -self.max_queued]
+        if len(self._taps) >= self.batch_size:
+            self._full.set()
+
+    def _drop(self, taps: list[dict], why: str) -> None:
+        for tap in taps:
+            self._attempts.pop(tap["idempotency_key"], None)
+        self.dropped += len(taps)
+        logger.error("Dropping %d granted RFID taps: %s.", len(taps), why)
+
+    @staticmethod
+    def _write(taps: list[dict]) -> list[dict]:
+        """Record ``taps``; returns the ones whose student no longer exists."""
+        try:
+            known = set(
+                Student.objects.filter(
+                    pk__in={tap["student_pk"] for tap in taps}
+                ).values_list("pk", flat=True)
+            )
+            record_taps([tap for tap in taps if tap["student_pk"] in known], reason=REASON)
+            return [tap for tap in taps if tap["student_pk"] not in known]
+        finally:
+            close_old_connections()
+
+    async def flush(self) -> int:
+        taps, self._taps = self._taps[: self.batch_size], self._taps[self.batch_size :]
+        if len(self._taps) < self.batch_size:
+            self._full.clear()
+        if not taps:
+            return 0
+        try:
+            orphans = await asyncio.to_thread(self._write, taps)
+        except Exception:
+            logger.exception("Recording %d RFID taps failed.", len(taps))
+            self._failures += 1
+            retry, expired = [], []
+            for tap in taps:
+                key = tap["idempotency_key"]
+                self._attempts[key] = self._attempts.get(key, 0) + 1
+                (retry if self._attempts[key] < self.max_attempts else expired).append(tap)
+            if expired:
+                self._drop(expired, f"still failing after {self.max_attempts} attempts")
+            # Keys make the retry safe if part of the batch did commit.
+            self._taps[:0] = retry
+            return 0
+        self._failures = 0
+        for tap in taps:
+            self._attempts.pop(tap["idempotency_key"], None)
+        if orphans:
+            self._drop(orphans, "their students were deleted")
+        written = len(taps) - len(orphans)
+        self.recorded += written
+        return written
+
+    async def run(self) -> None:
+        try:
+            while True:
+                if self._failures:
+                    # Back off while the database is failing.
+                    await asyncio.sleep(min(self.interval * 2**self._failures, MAX_BACKOFF))
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.interval)
+                except asyncio.TimeoutError:
+                    pass
+                await self.flush()
+        finally:
+            await asyncio.shield(self._drain())
+
+    async def _drain(self) -> None:
+        while self._taps:
+            before = len(self._taps)
+            await self.flush()
+            if len(self._taps) >= before:
+                break
+
+
+def parse_line(line: bytes) -> Optional[tuple[str, str, str]]:
+    """Split a reader line into ``(rfid_tag, action, key)``; ``None`` if blank.
+
+    Raises ``ValueError`` for an idempotency key that is too long.
+    """
+    fields = line.decode("ascii", "replace").split()
+    if not fields:
+        return None
+    rfid_tag = fields[0]
+    action = fields[1] if len(fields) > 1 else GateEvent.ENTRY
+    key = fields[2] if len(fields) > 2 else ""
+    if len(key) > GateEvent.IDEMPOTENCY_KEY_LENGTH:
+        raise ValueError(KEY_TOO_LONG)
+    return rfid_tag, action, key
+
+
+class LineListener(abc.ABC):
+    """Serves the reader line protocol; subclasses decide each line.
+
+    :meth:`decide` answers one line (``GRANT``, ``DENY`` or ``None`` for a
+    blank line); :meth:`background` runs for as long as the listener serves.
+    """
+
+    @abc.abstractmethod
+    async def decide(self, line: bytes, gate: str = "") -> Optional[bytes]:
+        """Answer one reader line."""
+
+    async def background(self) -> None:
+        await asyncio.Event().wait()
+
+    async def handle_stream(self, reader, writer) -> None:
+        gate = writer.get_extra_info("peername", ("",))[0]
+        try:
+            while line := await reader.readline():
+                reply = await self.decide(line, gate)
+                if reply is not None:
+                    writer.write(reply)
+                    await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str, port: int, tcp: bool = True, udp: bool = True) -> None:
+        loop = asyncio.get_running_loop()
+        servers = []
+        if tcp:
+            servers.append(await asyncio.start_server(self.handle_stream, host, port))
+        if udp:
+            transport, _ = await loop.create_datagram_endpoint(
+                lambda: _DatagramProtocol(self), local_addr=(host, port)
+            )
+        try:
+            await self.background()
+        finally:
+            for server in servers:
+                server.close()
+            if udp:
+                transport.close()
+
+
+class RFIDListener(LineListener):
+    def __init__(self, batcher: TapBatcher):
+        self.batcher = batcher
+        self.identity = get_identity_map()
+        self.recent = get_recent_passes()
+        self.granted = 0
+        self.denied = 0
+
+    async def decide(self, line: bytes, gate: str = "") -> Optional[bytes]:
+        """Grant or deny one reader line; ``None`` for blank lines."""
+        try:
+            parsed = parse_line(line)
+        except ValueError:
+            self.denied += 1
+            return DENY
+        if parsed is None:
+            return None
+        rfid_tag, action, key = parsed
+        if action not in (GateEvent.ENTRY, GateEvent.EXIT):
+            self.denied += 1
+            return DENY
+
+        student_pk = self.identity.cached_pk_for_rfid(
+            rfid_tag, await self.identity.ashared_generation()
+        )
+        if student_pk is None:
+            student = await asyncio.to_thread(student_for_rfid, rfid_tag)
+            if student is None:
+                self.denied += 1
+                return DENY
+            student_pk = student.pk
+
+        self.granted += 1
+        if self.recent.by_key(key) or self.recent.by_tap(student_pk, action, gate):
+            return GRANT
+
+        event = GateEvent(
+            student_id=student_pk,
+            action=action,
+            reason=REASON,
+            timestamp=timezone.now(),
+            idempotency_key=key or uuid.uuid4().hex,
+        )
+        self.recent.remember(GatePass(event, "rfid"), key, gate)
+        self.batcher.add(
+            {
+                "student_pk": student_pk,
+                "action": action,
+                "timestamp": event.timestamp,
+                "idempotency_key": event.idempotency_key,
+            }
+        )
+        return GRANT
+
+    async def background(self) -> None:
+        await self.batcher.run()
+
+    def stats(self) -> dict:
+        return {
+            "granted": self.granted,
+            "denied": self.denied,
+            "recorded": self.batcher.recorded,
+            "dropped": self.batcher.dropped,
+            "queued": len(self.batcher._taps),
+        }
+
+
+class _DatagramProtocol(asyncio.DatagramProtocol):
+    def __init__(self, listener: LineListener):
+        self.listener = listener
+        self.transport = None
+        self._tasks = set()
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        task = asyncio.ensure_future(self._reply(data, addr))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _reply(self, data, addr):
+        replies = [await self.listener.decide(line, addr[0]) for line in data.splitlines()]
+        reply = b"".join(r for r in replies if r is not None)
+        if reply:
+            self.transport.sendto(reply, addr)
+
+
+def listener_from_settings() -> RFIDListener:
+    return RFIDListener(
+        TapBatcher(
+            batch_size=settings.GATE_RFID_BATCH_SIZE,
+            interval=settings.GATE_RFID_FLUSH_INTERVAL,
+            max_attempts=settings.GATE_RFID_MAX_ATTEMPTS,
+            max_queued=settings.GATE_RFID_MAX_QUEUED,
+        )
+    )
@@ -1,58 +1,350 @@
+import os
 from pathlib import Path
-import json
+import threading
+import time
+
+import numpy as np
 from django.conf import settings
+from django.utils import timezone
+
+from apps.attendance.models import AttendanceRecord
 from apps.students.models import Student
 
-# folder to store face enrollments
-FACES_DIR = Path(settings.BASE_DIR) / "face_data"
-FACES_DIR.mkdir(exist_ok=True)
+from .ann import load_centroids
+from .embedding_cache import EmbeddingCache, content_key, perceptual_key
+from .embedding_pool import EmbeddingBusy, EmbeddingService
+from .face import EMBEDDING_DIM, FaceMatch, average_embeddings
+from .models import GateEvent
+from .quality import FrameRejected, assess_frame
+from .shared_index import SharedFaceIndex
+from .store import EmbeddingStore
+
+_store = None
+_recognizer = None
+_recognizer_index_mtime = None
+_index_checked_at = 0.0
+_embedding_service = None
+_embedding_cache = None
+_lock = threading.Lock()
+
+
+def get_embedding_service() -> EmbeddingService:
+    """Return the process-wide embedding pool client."""
+    global _embedding_service
+    if _embedding_service is None:
+        with _lock:
+            if _embedding_service is None:
+                _embedding_service = EmbeddingService(
+                    max_workers=settings.FACE_EMBEDDING_WORKERS,
+                    max_pending=settings.FACE_EMBEDDING_QUEUE_SIZE,
+                    timeout=settings.FACE_EMBEDDING_TIMEOUT,
+                )
+    return _embedding_service
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Return the process-wide cache of recent frame embeddings."""
+    global _embedding_cache
+    if _embedding_cache is None:
+        with _lock:
+            if _embedding_cache is None:
+                _embedding_cache = EmbeddingCache(
+                    max_entries=settings.FACE_EMBEDDING_CACHE_SIZE,
+                    ttl=settings.FACE_EMBEDDING_CACHE_TTL,
+                )
+    return _embedding_cache
+
+
+def get_store() -> EmbeddingStore:
+    """Return the process-wide embedding store at ``settings.FACE_STORE_PATH``."""
+    global _store
+    if _store is None:
+        with _lock:
+            if _store is None:
+                _store = EmbeddingStore(settings.FACE_STORE_PATH, EMBEDDING_DIM)
+    return _store
+
 
+def build_recognizer(store: EmbeddingStore) -> SharedFaceIndex:
+    """Build a matcher that searches the shared store in place.
 
-def enroll_student_face(student: Student, image_file) -> None:
+    Large rosters use the IVF centroids written by ``rebuild_face_index``;
+    smaller ones are searched exactly, which is already fast below a few
+    thousand rows.
     """
-    Development implementation: stores enrollment metadata.
-    In production, this would use face_recognition library for actual encoding.
+    centroids = None
+    index_path = Path(settings.FACE_ANN_INDEX_PATH)
+    if len(store) >= settings.FACE_ANN_MIN_ENROLLMENTS and index_path.exists():
+        centroids = load_centroids(index_path)
+    return SharedFaceIndex(
+        store,
+        centroids,
+        nprobe=settings.FACE_ANN_NPROBE,
+        rerank=settings.FACE_RERANK_CANDIDATES,
+    )
+
+
+def _index_mtime():
+    try:
+        return os.stat(settings.FACE_ANN_INDEX_PATH).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def get_recognizer() -> SharedFaceIndex:
+    """Return the process-wide matcher, creating it on first use.
+
+    It is rebuilt when ``rebuild_face_index`` replaces the centroid file, so
+    running workers pick up new centroids without a restart. The file is
+    checked at most every ``FACE_ANN_RELOAD_CHECK_SECONDS``.
     """
-    # Validate image file exists and has content
-    if not image_file:
-        raise ValueError("No image file provided.")
+    global _recognizer, _recognizer_index_mtime, _index_checked_at
+    now = time.monotonic()
+    if _recognizer is not None and now - _index_checked_at < settings.FACE_ANN_RELOAD_CHECK_SECONDS:
+        return _recognizer
+    _index_checked_at = now
+    mtime = _index_mtime()
+    if _recognizer is None or mtime != _recognizer_index_mtime:
+        store = get_store()
+        with _lock:
+            if _recognizer is None or mtime != _recognizer_index_mtime:
+                _recognizer = build_recognizer(store)
+                _recognizer_index_mtime = mtime
+    return _recognizer
 
-    # Read a small portion to verify it's a valid file
+
+def reset_face_index() -> None:
+    """Drop the cached store and matcher, e.g. after changing FACE_STORE_PATH."""
+    global _store, _recognizer, _embedding_cache
+    with _lock:
+        if _store is not None:
+            _store.close()
+        _store = None
+        _recognizer = None
+        _embedding_cache = None
+
+
+def _embed_upload(image_file):
+    """
+    Return the embedding of an uploaded image, or ``None`` if it has no face.
+    Raises ``FrameRejected`` for frames that fail the quality pre-filter and
+    ``EmbeddingBusy`` when the embedding pool is saturated.
+
+    Recently seen frames are answered from the embedding cache without being
+    decoded again.
+    """
     image_file.seek(0)
-    content = image_file.read(100)
+    content = image_file.read()
     if len(content) < 50:
+        return None
+
+    cache = get_embedding_cache()
+    keys = [content_key(content)]
+    embedding = cache.get(keys[0])
+    if embedding is not None:
+        return embedding
+
+    quality = assess_frame(content)
+    if not quality.ok:
+        raise FrameRejected(quality.reason)
+
+    if settings.FACE_EMBEDDING_CACHE_PERCEPTUAL:
+        keys.append(perceptual_key(quality.fingerprint))
+        embedding = cache.get(keys[1])
+        if embedding is not None:
+            cache.set(keys[0], embedding)
+            return embedding
+
+    embedding = get_embedding_service().embed(content)
+    if embedding is not None:
+        for key in keys:
+            cache.set(key, embedding)
+    return embedding
+
+
+def embed_face_images(*image_files):
+    """
+    Build a face template from one or more captures.
+
+    Captures without a detectable face are skipped and the rest are averaged,
+    so one poor registration photo no longer decides every later match. The
+    development embedder stands in for the face_recognition encoder. This is
+    the slow part of an enrollment: call it outside any transaction.
+    """
+    # Validate image file exists and has content
+    image_files = [image_file for image_file in image_files if image_file]
+    if not image_files:
+        raise ValueError("No image file provided.")
+    if len(image_files) > settings.FACE_MAX_ENROLLMENT_IMAGES:
+        raise ValueError(
+            f"At most {settings.FACE_MAX_ENROLLMENT_IMAGES} images can be enrolled at once."
+        )
+
+    embeddings = []
+    rejection = None
+    for image_file in image_files:
+        try:
+            embeddings.append(_embed_upload(image_file))
+        except FrameRejected as exc:
+            rejection = exc.reason
+
+    template = average_embeddings(embeddings)
+    if template is None:
+        if rejection:
+            raise ValueError(f"Image rejected: {rejection}.")
         raise ValueError("No face found in the image.")
+    return template
 
-    # Store enrollment metadata
-    enrollment_data = {
-        "student_id": student.student_id,
-        "student_pk": student.pk,
-        "enrolled": True
-    }
 
-    enrollment_file = FACES_DIR / f"{student.pk}.json"
-    with open(enrollment_file, 'w') as f:
-        json.dump(enrollment_data, f)
+def store_student_face(student: Student, template) -> None:
+    """Save ``template`` as ``student``'s face in the store and the matcher."""
+    get_store().append(student.pk, template)
+    get_recognizer().enroll(student.pk, template)
+
+
+def enroll_student_face(student: Student, *image_files) -> None:
+    """Build a face template for ``student`` from captures and store it."""
+    store_student_face(student, embed_face_images(*image_files))
+
 
+def remove_student_face(student_pk: int) -> None:
+    """Forget a student's enrollment in both the store and the matcher."""
+    if get_store().delete(student_pk):
+        get_recognizer().remove(student_pk)
 
-def recognize_student_from_image(image_file):
+
+def recognize_student_from_image(image_file, action=None):
     """
-    Development implementation: returns first enrolled student.
-    In production, this would use face_recognition library for actual matching.
+    Return the enrolled student whose face best matches the image, provided
+    the cosine similarity clears the matcher's threshold. Raises
+    ``FrameRejected`` with the reason when the frame is not worth embedding.
     """
     if not image_file:
         return None
+    return recognize_student_from_frames([image_file], action=action)
 
-    # Validate image file
-    image_file.seek(0)
-    content = image_file.read(100)
-    if len(content) < 50:
+
+def presence_mask(recognizer: SharedFaceIndex, action):
+    """
+    Restrict the search to students who can plausibly make this pass today.
+
+    Nobody already inside (entered, no exit recorded) can be entering, and
+    only they can be leaving. Returns ``None`` when there is nothing to prune.
+    """
+    if not settings.FACE_PRESENCE_PRUNING or action not in (GateEvent.ENTRY, GateEvent.EXIT):
+        return None
+    inside = list(
+        AttendanceRecord.objects.filter(
+            date=timezone.localdate(),
+            first_entry_time__isnull=False,
+            last_exit_time__isnull=True,
+        ).values_list("student_id", flat=True)
+    )
+    if not inside:
         return None
+    return recognizer.candidate_mask(inside, exclude=action == GateEvent.ENTRY)
 
-    # Find enrolled students
-    for student in Student.objects.all():
-        enrollment_file = FACES_DIR / f"{student.pk}.json"
-        if enrollment_file.exists():
-            return student
 
+def recognize_student_from_frames(image_files, action=None):
+    """
+    Recognise a student from a burst of frames of one approach.
+
+    Frames are embedded in order and the first one whose best match clears
+    the threshold by ``FACE_BURST_EARLY_EXIT_MARGIN`` decides immediately.
+    Otherwise the frame embeddings are averaged, which cancels much of the
+    per-frame noise, and every candidate seen in any frame is re-scored
+    against that mean, so several borderline frames of the same face still
+    add up to a match.
+
+    Given the gate ``action``, the students who can plausibly be passing
+    that way are searched first (see :func:`presence_mask`); the whole
+    roster is only searched when none of them matches.
+
+    Raises ``FrameRejected`` only if every frame was rejected, and
+    ``EmbeddingBusy`` only if no frame could be embedded.
+    """
+    image_files = [image_file for image_file in image_files if image_file]
+    image_files = image_files[: settings.FACE_BURST_MAX_FRAMES]
+    recognizer = get_recognizer()
+    allowed = presence_mask(recognizer, action)
+
+    probes = []
+    candidates = set()
+    rejection = None
+    for image_file in image_files:
+        try:
+            embedding = _embed_upload(image_file)
+        except FrameRejected as exc:
+            rejection = exc
+            continue
+        except EmbeddingBusy:
+            if not probes:
+                raise
+            break
+        if embedding is None:
+            continue
+
+        probes.append(embedding)
+        match = _confident_match(recognizer, embedding, allowed, candidates)
+        if match is not None:
+            return _matched_student(match)
+
+    if not probes:
+        if rejection is not None:
+            raise rejection
+        return None
+
+    match = _combined_match(recognizer, candidates, probes)
+    if match is None and allowed is not None:
+        # Presence can be stale (a missed exit scan), so retry on everyone.
+        candidates = set()
+        for probe in probes:
+            match = _confident_match(recognizer, probe, None, candidates)
+            if match is not None:
+                break
+        else:
+            match = _combined_match(recognizer, candidates, probes)
+    return _matched_student(match)
+
+
+def _confident_match(recognizer, probe, allowed, candidates):
+    """Search one frame; return its best match if it clears the early-exit bar."""
+    matches = recognizer.search(probe, k=settings.FACE_BURST_CANDIDATES, allowed=allowed)
+    candidates.update(match.student_pk for match in matches)
+    early_exit = recognizer.threshold + settings.FACE_BURST_EARLY_EXIT_MARGIN
+    if matches and matches[0].score >= early_exit:
+        return matches[0]
     return None
+
+
+def _combined_match(recognizer, candidates, probes):
+    match = combine_frame_matches(recognizer.store, candidates, probes)
+    if match is None or match.score < recognizer.threshold:
+        return None
+    return match
+
+
+def _matched_student(match):
+    if match is None:
+        return None
+    return Student.objects.select_related("user").filter(pk=match.student_pk).first()
+
+
+def combine_frame_matches(store: EmbeddingStore, candidates, probes):
+    """Return the candidate that best matches the mean of ``probes``."""
+    candidates = [pk for pk in candidates if pk in store]
+    probe = average_embeddings(probes)
+    if not candidates or probe is None:
+        return None
+    templates = np.stack([store.get(pk) for pk in candidates])
+    scores = templates @ probe
+    best = int(np.argmax(scores))
+    return FaceMatch(candidates[best], float(scores[best]))
+
+
+def face_pipeline_stats() -> dict:
+    """Counters for sizing the embedding cache and pool."""
+    return {
+        "embedding_cache": get_embedding_cache().stats(),
+        "embedding_pool": get_embedding_service().stats(),
+    }
@@ -0,0 +1,166 @@
+"""Face matcher that searches the memory-mapped embedding store in place.
+
+Gunicorn workers each build their own matcher, but none of them copy the
+embeddings: scores are computed directly against the store's mmap view, so
+the embedding pages live once in the OS page cache no matter how many workers
+run. Each worker only keeps a liveness mask and, in IVF mode, per-list record
+offsets.
+
+Candidates are scored against the int8 templates first; only the best
+``rerank`` of them are re-scored against the float32 sidecar, so the
+full-precision pages are touched a handful of rows at a time.
+
+Before every search the matcher checks the store's generation counter. A new
+enrollment written by any worker (``EnrollView``, ``StudentSerializer.create``)
+bumps the generation, and the other workers fold the appended records in on
+their next scan without a restart.
+
+Searches can be restricted to a candidate mask (see :meth:`candidate_mask`),
+e.g. the students who can plausibly be entering or leaving right now.
+
+Each search works on one :meth:`~.store.EmbeddingStore.view` of the store,
+so another thread folding in new records cannot change the arrays' lengths
+halfway through a search.
+"""
+
+from array import array
+import threading
+from typing import Optional
+
+import numpy as np
+
+from .face import MATCH_THRESHOLD, FaceMatch, normalize, quantized_scores, top_k
+from .store import EmbeddingStore, StoreView
+
+
+class SharedFaceIndex:
+    def __init__(
+        self,
+        store: EmbeddingStore,
+        centroids=None,
+        nprobe: int = 8,
+        threshold: float = MATCH_THRESHOLD,
+        rerank: int = 16,
+    ):
+        self.store = store
+        self.nprobe = nprobe
+        self.rerank = rerank
+        self.threshold = threshold
+        self.centroids = None if centroids is None else np.asarray(centroids, dtype=np.float32)
+        self._lists = [array("q") for _ in range(self.nlist)]
+        self._seen = 0
+        self._lock = threading.Lock()
+        self.sync()
+
+    @property
+    def nlist(self) -> int:
+        return 0 if self.centroids is None else len(self.centroids)
+
+    @property
+    def generation(self) -> int:
+        return self.store.generation
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    def __contains__(self, student_pk: int) -> bool:
+        return student_pk in self.store
+
+    def sync(self) -> bool:
+        """Fold in records appended by any process since the last call."""
+        with self._lock:
+            changed = self.store.refresh()
+            count = self.store.count
+            if self._seen < count and self.centroids is not None:
+                offsets = np.arange(self._seen, count)
+                offsets = offsets[self.store.live[self._seen : count]]
+                if len(offsets):
+                    assignment = np.argmax(
+                        self.store.embeddings[offsets] @ self.centroids.T, axis=1
+                    )
+                    for offset, list_id in zip(offsets.tolist(), assignment.tolist()):
+                        self._lists[list_id].append(offset)
+            self._seen = count
+            return changed
+
+    def enroll(self, student_pk: int, embedding) -> None:
+        """Embeddings are written through the store; just pick them up."""
+        self.sync()
+
+    def remove(self, student_pk: int) -> bool:
+        self.sync()
+        return student_pk not in self.store
+
+    def candidate_mask(self, student_pks, exclude: bool = False) -> np.ndarray:
+        """Boolean record mask allowing only ``student_pks``, or all but them.
+
+        Records appended after the mask was built are left out of it.
+        """
+        self.sync()
+        view = self.store.view()
+        offsets = self.store.offsets(student_pks)
+        offsets = offsets[offsets < view.count]
+        if exclude:
+            mask = view.live
+            mask[offsets] = False
+        else:
+            mask = np.zeros(view.count, dtype=bool)
+            mask[offsets] = True
+        return mask
+
+    @staticmethod
+    def _allowed(allowed: np.ndarray, count: int) -> np.ndarray:
+        if len(allowed) >= count:
+            return allowed[:count]
+        padded = np.zeros(count, dtype=bool)
+        padded[: len(allowed)] = allowed
+        return padded
+
+    def _candidate_offsets(self, probe: np.ndarray, view: StoreView) -> Optional[np.ndarray]:
+        if self.centroids is None:
+            return None
+        nprobe = min(self.nprobe, self.nlist)
+        probed = np.argpartition(self.centroids @ probe, -nprobe)[-nprobe:]
+        # Copy the lists under the lock: ``sync`` cannot grow an array that
+        # is exporting its buffer.
+        with self._lock:
+            offsets = np.concatenate(
+                [np.frombuffer(self._lists[list_id], dtype=np.int64) for list_id in probed]
+            )
+        # Records folded in after the view was taken are not part of it;
+        # superseded and deleted ones stay in the lists until the next rebuild.
+        offsets = offsets[offsets < view.count]
+        return offsets[view.live[offsets]]
+
+    def search(self, embedding, k: int = 1, allowed=None) -> list[FaceMatch]:
+        """Return the ``k`` best matches, optionally only among ``allowed``."""
+        probe = normalize(embedding)
+        if probe is None:
+            return []
+
+        self.sync()
+        view = self.store.view()
+        offsets = self._candidate_offsets(probe, view)
+        if offsets is None and allowed is None:
+            offsets = np.flatnonzero(view.live)
+            scores = quantized_scores(view.templates, view.scales, probe)[offsets]
+        else:
+            if offsets is None:
+                offsets = np.flatnonzero(view.live & self._allowed(allowed, view.count))
+            elif allowed is not None:
+                offsets = offsets[self._allowed(allowed, view.count)[offsets]]
+            scores = quantized_scores(view.templates[offsets], view.scales[offsets], probe)
+        if not len(offsets):
+            return []
+
+        shortlist = offsets[top_k(scores, max(k, self.rerank))]
+        exact = view.embeddings[shortlist] @ probe
+        return [
+            FaceMatch(int(view.pks[shortlist[i]]), float(exact[i])) for i in top_k(exact, k)
+        ]
+
+    def identify(self, embedding, allowed=None) -> Optional[FaceMatch]:
+        matches = self.search(embedding, k=1, allowed=allowed)
+        if matches and matches[0].score >= self.threshold:
+            return matches[0]
+        return None
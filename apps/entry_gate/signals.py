@@ -0,0 +1,17 @@
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.dispatch import Signal, receiver
+
+from apps.students.models import Student
+
+from .services import remove_student_face
+
+# Sent once a batch of taps has committed, with ``events``: bulk inserts send
+# no ``post_save`` for the individual gate events.
+gate_events_recorded = Signal()
+
+
+@receiver(post_delete, sender=Student)
+def forget_deleted_student_face(sender, instance, **kwargs):
+    student_pk = instance.pk
+    transaction.on_commit(lambda: remove_student_face(student_pk))
@@ -0,0 +1,326 @@
+"""Append-only, memory-mapped store for face templates.
+
+All enrollments live in a single binary file instead of one JSON file per
+student. The file starts with a fixed header followed by fixed-width records::
+
+    header  magic | format | dim | record count | generation
+    record  student pk (int64) | version (int32) | flags (uint32)
+            | scale (float32) | template (int8[dim])
+
+Templates are stored int8-quantised with a per-vector scale, a quarter of the
+size of float32, so the matrix scanned on every probe stays small enough to
+remain cache and page-cache friendly. The float32 originals are kept in a
+sidecar file (``<name>.f32``, one row per record) that is only touched to
+re-rank the few best candidates.
+
+Re-enrolling a student appends a new record with a higher version; removing
+one appends a tombstone. Readers map the files with ``mmap`` so every worker
+shares the same page-cache pages, and only the pk column is scanned to build
+the pk -> record index when the store is opened. Each append bumps the header
+generation, which lets other processes notice new records with one ``pread``.
+
+A record only becomes visible once the header count is bumped, so a crash in
+the middle of an append leaves the previous state intact.
+"""
+
+from contextlib import contextmanager
+from pathlib import Path
+import mmap
+import os
+import struct
+import threading
+from typing import Iterator, NamedTuple, Optional
+
+import numpy as np
+
+from .face import quantize
+
+try:  # pragma: no cover - platform dependent
+    import fcntl
+except ImportError:  # pragma: no cover - Windows development machines
+    fcntl = None
+
+MAGIC = b"SEASFACE"
+FORMAT_VERSION = 2
+HEADER = struct.Struct("<8sIIQQ")
+HEADER_SIZE = 64
+
+FLAG_DELETED = 1
+
+
+def record_dtype(dim: int) -> np.dtype:
+    return np.dtype(
+        [
+            ("pk", "<i8"),
+            ("version", "<i4"),
+            ("flags", "<u4"),
+            ("scale", "<f4"),
+            ("template", "i1", (dim,)),
+        ]
+    )
+
+
+class StoreView(NamedTuple):
+    """The first ``count`` records as one consistent set of arrays.
+
+    ``live`` is a copy; the other arrays are views of the mappings, which
+    never change for records already written.
+    """
+
+    count: int
+    live: np.ndarray
+    pks: np.ndarray
+    templates: np.ndarray
+    scales: np.ndarray
+    embeddings: np.ndarray
+
+
+class EmbeddingStore:
+    def __init__(self, path, dim: int):
+        self.path = Path(path)
+        self.full_path = self.path.with_suffix(".f32")
+        self.dim = dim
+        self.dtype = record_dtype(dim)
+        self.row_size = dim * 4
+        self._lock = threading.RLock()
+        self._mmap = None
+        self._full_mmap = None
+        self._records = np.zeros(0, dtype=self.dtype)
+        self._full = np.zeros((0, dim), dtype=np.float32)
+        self._index: dict[int, int] = {}
+        self._live = np.zeros(0, dtype=bool)
+        self._count = 0
+        self.generation = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        self._full_fd = os.open(self.full_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            with self._file_lock():
+                if os.fstat(self._fd).st_size < HEADER_SIZE:
+                    self._write_header(0, 0)
+            self.refresh()
+        except Exception:
+            os.close(self._fd)
+            os.close(self._full_fd)
+            raise
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, student_pk: int) -> bool:
+        return student_pk in self._index
+
+    @property
+    def count(self) -> int:
+        """Number of records, including superseded ones and tombstones."""
+        return self._count
+
+    @property
+    def templates(self) -> np.ndarray:
+        """``(count, dim)`` int8 view of every quantised template."""
+        return self._records["template"]
+
+    @property
+    def scales(self) -> np.ndarray:
+        return self._records["scale"]
+
+    @property
+    def embeddings(self) -> np.ndarray:
+        """``(count, dim)`` full-precision view, backed by the sidecar mmap."""
+        return self._full
+
+    @property
+    def live(self) -> np.ndarray:
+        """Boolean mask of records that hold a student's current template."""
+        return self._live[: self._count]
+
+    def view(self) -> StoreView:
+        """Snapshot every array at one record count.
+
+        A concurrent :meth:`refresh` grows the arrays one property at a time;
+        a search that reads them separately can see mismatched lengths.
+        """
+        with self._lock:
+            count = self._count
+            records = self._records[:count]
+            return StoreView(
+                count,
+                self._live[:count].copy(),
+                records["pk"],
+                records["template"],
+                records["scale"],
+                self._full[:count],
+            )
+
+    def offsets(self, student_pks) -> np.ndarray:
+        """Record offsets of the current templates of ``student_pks``."""
+        index = self._index
+        return np.fromiter(
+            (index[pk] for pk in student_pks if pk in index), dtype=np.int64
+        )
+
+    def pk_at(self, offset: int) -> int:
+        return int(self._records["pk"][offset])
+
+    @contextmanager
+    def _file_lock(self):
+        with self._lock:
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _read_header(self) -> tuple[int, int]:
+        raw = os.pread(self._fd, HEADER.size, 0)
+        magic, fmt, dim, count, generation = HEADER.unpack(raw)
+        if magic != MAGIC:
+            raise ValueError(f"{self.path} is not a face embedding store.")
+        if fmt != FORMAT_VERSION:
+            raise ValueError(
+                f"{self.path} uses store format {fmt}, expected {FORMAT_VERSION}; "
+                "re-enroll faces into a new store."
+            )
+        if dim != self.dim:
+            raise ValueError(
+                f"{self.path} holds {dim}-d embeddings, expected {self.dim}-d."
+            )
+        return count, generation
+
+    def _write_header(self, count: int, generation: int) -> None:
+        header = HEADER.pack(MAGIC, FORMAT_VERSION, self.dim, count, generation)
+        os.pwrite(self._fd, header.ljust(HEADER_SIZE, b"\0"), 0)
+
+    def refresh(self) -> bool:
+        """Pick up records appended since the last refresh.
+
+        Returns ``True`` if anything changed.
+        """
+        with self._lock:
+            count, generation = self._read_header()
+            if count == self._count and generation == self.generation:
+                return False
+
+            # Old mappings are released once no array views reference them.
+            required = HEADER_SIZE + count * self.dtype.itemsize
+            if self._mmap is None or len(self._mmap) < required:
+                self._mmap = mmap.mmap(self._fd, required, access=mmap.ACCESS_READ)
+            full_required = count * self.row_size
+            if full_required and (
+                self._full_mmap is None or len(self._full_mmap) < full_required
+            ):
+                self._full_mmap = mmap.mmap(
+                    self._full_fd, full_required, access=mmap.ACCESS_READ
+                )
+
+            self._records = np.frombuffer(
+                self._mmap, dtype=self.dtype, count=count, offset=HEADER_SIZE
+            )
+            if count:
+                self._full = np.frombuffer(
+                    self._full_mmap, dtype=np.float32, count=count * self.dim
+                ).reshape(count, self.dim)
+            if count > len(self._live):
+                live = np.zeros(max(count, 2 * len(self._live)), dtype=bool)
+                live[: self._count] = self._live[: self._count]
+                self._live = live
+
+            new_records = self._records[self._count :]
+            for offset, (pk, flags) in enumerate(
+                zip(new_records["pk"].tolist(), new_records["flags"].tolist()),
+                start=self._count,
+            ):
+                previous = self._index.pop(pk, None)
+                if previous is not None:
+                    self._live[previous] = False
+                if not flags & FLAG_DELETED:
+                    self._index[pk] = offset
+                    self._live[offset] = True
+
+            self._count = count
+            self.generation = generation
+            return True
+
+    def _append(self, student_pk: int, embedding, flags: int) -> int:
+        record = np.zeros(1, dtype=self.dtype)
+        record["pk"] = student_pk
+        record["flags"] = flags
+        full = np.zeros(self.dim, dtype=np.float32)
+        if embedding is not None:
+            full[:] = embedding
+            record["template"], record["scale"] = quantize(full)
+
+        with self._file_lock():
+            self.refresh()
+            previous = self._latest_version(student_pk)
+            record["version"] = previous + 1
+
+            count, generation = self._read_header()
+            # The sidecar row lands first so a visible record always has one.
+            os.pwrite(self._full_fd, full.tobytes(), count * self.row_size)
+            os.fsync(self._full_fd)
+            os.pwrite(
+                self._fd,
+                record.tobytes(),
+                HEADER_SIZE + count * self.dtype.itemsize,
+            )
+            os.fsync(self._fd)
+            self._write_header(count + 1, generation + 1)
+            os.fsync(self._fd)
+            self.refresh()
+
+        return int(record["version"][0])
+
+    def _latest_version(self, student_pk: int) -> int:
+        matches = np.flatnonzero(self._records["pk"] == student_pk)
+        if not len(matches):
+            return 0
+        return int(self._records["version"][matches[-1]])
+
+    def append(self, student_pk: int, embedding) -> int:
+        """Store a new template for ``student_pk`` and return its version.
+
+        Matchers treat the dot product as cosine similarity, so callers append
+        unit-length embeddings.
+        """
+        embedding = np.asarray(embedding, dtype=np.float32)
+        if embedding.shape != (self.dim,):
+            raise ValueError(f"Expected a {self.dim}-d embedding.")
+        return self._append(student_pk, embedding, 0)
+
+    def delete(self, student_pk: int) -> bool:
+        if student_pk not in self._index:
+            return False
+        self._append(student_pk, None, FLAG_DELETED)
+        return True
+
+    def get(self, student_pk: int) -> Optional[np.ndarray]:
+        offset = self._index.get(student_pk)
+        if offset is None:
+            return None
+        return self._full[offset]
+
+    def items(self) -> Iterator[tuple[int, np.ndarray]]:
+        """Yield ``(student_pk, embedding)`` for every live enrollment."""
+        embeddings = self.embeddings
+        for student_pk, offset in list(self._index.items()):
+            yield student_pk, embeddings[offset]
+
+    def close(self) -> None:
+        with self._lock:
+            self._records = np.zeros(0, dtype=self.dtype)
+            self._full = np.zeros((0, self.dim), dtype=np.float32)
+            for mapping in (self._mmap, self._full_mmap):
+                if mapping is None:
+                    continue
+                try:
+                    mapping.close()
+                except BufferError:
+                    # Callers still hold embedding views; let GC unmap it.
+                    pass
+            self._mmap = self._full_mmap = None
+            os.close(self._fd)
+            os.close(self._full_fd)
@@ -0,0 +1,60 @@
+import tempfile
+from pathlib import Path
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from apps.entry_gate.ann import load_centroids, recall_at_1, save_centroids, train_centroids
+from apps.entry_gate.face import EMBEDDING_DIM, FaceRecognition
+from apps.entry_gate.shared_index import SharedFaceIndex
+from apps.entry_gate.store import EmbeddingStore
+
+
+def clustered_embeddings(count, clusters=20, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, EMBEDDING_DIM))
+    labels = rng.integers(0, clusters, count)
+    embeddings = centers[labels] + 0.5 * rng.standard_normal((count, EMBEDDING_DIM))
+    # Enrollment stores unit templates.
+    return (embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)).astype(np.float32)
+
+
+class IVFCentroidTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.tmpdir = tempfile.TemporaryDirectory()
+        cls.embeddings = clustered_embeddings(2000)
+        cls.store = EmbeddingStore(Path(cls.tmpdir.name) / "embeddings.bin", EMBEDDING_DIM)
+        cls.exact = FaceRecognition()
+        for pk, embedding in enumerate(cls.embeddings, start=1):
+            cls.store.append(pk, embedding)
+            cls.exact.enroll(pk, embedding)
+        cls.centroids = train_centroids(cls.embeddings, nlist=20)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.store.close()
+        cls.tmpdir.cleanup()
+        super().tearDownClass()
+
+    def test_recall_matches_exact_search(self):
+        index = SharedFaceIndex(self.store, self.centroids, nprobe=4)
+
+        self.assertGreaterEqual(recall_at_1(index, self.exact, self.embeddings[:200]), 0.95)
+        self.assertEqual(index.identify(self.embeddings[41]).student_pk, 42)
+
+    def test_full_probe_is_exact(self):
+        index = SharedFaceIndex(self.store, self.centroids, nprobe=len(self.centroids))
+        probe = clustered_embeddings(1, seed=5)[0]
+
+        expected = [m.student_pk for m in self.exact.search(probe, k=5)]
+        found = [m.student_pk for m in index.search(probe, k=5)]
+        self.assertEqual(found, expected)
+
+    def test_centroids_round_trip(self):
+        path = Path(self.tmpdir.name) / "ivf.npz"
+        save_centroids(path, self.centroids)
+
+        np.testing.assert_array_equal(load_centroids(path), self.centroids)
+        self.assertEqual(list(path.parent.glob("*.tmp")), [])
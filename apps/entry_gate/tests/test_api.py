@@ -6,6 +6,8 @@ from django.urls import reverse
 from PIL import Image
 from rest_framework.test import APITestCase
 
+from apps.entry_gate.dedupe import get_recent_passes
+from apps.entry_gate.embedding_pool import EmbeddingBusy
 from apps.entry_gate.models import GateEvent
 from apps.students.models import Student
 from apps.users.models import User
@@ -21,6 +23,7 @@ def build_image(name="face.jpg"):
 
 class EntryGateApiTests(APITestCase):
     def setUp(self):
+        get_recent_passes().clear()
         user = User.objects.create(
             username="gate-user",
             first_name="Gate",
@@ -85,3 +88,114 @@ class EntryGateApiTests(APITestCase):
             response.json()["detail"], "No matching student found."
         )
         self.assertEqual(GateEvent.objects.count(), 0)
+
+    @patch("apps.entry_gate.views.recognize_student_from_image")
+    def test_busy_face_service_falls_back_to_rfid(self, mock_recognize):
+        mock_recognize.side_effect = EmbeddingBusy()
+
+        response = self.client.post(
+            reverse("scan"),
+            {"image": build_image("busy.jpg"), "rfid_tag": self.student.rfid_tag},
+            format="multipart",
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["verification_method"], "rfid")
+
+        response = self.client.post(
+            reverse("scan"), {"image": build_image("busy.jpg")}, format="multipart"
+        )
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()["action_required"], "rfid")
+        self.assertEqual(GateEvent.objects.count(), 1)
+
+    def test_scan_reports_rejected_frame(self):
+        response = self.client.post(
+            reverse("scan"), {"image": build_image("tiny.jpg")}, format="multipart"
+        )
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()["frame_quality"], "frame too small")
+        self.assertEqual(response.json()["action_required"], "retry_scan")
+
+    def test_metrics_report_embedding_cache_counters(self):
+        response = self.client.get(reverse("gate-metrics"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("hits", response.json()["embedding_cache"])
+        self.assertIn("rejected", response.json()["embedding_pool"])
+
+    @patch("apps.entry_gate.views.recognize_student_from_frames")
+    def test_scan_accepts_a_burst_of_frames(self, mock_burst):
+        mock_burst.return_value = self.student
+
+        response = self.client.post(
+            reverse("scan"),
+            {"image": [build_image("a.jpg"), build_image("b.jpg")], "action": GateEvent.ENTRY},
+            format="multipart",
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["verification_method"], "face_scan")
+        self.assertEqual(len(mock_burst.call_args.args[0]), 2)
+
+    def test_gate_devices_can_ask_for_the_compact_response(self):
+        expected_keys = {
+            "id", "success", "action", "timestamp", "student_id", "name", "verification_method",
+        }
+
+        by_header = self.client.post(
+            reverse("rfid-scan"),
+            {"rfid_tag": self.student.rfid_tag},
+            HTTP_ACCEPT="application/vnd.seas.gate+json",
+        )
+        by_query = self.client.post(
+            reverse("rfid-scan") + "?compact=1", {"rfid_tag": self.student.rfid_tag}
+        )
+        full = self.client.post(reverse("rfid-scan"), {"rfid_tag": self.student.rfid_tag})
+
+        self.assertEqual(by_header["Content-Type"], "application/vnd.seas.gate+json")
+        self.assertEqual(set(by_header.json()), expected_keys)
+        self.assertEqual(by_header.json()["name"], "Gate User")
+        self.assertEqual(set(by_query.json()), expected_keys)
+        self.assertEqual(full.json()["student"]["student_id"], "S500")
+
+    def test_repeated_taps_and_retries_return_the_original_pass(self):
+        first = self.client.post(reverse("rfid-scan"), {"rfid_tag": self.student.rfid_tag})
+
+        with self.assertNumQueries(0):
+            bounced = self.client.post(reverse("rfid-scan"), {"rfid_tag": self.student.rfid_tag})
+        other_gate = self.client.post(
+            reverse("rfid-scan"), {"rfid_tag": self.student.rfid_tag, "gate": "north"}
+        )
+
+        self.assertEqual(bounced.json()["id"], first.json()["id"])
+        self.assertEqual(bounced["Idempotent-Replayed"], "true")
+        self.assertNotEqual(other_gate.json()["id"], first.json()["id"])
+        self.assertEqual(GateEvent.objects.count(), 2)
+
+    def test_idempotency_key_survives_a_cold_worker(self):
+        retry = {"rfid_tag": self.student.rfid_tag, "action": GateEvent.EXIT}
+        first = self.client.post(reverse("rfid-scan"), retry, HTTP_IDEMPOTENCY_KEY="tap-1")
+        get_recent_passes().clear()
+
+        again = self.client.post(reverse("rfid-scan"), retry, HTTP_IDEMPOTENCY_KEY="tap-1")
+
+        self.assertEqual(again.status_code, 200)
+        self.assertEqual(again.json()["id"], first.json()["id"])
+        self.assertEqual(again["Idempotent-Replayed"], "true")
+        self.assertEqual(GateEvent.objects.count(), 1)
+
+    def test_overlong_idempotency_keys_are_rejected(self):
+        tap = {"rfid_tag": self.student.rfid_tag}
+        key = "k" * 64
+
+        response = self.client.post(reverse("rfid-scan"), tap, HTTP_IDEMPOTENCY_KEY=key + "1")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("at most 64", response.json()["detail"])
+        self.assertFalse(GateEvent.objects.exists())
+        self.assertEqual(
+            self.client.post(reverse("rfid-scan"), tap, HTTP_IDEMPOTENCY_KEY=key).status_code, 200
+        )
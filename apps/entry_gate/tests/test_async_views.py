@@ -0,0 +1,145 @@
+import asyncio
+import time
+from unittest.mock import patch
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from apps.admin_panel.stats import LOCK_KEY
+from apps.entry_gate.async_views import student_for_rfid
+from apps.entry_gate.dedupe import get_recent_passes
+from apps.entry_gate.embedding_pool import EmbeddingBusy
+from apps.entry_gate.models import GateEvent
+from apps.entry_gate.responses import COMPACT_MEDIA_TYPE
+from apps.entry_gate.tests.test_api import build_image
+from apps.students.identity import GENERATION_KEY, get_identity_map, reset_identity_map
+from apps.students.models import Student
+from apps.users.models import User
+
+
+class AsyncGateViewTests(TestCase):
+    def setUp(self):
+        get_recent_passes().clear()
+        reset_identity_map()
+        self.client = AsyncClient()
+        user = User.objects.create(username="async-gate", first_name="As", last_name="Ync")
+        self.student = Student.objects.create(
+            user=user,
+            student_id="S900",
+            rfid_tag="RFID-S900",
+            parent_email="parent@example.com",
+        )
+
+    def tearDown(self):
+        reset_identity_map()
+
+    async def test_rfid_scan_records_the_pass(self):
+        response = await self.client.post(
+            reverse("async-rfid-scan"),
+            {"rfid_tag": "RFID-S900", "action": GateEvent.ENTRY},
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["student"]["student_id"], "S900")
+        self.assertEqual(response.json()["verification_method"], "rfid")
+        self.assertEqual(await GateEvent.objects.filter(student=self.student).acount(), 1)
+
+    async def test_rfid_scan_matches_the_sync_shape_and_idempotency(self):
+        headers = {"Idempotency-Key": "async-1", "Accept": COMPACT_MEDIA_TYPE}
+        first = await self.client.post(
+            reverse("async-rfid-scan"), {"rfid_tag": "RFID-S900"}, headers=headers
+        )
+        again = await self.client.post(
+            reverse("rfid-scan"), {"rfid_tag": "RFID-S900"}, headers=headers
+        )
+
+        self.assertEqual(first["Content-Type"], COMPACT_MEDIA_TYPE)
+        self.assertEqual(first.json()["student_id"], "S900")
+        self.assertEqual(again["Idempotent-Replayed"], "true")
+        self.assertEqual(again.json()["id"], first.json()["id"])
+        self.assertEqual(await GateEvent.objects.acount(), 1)
+
+    async def test_lookups_reload_a_changed_map_off_the_event_loop(self):
+        identity = get_identity_map()
+        await sync_to_async(identity.load)()
+        # Another worker edits a student: the map must reload before answering.
+        await Student.objects.filter(pk=self.student.pk).aupdate(rfid_tag="RFID-S900-NEW")
+        await cache.aset(GENERATION_KEY, identity._generation + 1)
+
+        self.assertIsNone(await student_for_rfid("RFID-S900"))
+        self.assertEqual((await student_for_rfid("RFID-S900-NEW")).pk, self.student.pk)
+        self.assertEqual((await student_for_rfid("RFID-S900-NEW")).user.first_name, "As")
+
+    async def test_unknown_card_is_not_found(self):
+        response = await self.client.post(reverse("async-rfid-scan"), {"rfid_tag": "NOPE"})
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()["action_required"], "manual_check_in")
+
+    async def test_overlong_idempotency_keys_are_rejected(self):
+        response = await self.client.post(
+            reverse("async-rfid-scan"),
+            {"rfid_tag": "RFID-S900"},
+            headers={"Idempotency-Key": "k" * 65},
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("at most 64", response.json()["detail"])
+        self.assertEqual(await GateEvent.objects.acount(), 0)
+
+    @patch("apps.entry_gate.async_views.recognize_student_from_image")
+    async def test_face_scan_runs_recognition_off_the_event_loop(self, mock_recognize):
+        mock_recognize.return_value = self.student
+
+        response = await self.client.post(
+            reverse("async-scan"), {"image": build_image(), "action": GateEvent.ENTRY}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["verification_method"], "face_scan")
+        self.assertTrue(mock_recognize.called)
+
+    @patch("apps.entry_gate.async_views.recognize_student_from_image")
+    async def test_busy_face_service_falls_back_to_rfid(self, mock_recognize):
+        mock_recognize.side_effect = EmbeddingBusy()
+
+        response = await self.client.post(
+            reverse("async-scan"), {"image": build_image(), "rfid_tag": "RFID-S900"}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["verification_method"], "rfid")
+
+
+class AsyncLiveStatsTests(TransactionTestCase):
+    """The stats run in a pooled thread, which only sees committed rows."""
+
+    def setUp(self):
+        cache.clear()
+        Student.objects.create(
+            user=User.objects.create(username="async-stats"),
+            student_id="S901",
+            parent_email="parent@example.com",
+        )
+
+    async def test_live_stats(self):
+        response = await AsyncClient().get(reverse("live-stats-async"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["students"], 1)
+
+    @override_settings(LIVE_STATS_LOCK_SECONDS=1)
+    async def test_waiting_for_stats_does_not_hold_the_sync_thread(self):
+        # Another worker holds the recompute lock and there is no snapshot yet.
+        await cache.aadd(LOCK_KEY, True)
+        stats = asyncio.ensure_future(AsyncClient().get(reverse("live-stats-async")))
+        await asyncio.sleep(0.1)
+
+        started = time.monotonic()
+        await sync_to_async(lambda: None)()
+
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertEqual((await stats).status_code, 200)
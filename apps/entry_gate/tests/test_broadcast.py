@@ -0,0 +1,47 @@
+import threading
+import time
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from apps.entry_gate.broadcast import RedisBroker
+
+
+class RedisBrokerTests(SimpleTestCase):
+    def test_publish_does_not_wait_for_redis(self):
+        broker = RedisBroker(url="redis://unused")
+        stalled = threading.Event()
+        sent = []
+
+        def send(message):
+            stalled.wait(5)
+            if message["data"] == 1:
+                raise ConnectionError("redis down")
+            sent.append(message)
+
+        with patch.object(broker, "_send", side_effect=send):
+            started = time.perf_counter()
+            for n in range(3):
+                broker.publish({"type": "gate", "data": n})
+            self.assertLess(time.perf_counter() - started, 0.5)
+
+            with self.assertLogs("apps.entry_gate.broadcast", "WARNING"):
+                stalled.set()
+                deadline = time.monotonic() + 5
+                while len(sent) < 2 and time.monotonic() < deadline:
+                    time.sleep(0.01)
+
+        # A failed publish is logged and the sender carries on.
+        self.assertEqual([message["data"] for message in sent], [0, 2])
+
+    def test_full_queue_drops_messages(self):
+        broker = RedisBroker(url="redis://unused", queue_size=1)
+        release = threading.Event()
+
+        with patch.object(broker, "_send", side_effect=lambda message: release.wait(5)):
+            with self.assertLogs("apps.entry_gate.broadcast", "WARNING") as logs:
+                for n in range(5):
+                    broker.publish({"type": "gate", "data": n})
+            release.set()
+
+        self.assertIn("dropping", logs.output[0])
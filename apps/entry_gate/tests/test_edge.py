@@ -0,0 +1,115 @@
+import asyncio
+
+from rest_framework.test import APIClient, APITestCase
+
+from apps.entry_gate.edge import BATCH_PATH, EdgeListener, EdgeOffline, EdgeStore, EdgeSync
+from apps.entry_gate.models import GateEvent
+from apps.entry_gate.rfid_listener import DENY, GRANT
+from apps.students.tests.factories import create_student
+
+
+class ClientTransport:
+    """Sends edge requests through the test client; can simulate an outage."""
+
+    def __init__(self):
+        self.client = APIClient()
+        self.online = True
+        self.calls = []
+
+    def __call__(self, method, path, params=None, payload=None):
+        if not self.online:
+            raise EdgeOffline("link down")
+        self.calls.append((method, path))
+        if method == "GET":
+            response = self.client.get(path, params)
+        else:
+            response = self.client.post(path, payload, format="json")
+        return response.status_code, response.json()
+
+
+class EdgeSyncTests(APITestCase):
+    def setUp(self):
+        self.student = create_student("E1", "Ed", "1")
+        self.store = EdgeStore(":memory:")
+        self.transport = ClientTransport()
+        self.edge = EdgeSync(self.store, self.transport, batch_size=2)
+
+    def tearDown(self):
+        self.store.close()
+
+    def test_offline_taps_are_pushed_once(self):
+        self.edge.sync()
+        self.transport.online = False
+
+        self.assertEqual(self.store.record_tap("RFID-E1")["name"], "Ed 1")
+        self.assertIsNotNone(self.store.record_tap("RFID-E1", GateEvent.EXIT))
+        self.assertIsNone(self.store.record_tap("RFID-UNKNOWN"))
+        with self.assertRaises(EdgeOffline):
+            self.edge.sync()
+        self.assertEqual(self.store.stats()["pending"], 2)
+
+        self.transport.online = True
+        result = self.edge.sync()
+
+        self.assertEqual(result["recorded"], 2)
+        self.assertEqual(
+            list(GateEvent.objects.values_list("action", flat=True).order_by("timestamp")),
+            [GateEvent.ENTRY, GateEvent.EXIT],
+        )
+        self.assertEqual(self.store.stats()["pending"], 0)
+        self.assertEqual(self.edge.sync()["recorded"], 0)
+
+    def test_resending_a_lost_batch_records_nothing_twice(self):
+        self.edge.pull()
+        self.store.record_tap("RFID-E1")
+        items = self.store.pending(10)
+        # The server took the batch but the acknowledgement never arrived.
+        self.transport(
+            "POST",
+            BATCH_PATH,
+            payload={"items": [{k: v for k, v in item.items() if k != "seq"} for item in items]},
+        )
+
+        result = self.edge.push()
+
+        self.assertEqual((result["recorded"], result["duplicates"]), (0, 1))
+        self.assertEqual(GateEvent.objects.count(), 1)
+
+    def test_pull_applies_only_roster_deltas(self):
+        self.assertEqual(self.edge.pull(), 1)
+        version = self.store.roster_version
+
+        self.student.rfid_tag = "RFID-E1-NEW"
+        self.student.save()
+        newcomer = create_student("E2", "Ed", "2")
+        self.assertEqual(self.edge.pull(), 2)
+
+        self.assertGreater(self.store.roster_version, version)
+        self.assertIsNone(self.store.student_for_rfid("RFID-E1"))
+        self.assertEqual(self.store.student_for_rfid("RFID-E1-NEW")["pk"], self.student.pk)
+        self.assertEqual(self.store.student_for_rfid("RFID-E2")["pk"], newcomer.pk)
+
+        newcomer.delete()
+        self.edge.pull()
+        self.assertIsNone(self.store.student_for_rfid("RFID-E2"))
+        self.assertEqual(len(self.store), 1)
+
+    def test_listener_answers_from_the_local_roster_and_queues_taps(self):
+        self.edge.pull()
+        self.transport.online = False
+        listener = EdgeListener(self.edge, interval=30, debounce=60)
+
+        async def tap(*lines):
+            return [await listener.decide(line, "gate-1") for line in lines]
+
+        replies = asyncio.run(
+            tap(b"RFID-E1 entry k1", b"RFID-E1 entry k2", b"RFID-E1 exit k1", b"RFID-X9", b"")
+        )
+
+        self.assertEqual(replies, [GRANT, GRANT, GRANT, DENY, None])
+        # The bounced read is not queued; the repeated key is queued once.
+        self.assertEqual(self.store.stats()["pending"], 1)
+
+        self.transport.online = True
+        self.assertEqual(self.edge.sync()["recorded"], 1)
+        self.assertEqual(GateEvent.objects.get().idempotency_key, "k1")
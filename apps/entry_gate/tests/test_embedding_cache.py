@@ -0,0 +1,52 @@
+from io import BytesIO
+from unittest.mock import patch
+
+import numpy as np
+from django.test import SimpleTestCase
+from PIL import Image
+
+from apps.entry_gate.embedding_cache import EmbeddingCache, content_key
+from apps.entry_gate.quality import assess_frame
+
+
+class EmbeddingCacheTests(SimpleTestCase):
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = EmbeddingCache(max_entries=2, ttl=60)
+        cache.set("a", np.ones(4))
+        cache.set("b", np.ones(4))
+        cache.get("a")
+        cache.set("c", np.ones(4))
+
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_entries_expire_after_ttl(self):
+        cache = EmbeddingCache(max_entries=4, ttl=30)
+        with patch("apps.entry_gate.embedding_cache.time.monotonic", return_value=100.0):
+            cache.set("a", np.ones(4))
+        with patch("apps.entry_gate.embedding_cache.time.monotonic", return_value=129.0):
+            self.assertIsNotNone(cache.get("a"))
+        with patch("apps.entry_gate.embedding_cache.time.monotonic", return_value=131.0):
+            self.assertIsNone(cache.get("a"))
+
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["entries"]), (1, 1, 0))
+
+    def test_content_key_depends_only_on_bytes(self):
+        self.assertEqual(content_key(b"frame"), content_key(b"frame"))
+        self.assertNotEqual(content_key(b"frame"), content_key(b"frame2"))
+
+    def test_reencoded_frame_keeps_its_fingerprint(self):
+        rng = np.random.default_rng(0)
+        blocks = rng.integers(40, 220, (21, 28))
+        image = Image.fromarray(np.kron(blocks, np.ones((12, 12))).astype(np.uint8))
+        png, jpeg = BytesIO(), BytesIO()
+        image.save(png, "PNG")
+        image.save(jpeg, "JPEG", quality=80)
+
+        first = assess_frame(png.getvalue())
+        second = assess_frame(jpeg.getvalue())
+
+        self.assertTrue(first.ok)
+        self.assertEqual(first.fingerprint, second.fingerprint)
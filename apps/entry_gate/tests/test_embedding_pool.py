@@ -0,0 +1,64 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from unittest.mock import patch
+
+import numpy as np
+from django.test import SimpleTestCase
+from PIL import Image
+
+from apps.entry_gate.embedding_pool import (
+    EmbeddingBusy,
+    EmbeddingService,
+    EmbeddingTimeout,
+    embed_image_bytes,
+)
+
+
+def image_bytes(seed=0):
+    rng = np.random.default_rng(seed)
+    buffer = BytesIO()
+    Image.fromarray(rng.integers(0, 255, (48, 48), dtype=np.uint8)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+class EmbeddingServiceTests(SimpleTestCase):
+    def test_inline_service_embeds_in_process(self):
+        service = EmbeddingService(max_workers=0, max_pending=0, timeout=1)
+
+        embedding = service.embed(image_bytes())
+
+        self.assertTrue(service.inline)
+        np.testing.assert_allclose(embedding, embed_image_bytes(image_bytes()))
+        self.assertIsNone(service.embed(b"not an image" * 10))
+
+    def test_process_pool_matches_inline_embedding(self):
+        service = EmbeddingService(max_workers=1, max_pending=1, timeout=30)
+        try:
+            embedding = service.embed(image_bytes(3))
+        finally:
+            service.shutdown()
+
+        np.testing.assert_allclose(embedding, embed_image_bytes(image_bytes(3)))
+
+    def test_full_queue_is_rejected_without_waiting(self):
+        release = threading.Event()
+
+        def slow_embed(data):
+            release.wait(5)
+
+        executor = ThreadPoolExecutor(max_workers=1)
+        service = EmbeddingService(max_workers=1, max_pending=0, timeout=0.05, executor=executor)
+        try:
+            with patch("apps.entry_gate.embedding_pool.embed_image_bytes", slow_embed):
+                with self.assertRaises(EmbeddingTimeout):
+                    service.embed(b"frame")
+                # The abandoned job still occupies the only slot.
+                with self.assertRaises(EmbeddingBusy):
+                    service.embed(b"frame")
+        finally:
+            release.set()
+            executor.shutdown(wait=True)
+
+        self.assertEqual(service.stats()["rejected"], 1)
+        self.assertEqual(service.stats()["timed_out"], 1)
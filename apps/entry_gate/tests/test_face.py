@@ -0,0 +1,222 @@
+import tempfile
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest.mock import patch
+
+import numpy as np
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+
+from apps.entry_gate.face import EMBEDDING_DIM, FaceRecognition, compute_embedding
+from apps.entry_gate.services import (
+    _embed_upload,
+    enroll_student_face,
+    face_pipeline_stats,
+    get_embedding_service,
+    get_recognizer,
+    get_store,
+    recognize_student_from_frames,
+    recognize_student_from_image,
+    reset_face_index,
+)
+from apps.attendance.models import AttendanceRecord
+from apps.students.models import Student
+from apps.users.models import User
+
+
+def random_embeddings(count, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.standard_normal((count, EMBEDDING_DIM)).astype(np.float32)
+
+
+class FaceRecognitionTests(SimpleTestCase):
+    def setUp(self):
+        self.embeddings = random_embeddings(50)
+        self.recognizer = FaceRecognition()
+        for pk, embedding in enumerate(self.embeddings, start=1):
+            self.recognizer.enroll(pk, embedding)
+
+    def test_identify_returns_best_match_above_threshold(self):
+        probe = self.embeddings[9] + 0.05 * random_embeddings(1, seed=1)[0]
+
+        match = self.recognizer.identify(probe)
+
+        self.assertIsNotNone(match)
+        self.assertEqual(match.student_pk, 10)
+        self.assertGreaterEqual(match.score, 0.80)
+
+    def test_identify_rejects_unknown_face(self):
+        probe = random_embeddings(1, seed=99)[0]
+
+        self.assertIsNone(self.recognizer.identify(probe))
+
+    def test_search_orders_top_k_by_score(self):
+        matches = self.recognizer.search(self.embeddings[3], k=5)
+
+        self.assertEqual(len(matches), 5)
+        self.assertEqual(matches[0].student_pk, 4)
+        scores = [match.score for match in matches]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+
+    def test_reenroll_and_remove_keep_matrix_dense(self):
+        self.recognizer.enroll(1, self.embeddings[20])
+        self.assertEqual(len(self.recognizer), 50)
+
+        self.assertTrue(self.recognizer.remove(21))
+        self.assertEqual(len(self.recognizer), 49)
+        self.assertEqual(self.recognizer.identify(self.embeddings[20]).student_pk, 1)
+        self.assertEqual(self.recognizer.identify(self.embeddings[49]).student_pk, 50)
+
+    def test_blank_image_has_no_embedding(self):
+        self.assertIsNone(compute_embedding(Image.new("RGB", (32, 32), color="blue")))
+
+
+def face_upload(seed, name="face.png"):
+    rng = np.random.default_rng(seed)
+    pixels = rng.integers(0, 255, (64, 64, 3), dtype=np.uint8)
+    buffer = BytesIO()
+    Image.fromarray(pixels).save(buffer, "PNG")
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/png")
+
+
+class FaceServiceTests(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(
+            FACE_STORE_PATH=Path(self.tmpdir.name) / "embeddings.bin"
+        )
+        self.settings_override.enable()
+        reset_face_index()
+
+        user = User.objects.create(username="face-user")
+        self.student = Student.objects.create(
+            user=user, student_id="S900", rfid_tag="RFID-S900", parent_email="p@example.com"
+        )
+
+    def tearDown(self):
+        reset_face_index()
+        self.settings_override.disable()
+        self.tmpdir.cleanup()
+
+    def test_enrolled_face_is_recognized(self):
+        enroll_student_face(self.student, face_upload(1))
+
+        self.assertEqual(recognize_student_from_image(face_upload(1)), self.student)
+        self.assertIsNone(recognize_student_from_image(face_upload(2)))
+
+    def test_multiple_captures_are_averaged_skipping_blank_ones(self):
+        blank = BytesIO()
+        Image.new("RGB", (64, 64), color="blue").save(blank, "PNG")
+        blank_upload = SimpleUploadedFile("blank.png", blank.getvalue(), content_type="image/png")
+
+        enroll_student_face(self.student, face_upload(1), blank_upload, face_upload(1))
+
+        self.assertEqual(recognize_student_from_image(face_upload(1)), self.student)
+
+    def test_repeated_frame_skips_embedding(self):
+        enroll_student_face(self.student, face_upload(1))
+        service = get_embedding_service()
+
+        with patch.object(service, "embed", wraps=service.embed) as embed:
+            for _ in range(3):
+                self.assertEqual(recognize_student_from_image(face_upload(4)), None)
+                self.assertEqual(recognize_student_from_image(face_upload(1)), self.student)
+
+        self.assertEqual(embed.call_count, 1)
+        self.assertEqual(face_pipeline_stats()["embedding_cache"]["hits"], 5)
+
+    def test_burst_stops_at_first_confident_frame(self):
+        enroll_student_face(self.student, face_upload(1))
+        frames = [face_upload(4), face_upload(1), face_upload(5)]
+
+        with patch("apps.entry_gate.services._embed_upload", wraps=_embed_upload) as embed:
+            student = recognize_student_from_frames(frames)
+
+        self.assertEqual(student, self.student)
+        self.assertEqual(embed.call_count, 2)
+
+    def test_burst_combines_borderline_frames(self):
+        enroll_student_face(self.student, face_upload(1))
+        template = get_store().get(self.student.pk)
+        rng = np.random.default_rng(7)
+        frames = []
+        for _ in range(4):
+            noise = rng.standard_normal(EMBEDDING_DIM).astype(np.float32)
+            frames.append(template + 0.88 * noise / np.linalg.norm(noise))
+        recognizer = get_recognizer()
+        self.assertTrue(all(recognizer.identify(frame) is None for frame in frames))
+
+        with patch("apps.entry_gate.services._embed_upload", side_effect=frames):
+            student = recognize_student_from_frames([face_upload(i) for i in range(4)])
+
+        self.assertEqual(student, self.student)
+
+    def test_students_already_inside_are_searched_last_for_entry(self):
+        other = Student.objects.create(
+            user=User.objects.create(username="face-user-2"),
+            student_id="S901",
+            parent_email="p@example.com",
+        )
+        AttendanceRecord.objects.create(
+            student=self.student, date=timezone.localdate(), first_entry_time=timezone.now()
+        )
+        rng = np.random.default_rng(3)
+        base = rng.standard_normal(EMBEDDING_DIM).astype(np.float32)
+        inside = base + 0.3 * rng.standard_normal(EMBEDDING_DIM).astype(np.float32)
+        outside = base + 0.35 * rng.standard_normal(EMBEDDING_DIM).astype(np.float32)
+        store = get_store()
+        store.append(self.student.pk, inside / np.linalg.norm(inside))
+        store.append(other.pk, outside / np.linalg.norm(outside))
+        frame = face_upload(1)
+
+        with patch("apps.entry_gate.services._embed_upload", return_value=base):
+            self.assertEqual(recognize_student_from_image(frame), self.student)
+            self.assertEqual(recognize_student_from_image(frame, action="entry"), other)
+            self.assertEqual(recognize_student_from_image(frame, action="exit"), self.student)
+
+        # Nobody else plausible: the full roster is still searched.
+        store.delete(other.pk)
+        with patch("apps.entry_gate.services._embed_upload", return_value=base):
+            self.assertEqual(recognize_student_from_image(frame, action="entry"), self.student)
+
+    def test_enrollment_without_any_face_is_rejected(self):
+        with self.assertRaisesMessage(ValueError, "No face found in the image."):
+            enroll_student_face(self.student, SimpleUploadedFile("tiny.png", b"x" * 10))
+
+    def test_rebuilt_centroids_reach_the_running_matcher(self):
+        embeddings = random_embeddings(64, seed=5)
+        store = get_store()
+        for pk, embedding in enumerate(embeddings, start=1):
+            store.append(pk, embedding)
+        output = StringIO()
+
+        with override_settings(
+            FACE_ANN_INDEX_PATH=Path(self.tmpdir.name) / "ivf.npz",
+            FACE_ANN_MIN_ENROLLMENTS=0,
+            FACE_ANN_RELOAD_CHECK_SECONDS=0,
+        ):
+            self.assertEqual(get_recognizer().nlist, 0)
+            call_command("rebuild_face_index", nlist=4, nprobe=4, queries=20, stdout=output)
+            recognizer = get_recognizer()
+
+        self.assertIn("recall@1=1.000", output.getvalue())
+        self.assertEqual(recognizer.nlist, 4)
+        self.assertEqual(recognizer.identify(embeddings[9]).student_pk, 10)
+
+    @override_settings(FACE_ANN_RELOAD_CHECK_SECONDS=60)
+    def test_centroid_file_is_checked_at_most_once_per_interval(self):
+        with patch("apps.entry_gate.services._index_mtime", return_value=None) as index_mtime:
+            recognizer = get_recognizer()
+            for _ in range(5):
+                self.assertIs(get_recognizer(), recognizer)
+
+        self.assertEqual(index_mtime.call_count, 1)
+
+    def test_enrollment_persists_in_store(self):
+        enroll_student_face(self.student, face_upload(1))
+        reset_face_index()
+
+        self.assertIn(self.student.pk, get_recognizer())
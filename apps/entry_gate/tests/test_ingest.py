@@ -0,0 +1,67 @@
+from io import BytesIO
+from unittest.mock import patch
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework.test import APITestCase
+
+from apps.entry_gate.imaging import ImageTooLarge, decode_image
+from apps.students.models import Student
+from apps.users.models import User
+
+
+def jpeg_bytes(size=(64, 64)):
+    buffer = BytesIO()
+    Image.new("RGB", size, color="green").save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+class DecodeImageTests(SimpleTestCase):
+    def test_large_jpeg_is_decoded_downscaled(self):
+        image = decode_image(jpeg_bytes((4000, 3000)), max_side=640)
+
+        self.assertLessEqual(max(image.size), 640)
+        self.assertEqual(image.mode, "RGB")
+
+    @patch("apps.entry_gate.imaging.MAX_PIXELS", 100)
+    def test_pixel_cap_is_checked_before_decoding(self):
+        with self.assertRaises(ImageTooLarge):
+            decode_image(jpeg_bytes((20, 20)))
+
+
+class ImageIngestionApiTests(APITestCase):
+    def setUp(self):
+        user = User.objects.create(username="ingest-user")
+        self.student = Student.objects.create(
+            user=user, student_id="S700", rfid_tag="RFID-S700", parent_email="p@example.com"
+        )
+
+    @patch("apps.entry_gate.views.recognize_student_from_image")
+    def test_raw_jpeg_body_is_accepted(self, mock_recognize):
+        mock_recognize.return_value = self.student
+        body = jpeg_bytes()
+
+        response = self.client.generic(
+            "POST", f"{reverse('scan')}?action=exit", body, content_type="image/jpeg"
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["action"], "exit")
+        uploaded = mock_recognize.call_args[0][0]
+        self.assertEqual(uploaded.read(), body)
+
+    @override_settings(IMAGE_UPLOAD_MAX_BYTES=100)
+    def test_oversized_uploads_are_refused(self):
+        response = self.client.post(
+            reverse("scan"),
+            {"image": SimpleUploadedFile("big.jpg", jpeg_bytes(), content_type="image/jpeg")},
+            format="multipart",
+        )
+        self.assertEqual(response.status_code, 413)
+
+        response = self.client.generic(
+            "POST", reverse("scan"), jpeg_bytes(), content_type="image/jpeg"
+        )
+        self.assertEqual(response.status_code, 413)
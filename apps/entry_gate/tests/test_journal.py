@@ -0,0 +1,128 @@
+import tempfile
+from pathlib import Path
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from apps.attendance.models import AttendanceRecord
+from apps.entry_gate.dedupe import get_recent_passes
+from apps.entry_gate.journal import (
+    GateJournal,
+    get_gate_journal,
+    reset_gate_journal,
+    start_gate_journal,
+)
+from apps.entry_gate.models import GateEvent
+from apps.students.tests.factories import create_student
+
+
+class GateJournalTests(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmpdir.name) / "journal.log"
+        self.journal = GateJournal(self.path, batch_size=2, interval=0)
+        self.student = create_student("J1")
+
+    def tearDown(self):
+        self.journal.close()
+        self.tmpdir.cleanup()
+
+    def test_flush_writes_events_in_batches_and_truncates(self):
+        for action in ("entry", "exit", "entry"):
+            self.journal.enqueue(self.student, action, "RFID validated")
+        self.assertEqual(GateEvent.objects.count(), 0)
+        self.assertGreater(self.journal.stats()["pending_bytes"], 0)
+
+        self.assertEqual(self.journal.flush(), 3)
+
+        self.assertEqual(GateEvent.objects.count(), 3)
+        record = AttendanceRecord.objects.get(student=self.student)
+        self.assertIsNotNone(record.first_entry_time)
+        self.assertIsNotNone(record.last_exit_time)
+        self.assertEqual(self.path.stat().st_size, 0)
+        self.assertEqual(self.journal.stats()["pending_bytes"], 0)
+
+    def test_unflushed_entries_are_replayed_once_after_restart(self):
+        self.journal.enqueue(self.student, "entry", "RFID validated")
+        self.journal.enqueue(self.student, "exit", "RFID validated")
+        lines = self.path.read_bytes()
+
+        restarted = GateJournal(self.path, interval=0)
+        try:
+            restarted.start()
+            self.assertEqual(GateEvent.objects.count(), 2)
+
+            # A crash after the commit but before the offset was saved.
+            with open(self.path, "ab") as journal:
+                journal.write(lines)
+            restarted.flush()
+        finally:
+            restarted.close()
+
+        self.assertEqual(GateEvent.objects.count(), 2)
+
+    def test_offset_left_past_a_truncated_journal_is_reset(self):
+        # A crash between truncating the journal and saving offset 0.
+        self.journal._write_offset(10_000)
+        self.journal.enqueue(self.student, "entry", "RFID validated")
+
+        self.assertEqual(self.journal.flush(), 1)
+        self.assertEqual(GateEvent.objects.count(), 1)
+
+    def test_server_startup_replays_leftover_entries(self):
+        self.journal.enqueue(self.student, "entry", "RFID validated")
+
+        with override_settings(
+            GATE_WRITE_BEHIND=True,
+            GATE_JOURNAL_PATH=self.path,
+            GATE_JOURNAL_FLUSH_INTERVAL=0,
+        ):
+            reset_gate_journal()
+            try:
+                start_gate_journal()
+                self.assertEqual(GateEvent.objects.count(), 1)
+            finally:
+                reset_gate_journal()
+
+    def test_torn_write_does_not_swallow_the_next_entry(self):
+        with open(self.path, "ab") as journal:
+            journal.write(b'{"student_pk": 1, "act')
+
+        self.journal.enqueue(self.student, "entry", "RFID validated")
+        with self.assertLogs("apps.entry_gate.journal", "WARNING"):
+            self.journal.flush()
+
+        self.assertEqual(GateEvent.objects.count(), 1)
+
+
+class WriteBehindApiTests(APITestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(
+            GATE_WRITE_BEHIND=True,
+            GATE_JOURNAL_PATH=Path(self.tmpdir.name) / "journal.log",
+            GATE_JOURNAL_FLUSH_INTERVAL=0,
+        )
+        self.settings_override.enable()
+        reset_gate_journal()
+        get_recent_passes().clear()
+        self.student = create_student("J2")
+
+    def tearDown(self):
+        reset_gate_journal()
+        self.settings_override.disable()
+        self.tmpdir.cleanup()
+
+    def test_scan_is_acknowledged_before_the_event_is_written(self):
+        response = self.client.post(reverse("rfid-scan"), {"rfid_tag": self.student.rfid_tag})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.json()["id"])
+        self.assertEqual(GateEvent.objects.count(), 0)
+
+        get_gate_journal().flush()
+
+        self.assertEqual(GateEvent.objects.get().student, self.student)
+        metrics = self.client.get(reverse("gate-metrics")).json()["gate_journal"]
+        self.assertEqual((metrics["appended"], metrics["flushed"]), (1, 1))
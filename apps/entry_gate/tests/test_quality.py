@@ -0,0 +1,46 @@
+from io import BytesIO
+
+import numpy as np
+from django.test import SimpleTestCase
+from PIL import Image
+
+from apps.entry_gate.quality import assess_frame
+
+
+def encode(pixels, fmt="JPEG"):
+    buffer = BytesIO()
+    Image.fromarray(pixels.astype(np.uint8)).save(buffer, fmt)
+    return buffer.getvalue()
+
+
+class FrameQualityTests(SimpleTestCase):
+    def setUp(self):
+        self.rng = np.random.default_rng(0)
+
+    def texture(self, height, width, low=40, high=220):
+        """Blocky noise, so detail survives the thumbnail downscale."""
+        blocks = self.rng.integers(low, high, (height // 12 + 1, width // 12 + 1))
+        return np.kron(blocks, np.ones((12, 12)))[:height, :width]
+
+    def test_textured_frame_passes(self):
+        quality = assess_frame(encode(self.texture(240, 320)))
+
+        self.assertTrue(quality.ok, quality.reason)
+
+    def test_rejection_reasons(self):
+        ramp = np.tile(np.linspace(30, 230, 320), (240, 1))
+        cases = {
+            "no face detected": np.full((240, 320), 128),
+            "too dark": self.texture(240, 320, 0, 60),
+            "too blurry": ramp,
+            "frame too small": self.texture(20, 20),
+            "unexpected aspect ratio": self.texture(60, 400),
+        }
+        for reason, pixels in cases.items():
+            with self.subTest(reason=reason):
+                quality = assess_frame(encode(pixels))
+                self.assertFalse(quality.ok)
+                self.assertEqual(quality.reason, reason)
+
+    def test_unreadable_bytes_are_rejected(self):
+        self.assertEqual(assess_frame(b"\xff" * 100).reason, "unreadable image")
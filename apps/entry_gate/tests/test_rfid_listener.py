@@ -0,0 +1,126 @@
+import asyncio
+from unittest import mock
+import uuid
+
+from django.core.cache import cache
+from django.test import TransactionTestCase
+from django.utils import timezone
+
+from apps.attendance.models import AttendanceRecord
+from apps.entry_gate.dedupe import get_recent_passes
+from apps.entry_gate.models import GateEvent
+from apps.entry_gate.rfid_listener import DENY, GRANT, RFIDListener, TapBatcher
+from apps.students.identity import GENERATION_KEY, reset_identity_map
+from apps.students.models import Student
+from apps.users.models import User
+
+
+class RFIDListenerTests(TransactionTestCase):
+    def setUp(self):
+        cache.delete(GENERATION_KEY)
+        reset_identity_map()
+        get_recent_passes().clear()
+        self.student = Student.objects.create(
+            user=User.objects.create(username="listener"),
+            student_id="L1",
+            rfid_tag="RFID-L1",
+            parent_email="p@example.com",
+        )
+        self.listener = RFIDListener(TapBatcher(batch_size=100, interval=0.01))
+        self.listener.identity.load()
+
+    def tearDown(self):
+        reset_identity_map()
+        get_recent_passes().clear()
+
+    def decide_all(self, *lines, gate="reader-1"):
+        async def run():
+            replies = [await self.listener.decide(line, gate) for line in lines]
+            await self.listener.batcher.flush()
+            return replies
+
+        return asyncio.run(run())
+
+    def test_grants_known_cards_and_records_them_in_one_batch(self):
+        replies = self.decide_all(
+            b"RFID-L1 entry\n",
+            b"RFID-NOPE\n",
+            b"RFID-L1 dance\n",
+            b"RFID-L1 exit " + b"k" * 65 + b"\n",
+            b"\n",
+        )
+
+        self.assertEqual(replies, [GRANT, DENY, DENY, DENY, None])
+        event = GateEvent.objects.get()
+        self.assertEqual((event.student, event.action), (self.student, GateEvent.ENTRY))
+        self.assertTrue(AttendanceRecord.objects.get(student=self.student).present)
+
+    def test_bounced_reads_and_repeated_keys_are_recorded_once(self):
+        replies = self.decide_all(
+            b"RFID-L1 entry\n",
+            b"RFID-L1 entry\n",
+            b"RFID-L1 exit k-1\n",
+            b"RFID-L1 exit k-1\n",
+        )
+
+        self.assertEqual(replies, [GRANT] * 4)
+        self.assertEqual(
+            sorted(GateEvent.objects.values_list("action", flat=True)),
+            [GateEvent.ENTRY, GateEvent.EXIT],
+        )
+        self.assertEqual(self.listener.stats()["recorded"], 2)
+
+    def test_tcp_connection_gets_one_byte_per_line(self):
+        async def run():
+            server = await asyncio.start_server(self.listener.handle_stream, "127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(b"RFID-L1 entry\nRFID-NOPE entry\n")
+            replies = await reader.readexactly(2)
+            writer.close()
+            server.close()
+            await server.wait_closed()
+            await self.listener.batcher.flush()
+            return replies
+
+        self.assertEqual(asyncio.run(run()), GRANT + DENY)
+        self.assertEqual(GateEvent.objects.count(), 1)
+
+    def tap(self, student_pk):
+        return {
+            "student_pk": student_pk,
+            "action": GateEvent.ENTRY,
+            "timestamp": timezone.now(),
+            "idempotency_key": uuid.uuid4().hex,
+        }
+
+    def test_taps_for_deleted_students_do_not_block_the_batch(self):
+        batcher = TapBatcher(batch_size=100, interval=0.01)
+        batcher.add(self.tap(self.student.pk + 1000))
+        batcher.add(self.tap(self.student.pk))
+
+        self.assertEqual(asyncio.run(batcher.flush()), 1)
+        self.assertEqual((batcher.recorded, batcher.dropped, batcher._taps), (1, 1, []))
+        self.assertEqual(GateEvent.objects.get().student, self.student)
+
+    def test_failing_batches_are_retried_then_dropped(self):
+        batcher = TapBatcher(batch_size=100, interval=0.01, max_attempts=2)
+        batcher.add(self.tap(self.student.pk))
+
+        with mock.patch(
+            "apps.entry_gate.rfid_listener.record_taps", side_effect=RuntimeError("db down")
+        ), self.assertLogs("apps.entry_gate.rfid_listener", "ERROR"):
+            asyncio.run(batcher.flush())
+            self.assertEqual(len(batcher._taps), 1)
+            asyncio.run(batcher.flush())
+
+        self.assertEqual((batcher._taps, batcher.dropped), ([], 1))
+        self.assertFalse(GateEvent.objects.exists())
+
+    def test_queue_keeps_the_newest_taps_when_full(self):
+        batcher = TapBatcher(batch_size=100, interval=0.01, max_queued=2)
+        taps = [self.tap(self.student.pk) for _ in range(3)]
+        for tap in taps:
+            batcher.add(tap)
+
+        self.assertEqual((batcher._taps, batcher.dropped), (taps[1:], 1))
@@ -0,0 +1,178 @@
+import os
+import tempfile
+from unittest.mock import patch
+from pathlib import Path
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from apps.entry_gate.shared_index import SharedFaceIndex
+from apps.entry_gate.store import HEADER_SIZE, EmbeddingStore
+
+DIM = 8
+
+
+class EmbeddingStoreTests(SimpleTestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmpdir.name) / "embeddings.bin"
+        self.store = EmbeddingStore(self.path, DIM)
+
+    def tearDown(self):
+        self.store.close()
+        self.tmpdir.cleanup()
+
+    def test_appended_embeddings_survive_reopen(self):
+        self.store.append(1, np.ones(DIM))
+        self.store.append(2, np.arange(DIM))
+
+        reopened = EmbeddingStore(self.path, DIM)
+        try:
+            self.assertEqual(len(reopened), 2)
+            np.testing.assert_array_equal(reopened.get(2), np.arange(DIM))
+        finally:
+            reopened.close()
+
+    def test_reenrollment_bumps_version_and_replaces_embedding(self):
+        self.assertEqual(self.store.append(1, np.ones(DIM)), 1)
+        self.assertEqual(self.store.append(1, np.full(DIM, 2.0)), 2)
+
+        self.assertEqual(len(self.store), 1)
+        np.testing.assert_array_equal(self.store.get(1), np.full(DIM, 2.0))
+
+    def test_delete_appends_tombstone(self):
+        self.store.append(1, np.ones(DIM))
+        self.assertTrue(self.store.delete(1))
+
+        self.assertNotIn(1, self.store)
+        self.assertEqual(list(self.store.items()), [])
+
+    def test_other_handles_see_appends_after_refresh(self):
+        other = EmbeddingStore(self.path, DIM)
+        try:
+            self.store.append(7, np.ones(DIM))
+            self.assertNotIn(7, other)
+            self.assertTrue(other.refresh())
+            self.assertIn(7, other)
+        finally:
+            other.close()
+
+    def test_partial_record_is_ignored(self):
+        self.store.append(1, np.ones(DIM))
+        with open(self.path, "ab") as f:
+            f.write(b"\x01" * 10)
+
+        reopened = EmbeddingStore(self.path, DIM)
+        try:
+            self.assertEqual(len(reopened), 1)
+            reopened.append(2, np.ones(DIM))
+            self.assertEqual(
+                os.path.getsize(self.path), HEADER_SIZE + 2 * reopened.dtype.itemsize
+            )
+        finally:
+            reopened.close()
+
+    def test_view_is_not_changed_by_later_refreshes(self):
+        self.store.append(1, np.eye(DIM)[0])
+        view = self.store.view()
+
+        self.store.append(1, np.eye(DIM)[1])
+        self.store.append(2, np.eye(DIM)[2])
+
+        self.assertEqual(self.store.count, 3)
+        self.assertEqual(view.count, 1)
+        self.assertEqual({len(array) for array in view[1:]}, {1})
+        self.assertTrue(view.live[0])
+
+    def test_dimension_mismatch_is_rejected(self):
+        with self.assertRaises(ValueError):
+            EmbeddingStore(self.path, DIM * 2)
+
+
+class SharedFaceIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmpdir.name) / "embeddings.bin"
+        self.writer = EmbeddingStore(self.path, DIM)
+        self.reader = EmbeddingStore(self.path, DIM)
+        self.index = SharedFaceIndex(self.reader)
+
+    def tearDown(self):
+        self.writer.close()
+        self.reader.close()
+        self.tmpdir.cleanup()
+
+    def test_enrollments_from_other_workers_are_picked_up(self):
+        self.assertIsNone(self.index.identify(np.eye(DIM)[0]))
+
+        self.writer.append(3, np.eye(DIM)[0])
+        match = self.index.identify(np.eye(DIM)[0])
+
+        self.assertEqual(match.student_pk, 3)
+        self.assertEqual(self.index.generation, self.writer.generation)
+
+    def test_superseded_and_deleted_records_are_not_matched(self):
+        self.writer.append(1, np.eye(DIM)[0])
+        self.writer.append(2, np.eye(DIM)[1])
+        self.writer.append(1, np.eye(DIM)[2])
+        self.writer.delete(2)
+
+        self.assertIsNone(self.index.identify(np.eye(DIM)[0]))
+        self.assertIsNone(self.index.identify(np.eye(DIM)[1]))
+        self.assertEqual(self.index.identify(np.eye(DIM)[2]).student_pk, 1)
+
+    def test_ivf_mode_searches_store_offsets(self):
+        index = SharedFaceIndex(self.reader, centroids=np.eye(DIM)[:4], nprobe=1)
+        for pk in range(4):
+            self.writer.append(pk + 10, np.eye(DIM)[pk])
+
+        self.assertEqual(index.identify(np.eye(DIM)[2]).student_pk, 12)
+        self.assertEqual(len(index.search(np.eye(DIM)[2], k=4)), 1)
+
+    def test_candidate_mask_restricts_search(self):
+        for pk in range(4):
+            self.writer.append(pk + 10, np.eye(DIM)[pk])
+        probe = np.eye(DIM)[0] + 0.5 * np.eye(DIM)[1]
+
+        only_11 = self.index.candidate_mask([11])
+        not_10 = self.index.candidate_mask([10], exclude=True)
+        self.writer.append(14, np.eye(DIM)[4])
+
+        self.assertEqual(self.index.identify(probe).student_pk, 10)
+        self.assertEqual(self.index.search(probe, k=4, allowed=only_11)[0].student_pk, 11)
+        self.assertEqual(len(self.index.search(probe, k=4, allowed=only_11)), 1)
+        self.assertEqual(self.index.search(probe, allowed=not_10)[0].student_pk, 11)
+        # Records appended after the mask was built are not candidates.
+        self.assertNotEqual(self.index.search(np.eye(DIM)[4], allowed=not_10)[0].student_pk, 14)
+
+    def test_quantized_templates_are_reranked_in_full_precision(self):
+        rng = np.random.default_rng(0)
+        embeddings = rng.standard_normal((200, DIM)).astype(np.float32)
+        embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+        for pk, embedding in enumerate(embeddings, start=1):
+            self.writer.append(pk, embedding)
+
+        self.assertEqual(self.reader.templates.dtype, np.int8)
+        match = self.index.identify(embeddings[57])
+        self.assertEqual(match.student_pk, 58)
+        self.assertAlmostEqual(match.score, 1.0, places=5)
+
+    def test_searches_use_one_view_while_records_are_folded_in(self):
+        index = SharedFaceIndex(self.reader, centroids=np.eye(DIM)[:4], nprobe=4)
+        self.writer.append(1, np.eye(DIM)[0])
+        allowed = index.candidate_mask([1])
+        take_view = self.reader.view
+
+        def view_then_refresh():
+            # Another thread folds in new records right after the view is taken.
+            view = take_view()
+            self.writer.append(1, np.eye(DIM)[1])
+            self.writer.append(2, np.eye(DIM)[0])
+            index.sync()
+            return view
+
+        with patch.object(self.reader, "view", view_then_refresh):
+            matches = index.search(np.eye(DIM)[0], k=2, allowed=allowed)
+
+        self.assertEqual([match.student_pk for match in matches], [1])
+        self.assertIsNone(index.identify(np.eye(DIM)[0], allowed=allowed))
@@ -1,9 +1,22 @@
 from django.urls import path
-from .views import EnrollView, ManualCheckInView, RFIDScanView, ScanView
+
+from . import async_views
+from .views import (
+    BatchScanView,
+    EnrollView,
+    GateMetricsView,
+    ManualCheckInView,
+    RFIDScanView,
+    ScanView,
+)
 
 urlpatterns = [
     path("enroll/", EnrollView.as_view(), name="enroll"),
     path("scan/", ScanView.as_view(), name="scan"),
     path("rfid-scan/", RFIDScanView.as_view(), name="rfid-scan"),
+    path("batch-scan/", BatchScanView.as_view(), name="batch-scan"),
     path("manual-checkin/", ManualCheckInView.as_view(), name="manual-checkin"),
+    path("async/scan/", async_views.scan, name="async-scan"),
+    path("async/rfid-scan/", async_views.rfid_scan, name="async-rfid-scan"),
+    path("metrics/", GateMetricsView.as_view(), name="gate-metrics"),
 ]
@@ -1,25 +1,61 @@
+from collections import Counter
+
+from django.conf import settings
 from django.shortcuts import get_object_or_404
-from django.utils import timezone
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from apps.attendance.models import AttendanceRecord
+from apps.students.identity import (
+    get_identity_map,
+    student_for_rfid,
+    student_for_student_id,
+)
 from apps.students.models import Student
 
+from .dedupe import get_recent_passes
+from .embedding_pool import EmbeddingBusy
+from .ingest import ImageIngestMixin
+from .journal import get_gate_journal
 from .models import GateEvent
-from .serializers import GateEventSerializer
-from .services import enroll_student_face, recognize_student_from_image
-
-
-class EnrollView(APIView):
-    """Enroll a student's face for biometric recognition."""
+from .pipeline import process_gate_batch
+from .quality import FrameRejected
+from .responses import GateResponseMixin
+from .services import (
+    enroll_student_face,
+    face_pipeline_stats,
+    recognize_student_from_frames,
+    recognize_student_from_image,
+)
+
+
+def face_service_busy_response(action_required):
+    response = Response(
+        {
+            "detail": "Face recognition is busy.",
+            "success": False,
+            "busy": True,
+            "action_required": action_required,
+        },
+        status=status.HTTP_503_SERVICE_UNAVAILABLE,
+    )
+    response["Retry-After"] = "1"
+    return response
+
+
+class EnrollView(ImageIngestMixin, APIView):
+    """
+    Enroll a student's face for biometric recognition.
+    Several captures may be sent as repeated ``image`` fields; they are
+    combined into one template. A raw ``image/jpeg`` body with
+    ``?student_id=`` is accepted as a single capture.
+    """
 
     def post(self, request):
-        student_id = request.data.get("student_id")
-        image = request.FILES.get("image")
+        student_id = self.field(request, "student_id")
+        images = request.FILES.getlist("image")
 
-        if not student_id or not image:
+        if not student_id or not images:
             return Response(
                 {"detail": "student_id and image are required."},
                 status=status.HTTP_400_BAD_REQUEST,
@@ -28,7 +64,9 @@ class EnrollView(APIView):
         student = get_object_or_404(Student, id=student_id)
 
         try:
-            enroll_student_face(student, image)
+            enroll_student_face(student, *images)
+        except EmbeddingBusy:
+            return face_service_busy_response("retry")
         except ValueError as exc:
             return Response(
                 {"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST
@@ -37,7 +75,7 @@ class EnrollView(APIView):
         return Response({"detail": "Face enrolled successfully."})
 
 
-class ScanView(APIView):
+class ScanView(GateResponseMixin, ImageIngestMixin, APIView):
     """
     Process gate scan according to flowchart:
     1. Student approaches gate
@@ -46,80 +84,84 @@ class ScanView(APIView):
     4. Grant or deny access
     5. Log entry time
     6. Send parent notification
+
+    Frames may be posted as multipart ``image`` or as a raw ``image/jpeg``
+    body with ``action``/``rfid_tag`` in the query string. Repeating the
+    ``image`` field sends a burst of frames from one approach; they are
+    scored together and the first confident frame decides.
     """
 
     def post(self, request):
-        image = request.FILES.get("image")
-        rfid_tag = request.data.get("rfid_tag")
-        action = request.data.get("action", GateEvent.ENTRY)
+        replayed = self.replayed_response()
+        if replayed is not None:
+            return replayed
+
+        images = request.FILES.getlist("image")
+        rfid_tag = self.field(request, "rfid_tag")
+        action = self.field(request, "action", GateEvent.ENTRY)
 
         student = None
         verification_method = None
         success = False
         reason = ""
+        face_busy = False
+        frame_quality = None
 
-        if image:
+        if images:
             try:
-                student = recognize_student_from_image(image)
+                if len(images) > 1:
+                    student = recognize_student_from_frames(images, action=action)
+                else:
+                    student = recognize_student_from_image(images[0], action=action)
                 if student:
                     verification_method = "face_scan"
                     success = True
                     reason = "Biometric match"
+            except FrameRejected as exc:
+                frame_quality = exc.reason
+                reason = f"Frame rejected: {exc.reason}"
+            except EmbeddingBusy:
+                # Shed face work under load; the RFID branch below still runs.
+                face_busy = True
+                reason = "Face recognition busy"
             except Exception as exc:  # pragma: no cover - defensive
                 reason = f"Face recognition error: {exc}"
 
         if not student and rfid_tag:
-            try:
-                student = Student.objects.get(rfid_tag=rfid_tag)
+            student = student_for_rfid(rfid_tag)
+            if student:
                 verification_method = "rfid"
                 success = True
                 reason = "RFID validated"
-            except Student.DoesNotExist:
+            else:
                 reason = "Invalid RFID tag"
 
-        if not student:
-            return Response(
-                {
-                    "detail": "No matching student found.",
-                    "success": False,
-                    "reason": reason or "No matching student found",
-                    "action_required": "manual_check_in",
-                },
-                status=status.HTTP_404_NOT_FOUND,
-            )
-
-        event = GateEvent.objects.create(
-            student=student,
-            action=action,
-            success=success,
-            reason=reason,
-        )
+        if not student and face_busy:
+            return face_service_busy_response("rfid")
 
-        today = timezone.localdate()
-        attendance, _ = AttendanceRecord.objects.get_or_create(
-            student=student, date=today, defaults={"present": True}
+        if not student:
+            payload = {
+                "detail": "No matching student found.",
+                "success": False,
+                "reason": reason or "No matching student found",
+                "action_required": "manual_check_in",
+            }
+            if frame_quality:
+                payload["frame_quality"] = frame_quality
+                payload["action_required"] = "retry_scan"
+            return Response(payload, status=status.HTTP_404_NOT_FOUND)
+
+        extra = {"frame_quality": frame_quality} if frame_quality else None
+        return self.record_pass(
+            student, action, reason, verification_method, extra, success=success
         )
 
-        if action == GateEvent.ENTRY:
-            if not attendance.first_entry_time:
-                attendance.first_entry_time = event.timestamp
-            attendance.present = True
-        elif action == GateEvent.EXIT:
-            attendance.last_exit_time = event.timestamp
-
-        attendance.save()
 
-        response_data = GateEventSerializer(event).data
-        response_data["verification_method"] = verification_method
-        response_data["attendance_updated"] = True
-
-        return Response(response_data)
-
-
-class RFIDScanView(APIView):
+class RFIDScanView(GateResponseMixin, APIView):
     """
     Dedicated RFID scan endpoint for card readers.
-    Follows the ID Card branch of the flowchart.
+    Follows the ID Card branch of the flowchart. Readers should ask for the
+    compact response (see :mod:`.responses`).
     """
 
     def post(self, request):
@@ -132,37 +174,8 @@ class RFIDScanView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        try:
-            student = Student.objects.get(rfid_tag=rfid_tag)
-
-            event = GateEvent.objects.create(
-                student=student,
-                action=action,
-                success=True,
-                reason="RFID validated",
-            )
-
-            today = timezone.localdate()
-            attendance, _ = AttendanceRecord.objects.get_or_create(
-                student=student, date=today, defaults={"present": True}
-            )
-
-            if action == GateEvent.ENTRY:
-                if not attendance.first_entry_time:
-                    attendance.first_entry_time = event.timestamp
-                attendance.present = True
-            elif action == GateEvent.EXIT:
-                attendance.last_exit_time = event.timestamp
-
-            attendance.save()
-
-            response_data = GateEventSerializer(event).data
-            response_data["verification_method"] = "rfid"
-            response_data["attendance_updated"] = True
-
-            return Response(response_data)
-
-        except Student.DoesNotExist:
+        student = student_for_rfid(rfid_tag)
+        if student is None:
             return Response(
                 {
                     "detail": "Invalid RFID tag.",
@@ -173,8 +186,10 @@ class RFIDScanView(APIView):
                 status=status.HTTP_404_NOT_FOUND,
             )
 
+        return self.record_pass(student, action, "RFID validated", "rfid")
 
-class ManualCheckInView(APIView):
+
+class ManualCheckInView(GateResponseMixin, APIView):
     """
     Manual check-in for admin when automated verification fails.
     Follows the "Access Denied - Notify Admin" branch leading to
@@ -192,39 +207,66 @@ class ManualCheckInView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        try:
-            student = Student.objects.get(student_id=student_id)
-
-            event = GateEvent.objects.create(
-                student=student,
-                action=action,
-                success=True,
-                reason=f"Manual check-in: {reason}",
-            )
-
-            today = timezone.localdate()
-            attendance, _ = AttendanceRecord.objects.get_or_create(
-                student=student, date=today, defaults={"present": True}
+        student = student_for_student_id(student_id)
+        if student is None:
+            return Response(
+                {"detail": "Student not found."},
+                status=status.HTTP_404_NOT_FOUND,
             )
 
-            if action == GateEvent.ENTRY:
-                if not attendance.first_entry_time:
-                    attendance.first_entry_time = event.timestamp
-                attendance.present = True
-            elif action == GateEvent.EXIT:
-                attendance.last_exit_time = event.timestamp
+        return self.record_pass(
+            student,
+            action,
+            f"Manual check-in: {reason}",
+            "manual",
+            override_reason=reason,
+        )
 
-            attendance.override_reason = reason
-            attendance.save()
 
-            response_data = GateEventSerializer(event).data
-            response_data["verification_method"] = "manual"
-            response_data["attendance_updated"] = True
+class BatchScanView(APIView):
+    """
+    Replay taps buffered by a gate controller while it was offline or busy.
 
-            return Response(response_data)
+    Accepts ``{"items": [...]}`` (or a bare list) of
+    ``{rfid_tag | student_id, action, client_timestamp, idempotency_key}``
+    and returns one result per item. Sending the same buffer again is safe:
+    items with a known ``idempotency_key`` come back as duplicates.
+    """
 
-        except Student.DoesNotExist:
+    def post(self, request):
+        items = request.data
+        if isinstance(items, dict):
+            items = items.get("items")
+        if not isinstance(items, list) or not items:
             return Response(
-                {"detail": "Student not found."},
-                status=status.HTTP_404_NOT_FOUND,
+                {"detail": "items must be a non-empty list."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(items) > settings.GATE_BATCH_MAX_ITEMS:
+            return Response(
+                {"detail": f"At most {settings.GATE_BATCH_MAX_ITEMS} items per batch."},
+                status=status.HTTP_400_BAD_REQUEST,
             )
+
+        results = process_gate_batch(items)
+        counts = Counter(result["status"] for result in results)
+        return Response(
+            {
+                "recorded": counts["recorded"],
+                "duplicates": counts["duplicate"],
+                "rejected": counts["rejected"],
+                "results": results,
+            }
+        )
+
+
+class GateMetricsView(APIView):
+    """Face pipeline, identity map, dedupe and journal counters for this worker."""
+
+    def get(self, request):
+        metrics = face_pipeline_stats()
+        metrics["identity_map"] = get_identity_map().stats()
+        metrics["recent_passes"] = get_recent_passes().stats()
+        if settings.GATE_WRITE_BEHIND:
+            metrics["gate_journal"] = get_gate_journal().stats()
+        return Response(metrics)
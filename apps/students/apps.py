@@ -1,6 +1,14 @@
 from django.apps import AppConfig
+from django.core.signals import request_started
 
 
 class StudentsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "apps.students"
+
+    def ready(self):
+        from . import signals
+
+        # Querying here would run for every management command (including
+        # migrate on an empty database), so warm up on the first request.
+        request_started.connect(signals.prewarm_identity_map)
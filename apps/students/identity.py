@@ -0,0 +1,226 @@
+"""Process-local identity map for gate lookups.
+
+RFID taps and manual check-ins resolve a card or student number to a
+student on every request. :class:`IdentityMap` keeps ``rfid_tag -> pk`` and
+``student_id -> pk`` together with the fields a gate response serialises
+(the student and its user), so a known card is answered without touching the
+database.
+
+The map is loaded in one query the first time a request is served (see
+``StudentsConfig.ready``) and kept current by the ``post_save`` and
+``post_delete`` receivers in :mod:`.signals`. Those receivers only run in the
+process that made the change, so they also bump a generation counter in the
+cache named by ``STUDENT_IDENTITY_CACHE``. Every worker compares that counter
+before a lookup and reloads when another worker changed a student. With the
+default local-memory cache this is per process; point it at a shared cache
+(e.g. Redis) in production to keep all workers consistent.
+
+Unknown keys always fall through to the database, so a student created by
+another worker is still found before the map catches up.
+"""
+
+import threading
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import caches
+
+from apps.users.models import User
+
+from .models import Student
+
+GENERATION_KEY = "students:identity:generation"
+
+
+def _model_order(model, names) -> tuple:
+    # ``Model.from_db`` expects values in concrete field order.
+    return tuple(f.attname for f in model._meta.concrete_fields if f.attname in names)
+
+
+USER_FIELDS = _model_order(User, {"id", "username", "first_name", "last_name", "email"})
+STUDENT_FIELDS = _model_order(Student, {"id", "student_id", "rfid_tag", "parent_email", "user_id"})
+STUDENT_ID = STUDENT_FIELDS.index("student_id")
+RFID_TAG = STUDENT_FIELDS.index("rfid_tag")
+USER_ID = STUDENT_FIELDS.index("user_id")
+
+
+def _row(student: Student) -> tuple:
+    user = student.user
+    return tuple(getattr(student, field) for field in STUDENT_FIELDS) + tuple(
+        getattr(user, field) for field in USER_FIELDS
+    )
+
+
+def _instance(row: tuple) -> Student:
+    """Rebuild a saved-looking ``Student`` (with its user) from a cached row."""
+    student_values = row[: len(STUDENT_FIELDS)]
+    user_values = row[len(STUDENT_FIELDS) :]
+    user = User.from_db(User.objects.db, USER_FIELDS, user_values)
+    student = Student.from_db(Student.objects.db, STUDENT_FIELDS, student_values)
+    student.user = user
+    return student
+
+
+class IdentityMap:
+    def __init__(self, cache_alias: Optional[str] = None):
+        self.cache_alias = cache_alias
+        self._lock = threading.Lock()
+        self._rows: dict[int, tuple] = {}
+        self._by_rfid: dict[str, int] = {}
+        self._by_student_id: dict[str, int] = {}
+        self._generation = None
+        self.loaded = False
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _shared_generation(self):
+        if self.cache_alias is None:
+            return None
+        return caches[self.cache_alias].get(GENERATION_KEY, 0)
+
+    async def ashared_generation(self):
+        """The shared generation, read without blocking the event loop."""
+        if self.cache_alias is None:
+            return None
+        return await caches[self.cache_alias].aget(GENERATION_KEY, 0)
+
+    def load(self) -> None:
+        """Replace the map with every student, in one query."""
+        generation = self._shared_generation()
+        students = Student.objects.select_related("user").only(
+            *STUDENT_FIELDS, *(f"user__{field}" for field in USER_FIELDS)
+        )
+        rows = {student.pk: _row(student) for student in students}
+        with self._lock:
+            self._rows = rows
+            self._by_rfid = {row[RFID_TAG]: pk for pk, row in rows.items() if row[RFID_TAG]}
+            self._by_student_id = {row[STUDENT_ID]: pk for pk, row in rows.items()}
+            self._generation = generation
+            self.loaded = True
+
+    def _ensure_current(self) -> None:
+        if not self.loaded or self._shared_generation() != self._generation:
+            self.load()
+
+    def put(self, student: Student) -> None:
+        row = _row(student)
+        with self._lock:
+            self._discard(student.pk)
+            self._rows[student.pk] = row
+            if student.rfid_tag:
+                self._by_rfid[student.rfid_tag] = student.pk
+            self._by_student_id[student.student_id] = student.pk
+
+    def evict(self, student_pk: int) -> None:
+        with self._lock:
+            self._discard(student_pk)
+
+    def _discard(self, student_pk: int) -> None:
+        row = self._rows.pop(student_pk, None)
+        if row is None:
+            return
+        if row[RFID_TAG] and self._by_rfid.get(row[RFID_TAG]) == student_pk:
+            del self._by_rfid[row[RFID_TAG]]
+        if self._by_student_id.get(row[STUDENT_ID]) == student_pk:
+            del self._by_student_id[row[STUDENT_ID]]
+
+    def changed(self, student_pk: int, student: Optional[Student] = None) -> None:
+        """Apply a committed change locally and tell other workers to reload."""
+        self.evict(student_pk)
+        if student is not None and self.loaded:
+            self.put(student)
+        if self.cache_alias is None:
+            return
+        cache = caches[self.cache_alias]
+        cache.add(GENERATION_KEY, 0, timeout=None)
+        try:
+            generation = cache.incr(GENERATION_KEY)
+        except ValueError:
+            return
+        # Nobody else changed anything in between: our copy is current.
+        if self.loaded and generation == self._generation + 1:
+            self._generation = generation
+
+    def pk_for_user(self, user_pk: int) -> Optional[int]:
+        for student_pk, row in list(self._rows.items()):
+            if row[USER_ID] == user_pk:
+                return student_pk
+        return None
+
+    def _lookup(self, index: str, key: str, **query) -> Optional[Student]:
+        self._ensure_current()
+        pk = getattr(self, index).get(key)
+        row = self._rows.get(pk) if pk is not None else None
+        if row is not None:
+            self.hits += 1
+            return _instance(row)
+
+        self.misses += 1
+        student = Student.objects.select_related("user").filter(**query).first()
+        if student is not None:
+            self.put(student)
+        return student
+
+    def cached_pk_for_rfid(self, rfid_tag: str, generation) -> Optional[int]:
+        """The card's student pk if the map is at ``generation``, without any query.
+
+        Safe on an event loop: it never reloads, queries, or reads the cache;
+        take ``generation`` from :meth:`ashared_generation`. ``None`` means
+        "ask :meth:`by_rfid`", not "unknown card".
+        """
+        if not self.loaded or generation != self._generation:
+            return None
+        return self._by_rfid.get(rfid_tag)
+
+    def cached_student_for_rfid(self, rfid_tag: str, generation) -> Optional[Student]:
+        """:meth:`cached_pk_for_rfid`, returning the cached student."""
+        pk = self.cached_pk_for_rfid(rfid_tag, generation)
+        row = self._rows.get(pk) if pk is not None else None
+        if row is None:
+            return None
+        self.hits += 1
+        return _instance(row)
+
+    def by_rfid(self, rfid_tag: str) -> Optional[Student]:
+        return self._lookup("_by_rfid", rfid_tag, rfid_tag=rfid_tag)
+
+    def by_student_id(self, student_id: str) -> Optional[Student]:
+        return self._lookup("_by_student_id", student_id, student_id=student_id)
+
+    def stats(self) -> dict:
+        return {"students": len(self), "hits": self.hits, "misses": self.misses}
+
+
+_identity_map = None
+_map_lock = threading.Lock()
+
+
+def get_identity_map() -> IdentityMap:
+    """Return the process-wide identity map."""
+    global _identity_map
+    if _identity_map is None:
+        with _map_lock:
+            if _identity_map is None:
+                _identity_map = IdentityMap(settings.STUDENT_IDENTITY_CACHE)
+    return _identity_map
+
+
+def reset_identity_map() -> None:
+    global _identity_map
+    with _map_lock:
+        _identity_map = None
+
+
+def student_for_rfid(rfid_tag: str) -> Optional[Student]:
+    if not rfid_tag:
+        return None
+    return get_identity_map().by_rfid(rfid_tag)
+
+
+def student_for_student_id(student_id: str) -> Optional[Student]:
+    if not student_id:
+        return None
+    return get_identity_map().by_student_id(str(student_id))
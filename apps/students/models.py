@@ -13,3 +13,14 @@ class Student(models.Model):
 
     def __str__(self):
         return f"{self.student_id} - {self.user.get_full_name()}"
+
+
+class StudentChange(models.Model):
+    """
+    Append-only log of roster edits. Its id is the roster version gate edge
+    nodes sync from: a node at version N fetches the students touched by
+    changes after N instead of the whole roster.
+    """
+
+    student_pk = models.BigIntegerField()
+    changed_at = models.DateTimeField(auto_now_add=True)
@@ -1,10 +1,19 @@
+from django.db import transaction
 from rest_framework import serializers
+from rest_framework.exceptions import APIException
 
-from apps.entry_gate.services import enroll_student_face
+from apps.entry_gate.embedding_pool import EmbeddingBusy
+from apps.entry_gate.services import embed_face_images, store_student_face
 from apps.users.models import User
 from .models import Student
 
 
+class FaceServiceBusy(APIException):
+    status_code = 503
+    default_detail = "Face recognition is busy, please retry."
+    default_code = "face_service_busy"
+
+
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
@@ -14,6 +23,9 @@ class UserSerializer(serializers.ModelSerializer):
 class StudentSerializer(serializers.ModelSerializer):
     user = UserSerializer()
     face_image = serializers.ImageField(write_only=True, required=False)
+    extra_face_images = serializers.ListField(
+        child=serializers.ImageField(), write_only=True, required=False
+    )
 
     class Meta:
         model = Student
@@ -23,6 +35,7 @@ class StudentSerializer(serializers.ModelSerializer):
             "rfid_tag",
             "parent_email",
             "face_image",
+            "extra_face_images",
             "user",
         ]
 
@@ -41,16 +54,25 @@ class StudentSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         user_data = validated_data.pop("user")
         face_image = validated_data.pop("face_image", None)
+        extra_face_images = validated_data.pop("extra_face_images", [])
 
-        user = User.objects.create(**user_data)
-        student = Student.objects.create(user=user, **validated_data)
-
+        # Embed before the transaction: holding the database write lock for
+        # the embedding would stall every gate write meanwhile.
+        template = None
         if face_image:
             try:
-                enroll_student_face(student, face_image)
+                template = embed_face_images(face_image, *extra_face_images)
+            except EmbeddingBusy as exc:
+                raise FaceServiceBusy() from exc
             except ValueError as exc:
                 raise serializers.ValidationError({"face_image": str(exc)}) from exc
 
+        with transaction.atomic():
+            user = User.objects.create(**user_data)
+            student = Student.objects.create(user=user, **validated_data)
+            if template is not None:
+                store_student_face(student, template)
+
         return student
 
 
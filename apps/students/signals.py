@@ -0,0 +1,54 @@
+from django.core.signals import request_started
+from django.db import DatabaseError, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.users.models import User
+
+from .identity import USER_FIELDS, get_identity_map
+from .models import Student, StudentChange
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+def log_roster_change(sender, instance, **kwargs):
+    StudentChange.objects.create(student_pk=instance.pk)
+
+
+@receiver(post_save, sender=Student)
+def refresh_student_identity(sender, instance, **kwargs):
+    identity = get_identity_map()
+    # Stop serving the old identity now; publish the new one once committed.
+    identity.evict(instance.pk)
+    transaction.on_commit(lambda: identity.changed(instance.pk, instance))
+
+
+@receiver(post_delete, sender=Student)
+def forget_student_identity(sender, instance, **kwargs):
+    identity = get_identity_map()
+    student_pk = instance.pk
+    identity.evict(student_pk)
+    transaction.on_commit(lambda: identity.changed(student_pk))
+
+
+@receiver(post_save, sender=User)
+def refresh_student_user_identity(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not set(update_fields) & set(USER_FIELDS):
+        return
+    for student_pk in Student.objects.filter(user=instance).values_list("pk", flat=True):
+        StudentChange.objects.create(student_pk=student_pk)
+    identity = get_identity_map()
+    student_pk = identity.pk_for_user(instance.pk)
+    if student_pk is not None:
+        identity.evict(student_pk)
+        transaction.on_commit(lambda: identity.changed(student_pk))
+
+
+def prewarm_identity_map(sender, **kwargs):
+    """Load the identity map before the first request needs it."""
+    request_started.disconnect(prewarm_identity_map)
+    try:
+        get_identity_map().load()
+    except DatabaseError:
+        # Tables not migrated yet; lookups load the map lazily instead.
+        pass
@@ -0,0 +1,12 @@
+from apps.students.models import Student
+from apps.users.models import User
+
+
+def create_student(student_id: str, first_name: str = "", last_name: str = "", **fields) -> Student:
+    """Create a student and its user; the card defaults to ``RFID-<student_id>``."""
+    user = User.objects.create(
+        username=student_id.lower(), first_name=first_name, last_name=last_name
+    )
+    fields.setdefault("rfid_tag", f"RFID-{student_id}")
+    fields.setdefault("parent_email", "parent@example.com")
+    return Student.objects.create(user=user, student_id=student_id, **fields)
@@ -0,0 +1,71 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from apps.students.identity import (
+    GENERATION_KEY,
+    IdentityMap,
+    get_identity_map,
+    reset_identity_map,
+    student_for_rfid,
+    student_for_student_id,
+)
+from apps.students.models import Student
+from apps.users.models import User
+
+
+class IdentityMapTests(TestCase):
+    def setUp(self):
+        cache.delete(GENERATION_KEY)
+        reset_identity_map()
+        user = User.objects.create(username="tapper", first_name="Tap", last_name="Per")
+        self.student = Student.objects.create(
+            user=user, student_id="S700", rfid_tag="RFID-700", parent_email="p@example.com"
+        )
+
+    def tearDown(self):
+        reset_identity_map()
+
+    def test_known_card_is_answered_without_a_query(self):
+        get_identity_map().load()
+
+        with self.assertNumQueries(0):
+            student = student_for_rfid("RFID-700")
+            by_number = student_for_student_id("S700")
+
+        self.assertEqual(student, self.student)
+        self.assertEqual(by_number.pk, self.student.pk)
+        self.assertEqual(student.user.get_full_name(), "Tap Per")
+        self.assertEqual(
+            (student.student_id, student.rfid_tag, student.user_id),
+            ("S700", "RFID-700", self.student.user_id),
+        )
+
+    def test_saves_and_deletes_update_the_map_on_commit(self):
+        get_identity_map().load()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.student.rfid_tag = "RFID-701"
+            self.student.save()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(student_for_rfid("RFID-701"), self.student)
+        self.assertIsNone(student_for_rfid("RFID-700"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.student.delete()
+
+        self.assertIsNone(student_for_rfid("RFID-701"))
+
+    def test_other_workers_reload_after_a_change(self):
+        other_worker = IdentityMap("default")
+        other_worker.load()
+        self.assertEqual(other_worker.by_rfid("RFID-700"), self.student)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.student.rfid_tag = "RFID-702"
+            self.student.save()
+
+        # The bumped generation makes the other map reload in one query.
+        with self.assertNumQueries(1):
+            self.assertEqual(other_worker.by_rfid("RFID-702"), self.student)
+        self.assertEqual(other_worker.stats()["hits"], 2)
@@ -2,8 +2,10 @@ from io import BytesIO
 from unittest.mock import patch
 
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import TestCase
 from PIL import Image
+from rest_framework.exceptions import ValidationError
 
 from apps.students.models import Student
 from apps.students.serializers import StudentRegistrationSerializer
@@ -33,7 +35,9 @@ class StudentRegistrationSerializerTests(TestCase):
             },
         }
 
-        with patch("apps.students.serializers.enroll_student_face") as enroll_mock:
+        with patch(
+            "apps.students.serializers.embed_face_images", return_value="template"
+        ) as embed_mock, patch("apps.students.serializers.store_student_face") as store_mock:
             serializer = StudentRegistrationSerializer(data=payload)
             self.assertTrue(serializer.is_valid(), serializer.errors)
 
@@ -42,7 +46,32 @@ class StudentRegistrationSerializerTests(TestCase):
         self.assertEqual(Student.objects.count(), 1)
         self.assertEqual(User.objects.count(), 1)
         self.assertEqual(student.student_id, "S001")
-        enroll_mock.assert_called_once_with(student, payload["face_image"])
+        embed_mock.assert_called_once_with(payload["face_image"])
+        store_mock.assert_called_once_with(student, "template")
+
+    def test_face_is_embedded_before_the_transaction(self):
+        payload = {
+            "student_id": "S004",
+            "rfid_tag": "RFID-789",
+            "parent_email": "parent@example.com",
+            "face_image": generate_test_image("face4.jpg"),
+            "user": {"username": "ckent"},
+        }
+
+        # The test case's own transactions; create() must not open another.
+        depth = len(connection.atomic_blocks)
+
+        def embed(*images):
+            self.assertEqual(len(connection.atomic_blocks), depth)
+            raise ValueError("No face found in the image.")
+
+        with patch("apps.students.serializers.embed_face_images", side_effect=embed):
+            serializer = StudentRegistrationSerializer(data=payload)
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+            with self.assertRaises(ValidationError):
+                serializer.save()
+
+        self.assertFalse(User.objects.filter(username="ckent").exists())
 
     def test_rfid_is_required_for_registration(self):
         payload = {
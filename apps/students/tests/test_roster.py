@@ -0,0 +1,77 @@
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from apps.students.models import StudentChange
+from apps.students.tests.factories import create_student
+
+
+class RosterDeltaTests(APITestCase):
+    def setUp(self):
+        self.url = reverse("student-roster")
+        self.first = create_student("R1", "Ro", "1")
+        self.second = create_student("R2", "Ro", "2")
+
+    def test_since_zero_returns_a_full_snapshot(self):
+        response = self.client.get(self.url, {"since": 0})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data["full"])
+        self.assertEqual(response.data["version"], StudentChange.objects.latest("id").id)
+        self.assertEqual(
+            sorted(entry["student_id"] for entry in response.data["students"]), ["R1", "R2"]
+        )
+
+    def test_delta_lists_only_changed_and_deleted_students(self):
+        version = self.client.get(self.url).data["version"]
+        self.first.rfid_tag = "RFID-R1-NEW"
+        self.first.save()
+        second_pk = self.second.pk
+        self.second.delete()
+
+        response = self.client.get(self.url, {"since": version})
+
+        self.assertFalse(response.data["full"])
+        self.assertEqual(
+            response.data["students"],
+            [
+                {
+                    "pk": self.first.pk,
+                    "student_id": "R1",
+                    "rfid_tag": "RFID-R1-NEW",
+                    "name": "Ro 1",
+                }
+            ],
+        )
+        self.assertEqual(response.data["deleted"], [second_pk])
+        self.assertGreater(response.data["version"], version)
+
+        caught_up = self.client.get(self.url, {"since": response.data["version"]})
+        self.assertEqual(caught_up.data["students"], [])
+        self.assertEqual(caught_up.data["version"], response.data["version"])
+
+    def test_user_name_changes_are_deltas(self):
+        version = self.client.get(self.url).data["version"]
+        self.first.user.first_name = "Rosa"
+        self.first.user.save(update_fields=["first_name"])
+
+        response = self.client.get(self.url, {"since": version})
+
+        self.assertEqual([entry["name"] for entry in response.data["students"]], ["Rosa 1"])
+
+    def test_deltas_are_paged(self):
+        version = self.client.get(self.url).data["version"]
+        for number in range(3, 6):
+            create_student(f"R{number}", "Ro", str(number))
+
+        page = self.client.get(self.url, {"since": version, "limit": 2})
+
+        self.assertTrue(page.data["more"])
+        self.assertEqual(len(page.data["students"]), 2)
+        rest = self.client.get(self.url, {"since": page.data["version"], "limit": 2})
+        self.assertFalse(rest.data["more"])
+        self.assertEqual([entry["student_id"] for entry in rest.data["students"]], ["R5"])
+
+    def test_rejects_non_integer_versions(self):
+        response = self.client.get(self.url, {"since": "yesterday"})
+
+        self.assertEqual(response.status_code, 400)
@@ -1,11 +1,12 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import StudentRegistrationView, StudentViewSet
+from .views import RosterView, StudentRegistrationView, StudentViewSet
 
 router = DefaultRouter()
 router.register(r"", StudentViewSet, basename="students")
 
 urlpatterns = [
     path("register/", StudentRegistrationView.as_view(), name="student-register"),
+    path("roster/", RosterView.as_view(), name="student-roster"),
     path("", include(router.urls)),
 ]
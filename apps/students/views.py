@@ -1,9 +1,13 @@
+from django.conf import settings
+from django.db.models import Max
 from rest_framework import status, viewsets
 from rest_framework.parsers import JSONParser, MultiPartParser, FormParser
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from .models import Student
+from apps.entry_gate.ingest import ImageIngestMixin
+
+from .models import Student, StudentChange
 from .serializers import StudentRegistrationSerializer, StudentSerializer
 
 
@@ -12,9 +16,10 @@ class StudentViewSet(viewsets.ModelViewSet):
     serializer_class = StudentSerializer
 
 
-class StudentRegistrationView(APIView):
+class StudentRegistrationView(ImageIngestMixin, APIView):
     """Register a student with RFID metadata and a face capture."""
 
+    # Registration needs form fields alongside the capture, so no raw bodies.
     parser_classes = [MultiPartParser, FormParser, JSONParser]
 
     def post(self, request):
@@ -25,3 +30,70 @@ class StudentRegistrationView(APIView):
         return Response(
             StudentSerializer(student).data, status=status.HTTP_201_CREATED
         )
+
+
+def _roster_entry(student) -> dict:
+    return {
+        "pk": student.pk,
+        "student_id": student.student_id,
+        "rfid_tag": student.rfid_tag,
+        "name": student.user.get_full_name(),
+    }
+
+
+class RosterView(APIView):
+    """
+    Roster deltas for gate edge nodes (see ``apps.entry_gate.edge``).
+
+    ``?since=0`` returns every student and the current roster version.
+    ``?since=N`` returns the students changed after version N, plus the pks
+    of students deleted since then, at most ``limit`` changes per page;
+    ``more`` tells the node to ask again from the returned ``version``.
+    """
+
+    def get(self, request):
+        try:
+            since = int(request.query_params.get("since", 0))
+            limit = int(request.query_params.get("limit", settings.ROSTER_SYNC_PAGE_SIZE))
+        except ValueError:
+            return Response(
+                {"detail": "since and limit must be integers."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        limit = max(1, min(limit, settings.ROSTER_SYNC_PAGE_SIZE))
+        students = Student.objects.select_related("user").only(
+            "id", "student_id", "rfid_tag", "user__first_name", "user__last_name"
+        )
+
+        if since <= 0:
+            # Read the version first: a change racing the snapshot is re-sent next time.
+            version = StudentChange.objects.aggregate(version=Max("id"))["version"] or 0
+            return Response(
+                {
+                    "version": version,
+                    "full": True,
+                    "students": [_roster_entry(student) for student in students],
+                    "deleted": [],
+                    "more": False,
+                }
+            )
+
+        changes = list(
+            StudentChange.objects.filter(id__gt=since)
+            .order_by("id")
+            .values_list("id", "student_pk")[: limit + 1]
+        )
+        more = len(changes) > limit
+        changes = changes[:limit]
+        touched = {student_pk for _, student_pk in changes}
+        changed = [_roster_entry(student) for student in students.filter(pk__in=touched)]
+        present = {entry["pk"] for entry in changed}
+        return Response(
+            {
+                "version": changes[-1][0] if changes else since,
+                "full": False,
+                "students": changed,
+                "deleted": sorted(touched - present),
+                "more": more,
+            }
+        )
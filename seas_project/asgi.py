@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'seas_project.settings')
 
 application = get_asgi_application()
+
+# Replay gate passes journaled before a crash or restart (GATE_WRITE_BEHIND).
+from apps.entry_gate.journal import start_gate_journal  # noqa: E402
+
+start_gate_journal()
@@ -137,3 +137,100 @@ CORS_ALLOW_ALL_ORIGINS = True
 # AUTO FIELD
 # ----------------------------------------------------
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+# ----------------------------------------------------
+# FACE RECOGNITION
+# ----------------------------------------------------
+FACE_STORE_PATH = BASE_DIR / "face_data" / "embeddings.bin"
+FACE_ANN_INDEX_PATH = BASE_DIR / "face_data" / "ivf.npz"
+# Inverted lists searched per probe; raise for recall, lower for latency.
+FACE_ANN_NPROBE = 8
+# Below this many enrollments exact search is fast enough.
+FACE_ANN_MIN_ENROLLMENTS = 20000
+# Workers look for new centroids from rebuild_face_index this often (seconds).
+FACE_ANN_RELOAD_CHECK_SECONDS = 1.0
+# Candidates re-scored in float32 after the int8 template pass.
+FACE_RERANK_CANDIDATES = 16
+# Captures accepted per enrollment; they are averaged into one template.
+FACE_MAX_ENROLLMENT_IMAGES = 5
+# Embedding runs in a spawned process pool; 0 embeds inline in the request.
+FACE_EMBEDDING_WORKERS = os.cpu_count() or 1
+# Jobs allowed to wait for a worker before scans are told the pool is busy.
+FACE_EMBEDDING_QUEUE_SIZE = 8
+FACE_EMBEDDING_TIMEOUT = 2.0
+# Largest image accepted by scan, enroll and registration uploads.
+IMAGE_UPLOAD_MAX_BYTES = 8 * 1024 * 1024
+# Recent frame embeddings kept per worker so resubmitted frames skip embedding.
+FACE_EMBEDDING_CACHE_SIZE = 1024
+FACE_EMBEDDING_CACHE_TTL = 30
+# Also match re-encoded near-duplicate frames by a coarse perceptual hash.
+FACE_EMBEDDING_CACHE_PERCEPTUAL = False
+# Burst scans: frames scored per request, and how far above the match
+# threshold a single frame must score to decide without the others.
+FACE_BURST_MAX_FRAMES = 5
+FACE_BURST_EARLY_EXIT_MARGIN = 0.05
+FACE_BURST_CANDIDATES = 3
+# Search students who can plausibly make a gate pass (not already inside for
+# an entry, inside for an exit) before the whole roster.
+FACE_PRESENCE_PRUNING = True
+# Cache alias holding the student identity map generation. Use a cache shared
+# by all workers (e.g. Redis) so RFID lookups see other workers' edits.
+STUDENT_IDENTITY_CACHE = "default"
+# Students per page of /api/students/roster/ deltas for gate edge nodes.
+ROSTER_SYNC_PAGE_SIZE = 1000
+# Largest buffer of taps accepted by /api/entry-gate/batch-scan/.
+GATE_BATCH_MAX_ITEMS = 1000
+# Repeat taps of one card at one gate within this window return the
+# original pass; client idempotency keys are remembered for longer.
+GATE_DEBOUNCE_SECONDS = 2.0
+GATE_IDEMPOTENCY_TTL = 600
+# Write-behind mode: scans are journaled to a local fsync'd file and flushed
+# to the database in batches by a background thread.
+GATE_WRITE_BEHIND = False
+GATE_JOURNAL_PATH = BASE_DIR / "gate_data" / "journal.log"
+GATE_JOURNAL_BATCH_SIZE = 500
+GATE_JOURNAL_FLUSH_INTERVAL = 0.5
+# Live dashboard stream (/api/live-stream/, ASGI only). Gate events reach it
+# through this broker; use apps.entry_gate.broadcast.RedisBroker when gates
+# and dashboards run in different processes.
+LIVE_STREAM_BROKER = "apps.entry_gate.broadcast.LocalBroker"
+LIVE_STREAM_REDIS_URL = "redis://localhost:6379/0"
+# Connect/read timeout (seconds) of RedisBroker's publisher thread.
+LIVE_STREAM_REDIS_TIMEOUT = 0.5
+LIVE_STREAM_COALESCE_SECONDS = 1.0
+LIVE_STREAM_HEARTBEAT_SECONDS = 15
+# /api/live-stats/ snapshot: fresh for LIVE_STATS_CACHE_SECONDS unless a gate
+# event or attendance change commits; while one worker recomputes it, others
+# serve the previous snapshot (kept for LIVE_STATS_STALE_SECONDS). Use a cache
+# shared by all workers (e.g. Redis) so they share the computation too.
+LIVE_STATS_CACHE = "default"
+LIVE_STATS_CACHE_SECONDS = 5
+LIVE_STATS_STALE_SECONDS = 60
+LIVE_STATS_LOCK_SECONDS = 10
+# Even after a change, a snapshot younger than this is served: during a rush
+# every gate event invalidates it, and this caps recomputation at one per
+# interval.
+LIVE_STATS_MIN_INTERVAL_SECONDS = 1.0
+# Today's anomalies are kept incrementally per worker (apps.admin_panel.anomalies)
+# and rebuilt from the gate log at this interval.
+ANOMALY_ENGINE = True
+ANOMALY_ENGINE_REBUILD_SECONDS = 300
+# Threads for face recognition behind the async (ASGI) scan endpoint.
+GATE_ASYNC_RECOGNITION_WORKERS = 4
+# manage.py rfid_listener: line-protocol RFID reads over TCP/UDP. Granted
+# taps are recorded in batches every interval or batch size, whichever first.
+GATE_RFID_LISTEN_HOST = "0.0.0.0"
+GATE_RFID_LISTEN_PORT = 7070
+GATE_RFID_BATCH_SIZE = 500
+GATE_RFID_FLUSH_INTERVAL = 0.05
+# A failing batch is retried (backing off up to 5 s) this many times before
+# its taps are dropped; at most this many granted taps wait to be written.
+GATE_RFID_MAX_ATTEMPTS = 8
+GATE_RFID_MAX_QUEUED = 100_000
+# Offline edge mode (manage.py gate_edge): a local SQLite copy of the roster
+# answers taps while the server is unreachable; taps are pushed back later.
+GATE_EDGE_DB = BASE_DIR / "gate_data" / "edge.sqlite3"
+GATE_EDGE_SERVER = "http://localhost:8000"
+GATE_EDGE_TIMEOUT = 5.0
+# gate_edge serve syncs with the server this often (seconds).
+GATE_EDGE_SYNC_INTERVAL = 30.0
@@ -2,3 +2,6 @@ from .base import *
 
 DEBUG = True
 ALLOWED_HOSTS = ["*"]
+
+# Keep runserver and the test suite free of embedding child processes.
+FACE_EMBEDDING_WORKERS = 0
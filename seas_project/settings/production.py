@@ -1,4 +1,19 @@
+import os
+
 from .base import *
 
 DEBUG = False
 ALLOWED_HOSTS = ["*"]  # later, put real domain/ip here
+
+# One cache shared by every worker. The live-stats snapshot, its lock and
+# generation, and the student identity map generation only work across
+# processes through it. Live gate events fan out through the same Redis.
+REDIS_URL = os.environ.get("REDIS_URL", "redis://localhost:6379/0")
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": REDIS_URL,
+    }
+}
+LIVE_STREAM_BROKER = "apps.entry_gate.broadcast.RedisBroker"
+LIVE_STREAM_REDIS_URL = REDIS_URL
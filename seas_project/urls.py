@@ -14,9 +14,10 @@ from apps.admin_panel.views import (
 from apps.admin_panel.admin_monitoring import (
     admin_monitoring_dashboard,
     clear_flag,
-    live_stats,
     manual_override,
 )
+from apps.admin_panel.live import live_stream
+from apps.admin_panel.stats import live_stats, live_stats_async
 from apps.users.views import RoleBasedLoginView
 
 urlpatterns = [
@@ -41,6 +42,8 @@ urlpatterns = [
 
     # API Endpoints
     path("api/live-stats/", live_stats, name="live-stats"),
+    path("api/async/live-stats/", live_stats_async, name="live-stats-async"),
+    path("api/live-stream/", live_stream, name="live-stream"),
     path("api/admin/monitoring/", admin_monitoring_dashboard, name="admin-monitoring"),
     path("api/admin/manual-override/", manual_override, name="manual-override"),
     path("api/admin/clear-flag/", clear_flag, name="clear-flag"),
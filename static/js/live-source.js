@@ -0,0 +1,61 @@
+// One shared subscription per page to the live dashboard stream
+// (/api/live-stream/, server-sent events). When the stream is unavailable,
+// e.g. under the WSGI development server, it falls back to polling
+// /api/live-stats/ and reports the same `stats` payload.
+const listeners = { stats: new Set(), gate: new Set(), anomalies: new Set(), error: new Set() };
+let source = null;
+let pollTimer = null;
+
+function emit(type, data) {
+  listeners[type].forEach((listener) => listener(data));
+}
+
+async function poll() {
+  try {
+    const response = await fetch('/api/live-stats/');
+    if (!response.ok) throw new Error(`live-stats returned ${response.status}`);
+    emit('stats', await response.json());
+  } catch (error) {
+    emit('error', error);
+  }
+}
+
+function startPolling(interval) {
+  if (pollTimer) return;
+  poll();
+  pollTimer = setInterval(poll, interval);
+}
+
+function connect(pollInterval) {
+  if (source || pollTimer) return;
+  if (!('EventSource' in window)) {
+    startPolling(pollInterval);
+    return;
+  }
+
+  let opened = false;
+  source = new EventSource('/api/live-stream/');
+  source.onopen = () => {
+    opened = true;
+  };
+  ['stats', 'gate', 'anomalies'].forEach((type) => {
+    source.addEventListener(type, (event) => emit(type, JSON.parse(event.data)));
+  });
+  source.onerror = () => {
+    // Once open, EventSource reconnects by itself. A stream that never
+    // opened (503 under WSGI) will not come back: poll instead.
+    if (!opened) {
+      source.close();
+      source = null;
+      startPolling(pollInterval);
+    }
+  };
+}
+
+export function subscribeLive({ onStats, onGate, onAnomalies, onError, pollInterval = 15000 } = {}) {
+  if (onStats) listeners.stats.add(onStats);
+  if (onGate) listeners.gate.add(onGate);
+  if (onAnomalies) listeners.anomalies.add(onAnomalies);
+  if (onError) listeners.error.add(onError);
+  connect(pollInterval);
+}
@@ -1,3 +1,5 @@
+import { subscribeLive } from './live-source.js';
+
 (function () {
   const onTimeEl = document.getElementById('statOnTime');
   const studentsEl = document.getElementById('statStudents');
@@ -8,6 +10,8 @@
 
   if (!onTimeEl) return;
 
+  let feed = [];
+
   function renderFeed(items) {
     if (!items.length) {
       feedEl.innerHTML = '<p class="muted">No gate events yet today.</p>';
@@ -27,40 +31,45 @@
       .join('');
   }
 
-  async function loadStats() {
-    try {
-      const response = await fetch('/api/live-stats/');
-      const data = await response.json();
+  function renderStats(data) {
+    const hasEvents = Boolean(data.has_events_today);
 
-      const hasEvents = Boolean(data.has_events_today);
+    studentsEl.textContent = data.students.toLocaleString();
+    gatesEl.textContent = data.active_gates.toString();
 
-      studentsEl.textContent = data.students.toLocaleString();
-      gatesEl.textContent = data.active_gates.toString();
+    if (!hasEvents) {
+      onTimeEl.textContent = '—';
+      scanEl.textContent = '—';
+      updatedEl.textContent = 'Waiting for gate activity';
+      document.documentElement.style.setProperty('--live-accent', '#9ba3b4');
+      feed = [];
+      renderFeed(feed);
+      return;
+    }
 
-      if (!hasEvents) {
-        onTimeEl.textContent = '—';
-        scanEl.textContent = '—';
-        updatedEl.textContent = 'Waiting for gate activity';
-        document.documentElement.style.setProperty('--live-accent', '#9ba3b4');
-        renderFeed([]);
-        return;
-      }
+    onTimeEl.textContent = `${data.success_rate.toFixed(1)}%`;
+    scanEl.textContent = `${data.average_scan_time}s`;
+    updatedEl.textContent = `Updated ${new Date(data.last_updated).toLocaleTimeString()}`;
+    feed = data.live_feed || [];
+    renderFeed(feed);
 
-      onTimeEl.textContent = `${data.success_rate.toFixed(1)}%`;
-      scanEl.textContent = `${data.average_scan_time}s`;
-      updatedEl.textContent = `Updated ${new Date(data.last_updated).toLocaleTimeString()}`;
-      renderFeed(data.live_feed || []);
+    document.documentElement.style.setProperty(
+      '--live-accent',
+      data.success_rate >= 95 ? '#22d3ee' : '#f97316'
+    );
+  }
 
-      document.documentElement.style.setProperty(
-        '--live-accent',
-        data.success_rate >= 95 ? '#22d3ee' : '#f97316'
-      );
-    } catch (error) {
+  subscribeLive({
+    onStats: renderStats,
+    // Show a pass the moment it is recorded; the counters follow with the next stats.
+    onGate: (item) => {
+      feed = [item, ...feed].slice(0, 6);
+      renderFeed(feed);
+    },
+    onError: (error) => {
       console.error('Unable to load live stats', error);
       updatedEl.textContent = 'Live snapshot unavailable';
-    }
-  }
-
-  loadStats();
-  setInterval(loadStats, 10000);
+    },
+    pollInterval: 10000,
+  });
 })();
@@ -16,7 +16,8 @@ export default defineConfig({
         admin_dashboard: resolve(staticRoot, 'css/admin_dashboard.css'),
         gate_console: resolve(staticRoot, 'css/gate_console.css'),
         notifications: resolve(staticRoot, 'css/notifications.css'),
-        'live-stats': resolve(staticRoot, 'js/live-stats.js')
+        'live-stats': resolve(staticRoot, 'js/live-stats.js'),
+        'live-source': resolve(staticRoot, 'js/live-source.js')
       },
       output: {
         assetFileNames: 'assets/[name][extname]',